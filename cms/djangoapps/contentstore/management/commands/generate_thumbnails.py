@@ -0,0 +1,54 @@
+"""
+A command to generate the thumbnails of a course's image assets.
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from contentstore.tasks import create_thumbnails, is_thumbnailable
+from xmodule.contentstore.content import StaticContent
+from xmodule.contentstore.django import contentstore
+from xmodule.course_module import CourseDescriptor
+from xmodule.modulestore import Location
+
+
+class Command(BaseCommand):
+    """The generate_thumbnails command."""
+
+    args = "<course_id>"
+    help = "Generate the missing thumbnails of a course's image assets."
+
+    option_list = BaseCommand.option_list + (
+        make_option('--all',
+                    action='store_true',
+                    dest='all',
+                    default=False,
+                    help="Regenerate the thumbnails of every image asset, not just the missing ones."),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("generate_thumbnails requires one argument: <course_id>")
+
+        course_location = CourseDescriptor.id_to_location(args[0])
+        store = contentstore()
+        assets = store.get_all_content_for_course(course_location)
+        existing_thumbnails = set(
+            Location(thumbnail['_id']) for thumbnail in store.get_all_content_thumbnails_for_course(course_location)
+        )
+
+        num_generated = 0
+        for asset in assets:
+            if not is_thumbnailable(asset.get('contentType')):
+                continue
+            thumbnail_location = asset.get('thumbnail_location')
+            if (not options['all'] and thumbnail_location is not None and
+                    Location(thumbnail_location) in existing_thumbnails):
+                continue
+            asset_location = Location(asset['_id'])
+            if create_thumbnails(asset_location) is None:
+                self.stdout.write("Unable to generate thumbnails of {0}\n".format(asset_location.url()))
+            else:
+                num_generated += 1
+
+        self.stdout.write("Generated the thumbnails of {0} assets\n".format(num_generated))
@@ -0,0 +1,88 @@
+"""
+Background tasks of Studio's content store.
+"""
+import logging
+
+from celery import task
+from django.conf import settings
+
+from cache_toolbox.core import del_cached_content
+from xmodule.contentstore.content import StaticContent
+from xmodule.contentstore.django import contentstore
+from xmodule.exceptions import NotFoundError
+from xmodule.modulestore import Location
+
+log = logging.getLogger(__name__)
+
+
+def is_thumbnailable(content_type):
+    """
+    Returns whether generate_thumbnails can make thumbnails of content of the given type
+    """
+    return content_type is not None and content_type.split('/')[0] == 'image'
+
+
+def create_thumbnails(location):
+    """
+    Saves a thumbnail of the image asset at location for each of
+    settings.ASSET_THUMBNAIL_SIZES, and points the asset at the first (primary) one.
+
+    Returns the location of the primary thumbnail, or None if there's no such asset or
+    it couldn't be thumbnailed.
+    """
+    location = Location(location)
+    store = contentstore()
+    try:
+        content = store.find(location)
+    except NotFoundError:
+        # deleted since the thumbnails were asked for
+        return None
+    if not is_thumbnailable(content.content_type):
+        return None
+
+    primary_location = None
+    for index, dimensions in enumerate(settings.ASSET_THUMBNAIL_SIZES):
+        thumbnail_name = StaticContent.generate_thumbnail_name(
+            location.name, dimensions=dimensions if index > 0 else None
+        )
+        thumbnail_content, thumbnail_location = store.generate_thumbnail(
+            content, dimensions=dimensions, thumbnail_name=thumbnail_name
+        )
+        del_cached_content(thumbnail_location)
+        if thumbnail_content is None:
+            # the image can't be decoded; so, no other size will work either
+            break
+        if index == 0:
+            primary_location = thumbnail_location
+
+    if primary_location is not None:
+        store.set_thumbnail_location(location, primary_location)
+        del_cached_content(location)
+    return primary_location
+
+
+def get_extra_thumbnail_locations(location):
+    """
+    Returns the locations of the thumbnails create_thumbnails saves for the asset at location
+    besides its primary one (which its thumbnail_location points to), whether they exist or not
+    """
+    location = Location(location)
+    return [
+        StaticContent.compute_location(
+            location.org, location.course,
+            StaticContent.generate_thumbnail_name(location.name, dimensions=dimensions),
+            is_thumbnail=True
+        )
+        for dimensions in settings.ASSET_THUMBNAIL_SIZES[1:]
+    ]
+
+
+@task
+def generate_thumbnails(location_url):
+    """
+    Generates the thumbnails of the asset at location_url (see create_thumbnails).
+    Until it's done, Studio shows the asset itself in place of its thumbnail.
+    """
+    thumbnail_location = create_thumbnails(location_url)
+    if thumbnail_location is None:
+        log.info("No thumbnails generated for %s", location_url)
@@ -3,14 +3,20 @@ Unit tests for the asset upload endpoint.
 """
 
 import json
+import re
 from datetime import datetime
 from io import BytesIO
 from pytz import UTC
 from unittest import TestCase, skip
+from mock import patch
 from .utils import CourseTestCase
 from django.core.urlresolvers import reverse
+from django.test.utils import override_settings
+from contentstore.tasks import create_thumbnails
 from contentstore.views import assets
 from xmodule.contentstore.content import StaticContent
+from xmodule.contentstore.django import contentstore
+from xmodule.contentstore.mongo import MongoContentStore
 from xmodule.modulestore import Location
 
 
@@ -35,7 +41,52 @@ class AssetsTestCase(CourseTestCase):
         )
         self.assertEquals(resp.status_code, 200)
         content = json.loads(resp.content)
-        self.assertIsInstance(content, list)
+        self.assertIsInstance(content['assets'], list)
+        self.assertEquals(content['page'], 1)
+
+    def test_pagination(self):
+        for day, name in enumerate(('b.txt', 'a.txt', 'c.txt', 'd.png'), 1):
+            location = StaticContent.compute_location(self.course.location.org, self.course.location.course, name)
+            content = contentstore().save(StaticContent(location, name, 'text/plain', name))
+            # uploads in the same millisecond would have no definite order
+            contentstore().fs_files.update(
+                {'_id': content.get_id()}, {'$set': {'uploadDate': datetime(2013, 1, day, tzinfo=UTC)}}
+            )
+
+        def get_names(**params):
+            resp = self.client.get(self.url, params, HTTP_ACCEPT="application/json")
+            self.assertEquals(resp.status_code, 200)
+            content = json.loads(resp.content)
+            return content['totalCount'], [asset['name'] for asset in content['assets']]
+
+        # the most recent uploads first
+        self.assertEquals((4, ['d.png', 'c.txt']), get_names(page_size=2))
+        self.assertEquals((4, ['a.txt', 'b.txt']), get_names(page_size=2, page=2))
+        self.assertEquals((4, ['a.txt', 'b.txt', 'c.txt']), get_names(page_size=3, sort='display_name'))
+        self.assertEquals((4, ['d.png']), get_names(page_size=3, page=2, sort='display_name'))
+        self.assertEquals((4, ['d.png', 'c.txt']), get_names(page_size=2, sort='display_name', direction='desc'))
+        self.assertEquals((1, ['d.png']), get_names(text='D.'))
+        # bad parameters get the defaults
+        self.assertEquals(
+            (4, ['d.png', 'c.txt', 'a.txt', 'b.txt']), get_names(page='x', page_size='y', sort='z')
+        )
+
+        resp = self.client.get(self.url, {'page_size': 1, 'page': 2})
+        self.assertContains(resp, 'c.txt')
+        self.assertNotContains(resp, 'd.png')
+        self.assertContains(resp, 'class="next"')
+
+    def test_search_text_escaped(self):
+        resp = self.client.get(self.url, {'text': '"><script>alert(1)</script>'})
+        self.assertEquals(resp.status_code, 200)
+        self.assertNotContains(resp, '<script>alert(1)</script>')
+        self.assertContains(resp, '&gt;&lt;script&gt;alert(1)&lt;/script&gt;"/>')
+        # the sorting links carry several query parameters, whose separators must be escaped too
+        links = re.findall(r'href="(\?[^"]*)"', resp.content)
+        self.assertTrue(links)
+        for link in links:
+            self.assertNotIn('<', link)
+            self.assertEquals(link.count('&'), link.count('&amp;'))
 
     def test_static_url_generation(self):
         location = Location(['i4x', 'foo', 'bar', 'asset', 'my_file_name.jpg'])
@@ -71,6 +122,81 @@ class UploadTestCase(CourseTestCase):
         self.assertEquals(resp.status_code, 405)
 
 
+@override_settings(ASSET_THUMBNAIL_SIZES=[(128, 128), (320, 320)])
+class ThumbnailTestCase(CourseTestCase):
+    """
+    Unit tests for the background generation of thumbnails
+    """
+    def save_asset(self, name, content_type):
+        location = StaticContent.compute_location(self.course.location.org, self.course.location.course, name)
+        contentstore().save(StaticContent(location, name, content_type, 'not really an image'))
+        return location
+
+    def test_not_an_image(self):
+        location = self.save_asset('sample.txt', 'text/plain')
+        self.assertIsNone(create_thumbnails(location))
+        self.assertIsNone(contentstore().find(location).thumbnail_location)
+
+    def test_thumbnails(self):
+        location = self.save_asset('sample.png', 'image/png')
+
+        def fake_generate_thumbnail(content, dimensions=None, thumbnail_name=None):
+            thumbnail_location = StaticContent.compute_location(
+                content.location.org, content.location.course, thumbnail_name, is_thumbnail=True
+            )
+            return StaticContent(thumbnail_location, thumbnail_name, 'image/jpeg', ''), thumbnail_location
+
+        with patch.object(MongoContentStore, 'generate_thumbnail', side_effect=fake_generate_thumbnail) as generate:
+            thumbnail_location = create_thumbnails(location)
+
+        self.assertEqual(
+            [(128, 128), (320, 320)],
+            [call[1]['dimensions'] for call in generate.call_args_list]
+        )
+        self.assertEqual(
+            ['sample.jpg', 'sample-320x320.jpg'],
+            [call[1]['thumbnail_name'] for call in generate.call_args_list]
+        )
+        # the asset points to the primary thumbnail
+        self.assertEqual(thumbnail_location.name, 'sample.jpg')
+        self.assertEqual(contentstore().find(location).thumbnail_location, thumbnail_location)
+
+    def test_remove_asset_removes_all_thumbnails(self):
+        location = self.save_asset('sample.png', 'image/png')
+        org, course = self.course.location.org, self.course.location.course
+        thumbnail_locations = [
+            StaticContent.compute_location(org, course, name, is_thumbnail=True)
+            for name in ('sample.jpg', 'sample-320x320.jpg')
+        ]
+        for thumbnail_location in thumbnail_locations:
+            contentstore().save(StaticContent(thumbnail_location, thumbnail_location.name, 'image/jpeg', ''))
+        contentstore().set_thumbnail_location(location, thumbnail_locations[0])
+
+        url = reverse('remove_asset', kwargs={'org': org, 'course': course, 'name': self.course.location.name})
+        resp = self.client.post(url, {'location': StaticContent.get_url_path_from_location(location)})
+        self.assertEqual(resp.status_code, 200)
+        for thumbnail_location in thumbnail_locations:
+            self.assertIsNone(contentstore().find(thumbnail_location, throw_on_not_found=False))
+            self.assertIsNotNone(contentstore('trashcan').find(thumbnail_location, throw_on_not_found=False))
+
+    def test_upload_serves_original_until_thumbnailed(self):
+        url = reverse("upload_asset", kwargs={
+            'org': self.course.location.org,
+            'course': self.course.location.course,
+            'coursename': self.course.location.name,
+        })
+        upload = BytesIO("not really an image")
+        upload.name = "upload.png"
+        with patch('contentstore.views.assets.generate_thumbnails') as generate_thumbnails:
+            resp = self.client.post(url, {"file": upload})
+        self.assertEqual(resp.status_code, 200)
+        payload = json.loads(resp.content)
+        self.assertEqual(payload['thumb_url'], payload['url'])
+        generate_thumbnails.delay.assert_called_once_with(
+            StaticContent.compute_location(self.course.location.org, self.course.location.course, 'upload.png').url()
+        )
+
+
 class AssetsToJsonTestCase(TestCase):
     """
     Unit tests for transforming the results of a database call into something
@@ -7,6 +7,7 @@ from django.test.client import Client
 from django.test.utils import override_settings
 from django.conf import settings
 from django.core.urlresolvers import reverse
+from django.core.cache import get_cache
 from path import path
 from tempdir import mkdtemp_clean
 from fs.osfs import OSFS
@@ -25,6 +26,7 @@ from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 
 from xmodule.modulestore import Location, mongo
+from xmodule.modulestore.mongo.base import metadata_cache_key
 from xmodule.modulestore.store_utilities import clone_course
 from xmodule.modulestore.store_utilities import delete_course
 from xmodule.modulestore.django import modulestore
@@ -770,6 +772,49 @@ class ContentStoreToyCourseTest(ModuleStoreTestCase):
         resp = self.client.get('http://localhost:8001/c4x/CDX/123123/asset/&images_circuits_Lab7Solution2.png')
         self.assertEqual(resp.status_code, 400)
 
+    def test_contentserver_conditional_and_range_requests(self):
+        url = '/c4x/edX/toy/asset/range.txt'
+        location = StaticContent.get_location_from_path(url)
+        contentstore().save(StaticContent(location, 'range.txt', 'text/plain', 'abcdefghij'))
+
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content, 'abcdefghij')
+        self.assertEqual(resp['Accept-Ranges'], 'bytes')
+        self.assertEqual(resp['ETag'], '"a925576942e94b2ef57a066101b48876"')
+        self.assertEqual(resp['Cache-Control'], 'no-cache')
+        etag = resp['ETag']
+        last_modified = resp['Last-Modified']
+
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH='"stale"', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(resp.status_code, 200)
+        resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(resp.status_code, 304)
+        resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2000 00:00:00 GMT')
+        self.assertEqual(resp.status_code, 200)
+
+        resp = self.client.get(url, HTTP_RANGE='bytes=2-4')
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp.content, 'cde')
+        self.assertEqual(resp['Content-Range'], 'bytes 2-4/10')
+        resp = self.client.get(url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(resp.content, 'hij')
+        resp = self.client.get(url, HTTP_RANGE='bytes=8-')
+        self.assertEqual(resp.content, 'ij')
+        resp = self.client.get(url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(resp.status_code, 416)
+        self.assertEqual(resp['Content-Range'], 'bytes */10')
+        # a stale If-Range gets the whole content
+        resp = self.client.get(url, HTTP_RANGE='bytes=2-4', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content, 'abcdefghij')
+
+        # uncached content is read from its stream at the range's offset
+        content = contentstore().find(location, as_stream=True)
+        self.assertEqual(''.join(content.stream_data_in_range(3, 5)), 'def')
+
     def test_rewrite_nonportable_links_on_import(self):
         module_store = modulestore('direct')
         content_store = contentstore()
@@ -1525,6 +1570,79 @@ class ContentStoreTest(ModuleStoreTestCase):
 
         self.assertTrue(self.got_signal)
 
+    def test_update(self):
+        module_store = modulestore('direct')
+        CourseFactory.create(org='edX', course='999', display_name='Robot Super Course')
+        vertical_location = Location('i4x', 'edX', '999', 'vertical', 'new_vertical')
+        html_location = Location('i4x', 'edX', '999', 'html', 'new_component')
+        module_store.create_and_save_xmodule(vertical_location)
+        module_store.create_and_save_xmodule(html_location)
+
+        try:
+            module_store.modulestore_update_signal = Signal(providing_args=['modulestore', 'course_id', 'location'])
+
+            self.signalled_locations = []
+
+            def _signal_hander(modulestore=None, course_id=None, location=None, **kwargs):
+                self.signalled_locations.append(location)
+
+            module_store.modulestore_update_signal.connect(_signal_hander)
+
+            module_store.update(
+                vertical_location,
+                data={'foo': 'bar'},
+                children=[html_location.url()],
+                metadata={'display_name': 'Updated'}
+            )
+
+        finally:
+            module_store.modulestore_update_signal = None
+
+        self.assertEqual([vertical_location], self.signalled_locations)
+        vertical = module_store.get_item(vertical_location)
+        self.assertEqual([html_location.url()], vertical.children)
+        self.assertEqual('Updated', vertical.display_name)
+        self.assertEqual({'foo': 'bar'}, vertical.xblock_kvs._data)
+
+    def test_bulk_write_operations(self):
+        module_store = modulestore('direct')
+        CourseFactory.create(org='edX', course='999', display_name='Robot Super Course')
+        vertical_location = Location('i4x', 'edX', '999', 'vertical', 'bulk_vertical')
+        html_location = Location('i4x', 'edX', '999', 'html', 'bulk_html')
+
+        try:
+            module_store.modulestore_update_signal = Signal(providing_args=['modulestore', 'course_id', 'location'])
+
+            self.signalled_locations = []
+
+            def _signal_hander(modulestore=None, course_id=None, location=None, **kwargs):
+                self.signalled_locations.append(location)
+
+            module_store.modulestore_update_signal.connect(_signal_hander)
+
+            with mock.patch.object(module_store.collection, 'insert', wraps=module_store.collection.insert) as insert:
+                with module_store.bulk_write_operations(vertical_location):
+                    module_store.update(vertical_location, data={}, children=[html_location.url()],
+                                        metadata={'display_name': 'Bulk'})
+                    module_store.update(html_location, data='<p>bulk</p>', metadata={})
+
+                    # nothing is written yet
+                    self.assertEqual(0, module_store.collection.find({'_id.name': {'$in': ['bulk_vertical', 'bulk_html']}}).count())
+                    self.assertEqual([], self.signalled_locations)
+
+                # both modules are inserted at once
+                self.assertEqual(1, insert.call_count)
+
+        finally:
+            module_store.modulestore_update_signal = None
+
+        self.assertEqual([vertical_location], self.signalled_locations)
+        vertical = module_store.get_item(vertical_location)
+        self.assertEqual([html_location.url()], vertical.children)
+        self.assertEqual('Bulk', vertical.display_name)
+        self.assertEqual('<p>bulk</p>', module_store.get_item(html_location).data)
+        self.assertEqual([vertical_location], module_store.get_parent_locations(html_location, None))
+
     def test_metadata_inheritance(self):
         module_store = modulestore('direct')
         import_from_xml(module_store, 'common/test/data/', ['toy'])
@@ -1571,6 +1689,51 @@ class ContentStoreTest(ModuleStoreTestCase):
 
         self.assertEqual(timedelta(1), new_module.lms.graceperiod)
 
+    def test_metadata_inheritance_tree_update(self):
+        module_store = modulestore('direct')
+        self.addCleanup(setattr, module_store, 'metadata_inheritance_cache_subsystem',
+                        module_store.metadata_inheritance_cache_subsystem)
+        module_store.metadata_inheritance_cache_subsystem = get_cache('django.core.cache.backends.locmem.LocMemCache')
+        import_from_xml(module_store, 'common/test/data/', ['toy'])
+
+        course_location = Location(['i4x', 'edX', 'toy', 'course', '2012_Fall', None])
+        tree = module_store.get_cached_metadata_inheritance_tree(course_location)
+        version = tree['version']
+
+        # change the inheritable metadata of a chapter, and move a new vertical under it
+        chapter = module_store.get_items(['i4x', 'edX', 'toy', 'chapter', None, None])[0]
+        chapter.lms.graceperiod = timedelta(3)
+        chapter.save()
+        module_store.update_metadata(chapter.location, own_metadata(chapter))
+
+        new_vertical_location = Location('i4x', 'edX', 'toy', 'vertical', 'new_vertical')
+        module_store.create_and_save_xmodule(new_vertical_location)
+        module_store.update_children(chapter.location, chapter.children + [new_vertical_location.url()])
+
+        # changing a leaf doesn't touch the tree
+        html = module_store.get_items(['i4x', 'edX', 'toy', 'html', None, None])[0]
+        module_store.update_metadata(html.location, own_metadata(html))
+
+        tree = module_store.get_cached_metadata_inheritance_tree(course_location)
+        self.assertEqual(version + 3, tree['version'])
+        self.assertEqual(timedelta(3), module_store.get_item(new_vertical_location).lms.graceperiod)
+
+        # the patched tree is the one computed from scratch
+        computed_tree = module_store.compute_metadata_inheritance_tree(course_location)
+        self.assertEqual(computed_tree['inherited'], tree['inherited'])
+        self.assertEqual(computed_tree['containers'], tree['containers'])
+
+        # a tree older than the latest version, as written back by a writer which lost a
+        # race, isn't served
+        stale_tree = dict(tree, version=tree['version'] - 1)
+        module_store.metadata_inheritance_cache_subsystem.set(metadata_cache_key(course_location), stale_tree)
+        tree = module_store.get_cached_metadata_inheritance_tree(course_location)
+        self.assertEqual(version + 4, tree['version'])
+        self.assertEqual(computed_tree['children'], tree['children'])
+
+        # the parents are found from the tree
+        self.assertEqual([chapter.location], module_store.get_parent_locations(new_vertical_location, None))
+
     def test_default_metadata_inheritance(self):
         course = CourseFactory.create()
         vertical = ItemFactory.create(parent_location=course.location)
@@ -4,6 +4,7 @@ import os
 import tarfile
 import shutil
 import cgi
+import urllib
 from tempfile import mkdtemp
 from path import path
 
@@ -16,6 +17,8 @@ from django.core.servers.basehttp import FileWrapper
 from django.core.files.temp import NamedTemporaryFile
 from django.views.decorators.http import require_POST, require_http_methods
 
+from pymongo import ASCENDING, DESCENDING
+
 from mitxmako.shortcuts import render_to_response
 from cache_toolbox.core import del_cached_content
 from auth.authz import create_all_course_groups
@@ -32,10 +35,19 @@ from xmodule.exceptions import NotFoundError, SerializationError
 
 from .access import get_location_and_verify_access
 from util.json_request import JsonResponse
+from contentstore.tasks import generate_thumbnails, get_extra_thumbnail_locations, is_thumbnailable
 
 
 __all__ = ['asset_index', 'upload_asset', 'import_course', 'generate_export_course', 'export_course']
 
+# the sort request parameter's values, and the content store fields they sort by
+ASSET_SORT_FIELDS = {
+    'date_added': 'uploadDate',
+    'display_name': 'displayname',
+}
+DEFAULT_ASSETS_PAGE_SIZE = 50
+MAX_ASSETS_PAGE_SIZE = 500
+
 
 def assets_to_json_dict(assets):
     """
@@ -70,13 +82,53 @@ def assets_to_json_dict(assets):
     return ret
 
 
+def _get_int_param(request, name, default, minimum, maximum=None):
+    """
+    Returns the integer request parameter name, clamped to [minimum, maximum], or default
+    if it's missing or not an integer
+    """
+    try:
+        value = int(request.GET.get(name, default))
+    except ValueError:
+        value = default
+    value = max(value, minimum)
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
+
+
+def _get_asset_listing_params(request):
+    """
+    Returns the page (counting from 1), page size, sort and direction, and text filter of
+    the asset listing request
+    """
+    page = _get_int_param(request, 'page', 1, 1)
+    page_size = _get_int_param(request, 'page_size', DEFAULT_ASSETS_PAGE_SIZE, 1, MAX_ASSETS_PAGE_SIZE)
+    sort = request.GET.get('sort')
+    if sort not in ASSET_SORT_FIELDS:
+        sort = 'date_added'
+    direction = request.GET.get('direction')
+    if direction not in ('asc', 'desc'):
+        # the newest files first, but names alphabetically
+        direction = 'desc' if sort == 'date_added' else 'asc'
+    text = request.GET.get('text', '').strip()
+    return page, page_size, sort, direction, text
+
+
 @login_required
 @ensure_csrf_cookie
 def asset_index(request, org, course, name):
     """
-    Display an editable asset library
+    Display an editable asset library, one page at a time
 
     org, course, name: Attributes of the Location for the item to edit
+
+    GET parameters:
+        page: the page to display, counting from 1
+        page_size: the number of assets per page
+        sort: 'date_added' (the default) or 'display_name'
+        direction: 'asc' or 'desc'
+        text: only list the assets whose names contain text
     """
     location = get_location_and_verify_access(request, org, course, name)
 
@@ -88,14 +140,30 @@ def asset_index(request, org, course, name):
 
     course_module = modulestore().get_item(location)
 
+    page, page_size, sort, direction, text = _get_asset_listing_params(request)
     course_reference = StaticContent.compute_location(org, course, name)
-    assets = contentstore().get_all_content_for_course(course_reference)
-
-    # sort in reverse upload date order
-    assets = sorted(assets, key=lambda asset: asset['uploadDate'], reverse=True)
+    assets, total_count = contentstore().get_content_page_for_course(
+        course_reference,
+        start=(page - 1) * page_size,
+        maxresults=page_size,
+        sort=[(ASSET_SORT_FIELDS[sort], ASCENDING if direction == 'asc' else DESCENDING)],
+        text=text or None,
+    )
+    num_pages = max((total_count + page_size - 1) // page_size, 1)
 
     if request.META.get('HTTP_ACCEPT', "").startswith("application/json"):
-        return JsonResponse(assets_to_json_dict(assets))
+        start = (page - 1) * page_size
+        return JsonResponse({
+            'start': start,
+            'end': start + len(assets),
+            'page': page,
+            'pageSize': page_size,
+            'numPages': num_pages,
+            'totalCount': total_count,
+            'sort': sort,
+            'direction': direction,
+            'assets': assets_to_json_dict(assets),
+        })
 
     asset_display = []
     for asset in assets:
@@ -111,13 +179,38 @@ def asset_index(request, org, course, name):
         # note, due to the schema change we may not have a 'thumbnail_location' in the result set
         _thumbnail_location = asset.get('thumbnail_location', None)
         thumbnail_location = Location(_thumbnail_location) if _thumbnail_location is not None else None
-        display_info['thumb_url'] = StaticContent.get_url_path_from_location(thumbnail_location) if thumbnail_location is not None else None
+        if thumbnail_location is not None:
+            display_info['thumb_url'] = StaticContent.get_url_path_from_location(thumbnail_location)
+        elif is_thumbnailable(asset.get('contentType')):
+            # the thumbnails are still being generated
+            display_info['thumb_url'] = display_info['url']
+        else:
+            display_info['thumb_url'] = None
 
         asset_display.append(display_info)
 
+    def page_url(page_number, **params):
+        """
+        Returns the URL of the given page of this listing, w/ params overriding its parameters
+        """
+        query = {'page': page_number, 'sort': sort, 'direction': direction}
+        if page_size != DEFAULT_ASSETS_PAGE_SIZE:
+            query['page_size'] = page_size
+        if text:
+            query['text'] = text.encode('utf-8')
+        query.update(params)
+        return '?' + urllib.urlencode(query)
+
     return render_to_response('asset_index.html', {
         'context_course': course_module,
         'assets': asset_display,
+        'page': page,
+        'num_pages': num_pages,
+        'total_count': total_count,
+        'sort': sort,
+        'direction': direction,
+        'text': text,
+        'page_url': page_url,
         'upload_asset_callback_url': upload_asset_callback_url,
         'remove_asset_callback_url': reverse('remove_asset', kwargs={
             'org': org,
@@ -165,32 +258,21 @@ def upload_asset(request, org, course, coursename):
     else:
         content = StaticContent(content_loc, filename, mime_type, upload_file.read())
 
-    thumbnail_content = None
-    thumbnail_location = None
-
-    # first let's see if a thumbnail can be created
-    (thumbnail_content, thumbnail_location) = contentstore().generate_thumbnail(content,
-                                                                                tempfile_path=None if not chunked else
-                                                                                upload_file.temporary_file_path())
-
-    # delete cached thumbnail even if one couldn't be created this time (else the old thumbnail will continue to show)
-    del_cached_content(thumbnail_location)
-    # now store thumbnail location only if we could create it
-    if thumbnail_content is not None:
-        content.thumbnail_location = thumbnail_location
-
-    # then commit the content
+    # commit the content; save sets last_modified_at to the database timestamp
     contentstore().save(content)
     del_cached_content(content.location)
 
-    # readback the saved content - we need the database timestamp
-    readback = contentstore().find(content.location)
+    # thumbnails are generated in the background; until they exist, an image is its own thumbnail
+    thumb_url = None
+    if is_thumbnailable(mime_type):
+        generate_thumbnails.delay(content.location.url())
+        thumb_url = StaticContent.get_url_path_from_location(content.location)
 
     response_payload = {'displayname': content.name,
-                        'uploadDate': get_default_time_display(readback.last_modified_at),
+                        'uploadDate': get_default_time_display(content.last_modified_at),
                         'url': StaticContent.get_url_path_from_location(content.location),
                         'portable_url': StaticContent.get_static_path_from_location(content.location),
-                        'thumb_url': StaticContent.get_url_path_from_location(thumbnail_location) if thumbnail_content is not None else None,
+                        'thumb_url': thumb_url,
                         'msg': 'Upload completed'
                         }
 
@@ -229,10 +311,13 @@ def remove_asset(request, org, course, name):
     # ok, save the content into the trashcan
     contentstore('trashcan').save(content)
 
-    # see if there is a thumbnail as well, if so move that as well
+    # see if there are thumbnails as well (one for each size), if so move those as well
+    thumbnail_locations = get_extra_thumbnail_locations(content.location)
     if content.thumbnail_location is not None:
+        thumbnail_locations.insert(0, content.thumbnail_location)
+    for thumbnail_location in thumbnail_locations:
         try:
-            thumbnail_content = contentstore().find(content.thumbnail_location)
+            thumbnail_content = contentstore().find(thumbnail_location)
             contentstore('trashcan').save(thumbnail_content)
             # hard delete thumbnail from origin
             contentstore().delete(thumbnail_content.get_id())
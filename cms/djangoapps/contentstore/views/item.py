@@ -40,18 +40,17 @@ def save_item(request):
 
     store = get_modulestore(Location(item_location))
 
-    if request.POST.get('data') is not None:
-        data = request.POST['data']
-        store.update_item(item_location, data)
+    data = request.POST.get('data')
 
     # cdodge: note calling request.POST.get('children') will return None if children is an empty array
     # so it lead to a bug whereby the last component to be deleted in the UI was not actually
     # deleting the children object from the children collection
+    children = None
     if 'children' in request.POST and request.POST['children'] is not None:
         children = request.POST['children']
-        store.update_children(item_location, children)
 
     # cdodge: also commit any metadata which might have been passed along
+    metadata = None
     if request.POST.get('nullout') is not None or request.POST.get('metadata') is not None:
         # the postback is not the complete metadata, as there's system metadata which is
         # not presented to the end-user for editing. So let's fetch the original and
@@ -76,8 +75,10 @@ def save_item(request):
         # Save the data that we've just changed to the underlying
         # MongoKeyValueStore before we update the mongo datastore.
         existing_item.save()
-        # commit to datastore
-        store.update_metadata(item_location, own_metadata(existing_item))
+        metadata = own_metadata(existing_item)
+
+    # commit to datastore
+    store.update(item_location, data=data, children=children, metadata=metadata)
 
     return JsonResponse()
 
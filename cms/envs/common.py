@@ -160,6 +160,17 @@ MIDDLEWARE_CLASSES = (
     'ratelimitbackend.middleware.RateLimitMiddleware',
 )
 
+# Cache-Control headers of the course assets served by the StaticContentServer, by
+# content type, major content type (e.g. 'video') or 'default'. Authors replace assets
+# while they work; so, make browsers revalidate them every time.
+STATIC_CONTENT_CACHE_CONTROL = {
+    'default': 'no-cache',
+}
+
+# The (width, height) within which each thumbnail of an uploaded image fits. The first
+# is the one Studio shows in the asset list.
+ASSET_THUMBNAIL_SIZES = [(128, 128), (320, 320)]
+
 ############################ SIGNAL HANDLERS ################################
 # This is imported to register the exception signal handling that logs exceptions
 import monitoring.exceptions  # noqa
@@ -1,4 +1,9 @@
+import calendar
+import re
+
+from django.conf import settings
 from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
 
 from xmodule.contentstore.django import contentstore
 from xmodule.contentstore.content import StaticContent, XASSET_LOCATION_TAG
@@ -6,6 +11,9 @@ from xmodule.modulestore import InvalidLocationError
 from cache_toolbox.core import get_cached_content, set_cached_content
 from xmodule.exceptions import NotFoundError
 
+# a single byte range; requests for several ranges get the whole content
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
 
 class StaticContentServer(object):
     def process_request(self, request):
@@ -41,20 +49,141 @@ class StaticContentServer(object):
                 # NOP here, but we may wish to add a "cache-hit" counter in the future
                 pass
 
-            # see if the last-modified at hasn't changed, if not return a 302 (Not Modified)
+            # HTTP dates only have a resolution of seconds
+            last_modified = calendar.timegm(content.last_modified_at.utctimetuple())
+            etag = get_etag(content)
 
-            # convert over the DB persistent last modified timestamp to a HTTP compatible
-            # timestamp, so we can simply compare the strings
-            last_modified_at_str = content.last_modified_at.strftime("%a, %d-%b-%Y %H:%M:%S GMT")
+            if not_modified(request, etag, last_modified):
+                response = HttpResponseNotModified()
+                set_validators(response, content, etag, last_modified)
+                return response
 
-            # see if the client has cached this content, if so then compare the
-            # timestamps, if they are the same then just return a 304 (Not Modified)
-            if 'HTTP_IF_MODIFIED_SINCE' in request.META:
-                if_modified_since = request.META['HTTP_IF_MODIFIED_SINCE']
-                if if_modified_since == last_modified_at_str:
-                    return HttpResponseNotModified()
+            byte_range = None
+            if content.length is not None and 'HTTP_RANGE' in request.META and \
+                    if_range_matches(request, etag, last_modified):
+                byte_range = parse_range(request.META['HTTP_RANGE'], content.length)
+                if byte_range == ():
+                    response = HttpResponse(status=416)
+                    response['Content-Range'] = 'bytes */{0}'.format(content.length)
+                    return response
 
-            response = HttpResponse(content.stream_data(), content_type=content.content_type)
-            response['Last-Modified'] = last_modified_at_str
+            if byte_range:
+                first_byte, last_byte = byte_range
+                response = HttpResponse(
+                    content.stream_data_in_range(first_byte, last_byte),
+                    content_type=content.content_type,
+                    status=206
+                )
+                response['Content-Range'] = 'bytes {0}-{1}/{2}'.format(first_byte, last_byte, content.length)
+                response['Content-Length'] = str(last_byte - first_byte + 1)
+            else:
+                response = HttpResponse(content.stream_data(), content_type=content.content_type)
+                if content.length is not None:
+                    response['Content-Length'] = str(content.length)
 
+            if content.length is not None:
+                response['Accept-Ranges'] = 'bytes'
+            set_validators(response, content, etag, last_modified)
             return response
+
+
+def get_etag(content):
+    """
+    Returns the strong ETag of the content, based on the md5 of its data, or
+    None if the digest isn't known
+    """
+    # content cached before content_digest existed won't have the attribute
+    content_digest = getattr(content, 'content_digest', None)
+    if content_digest is None:
+        return None
+    return '"{0}"'.format(content_digest)
+
+
+def not_modified(request, etag, last_modified):
+    """
+    Returns whether the request's conditional headers show that the client's
+    copy of the content is current. As per RFC 2616, If-None-Match takes
+    precedence over If-Modified-Since.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        client_etags = [client_etag.strip() for client_etag in if_none_match.split(',')]
+        return '*' in client_etags or etag in client_etags
+
+    if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+    if if_modified_since is not None:
+        if_modified_since = parse_http_date_safe(if_modified_since)
+        return if_modified_since is not None and last_modified <= if_modified_since
+
+    return False
+
+
+def if_range_matches(request, etag, last_modified):
+    """
+    Returns whether a Range request should be honored given its If-Range
+    header: if the client's copy is stale, it must get the whole content.
+    """
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def parse_range(range_header, length):
+    """
+    Returns the inclusive (first_byte, last_byte) range the Range header asks
+    for in content of the given length, () if the range can't be satisfied,
+    or None if the header isn't a single byte range the server understands
+    (in which case the whole content should be served).
+    """
+    match = RANGE_RE.match(range_header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if first == '':
+        if last == '':
+            return None
+        # a suffix range: the last N bytes
+        suffix_length = int(last)
+        if suffix_length == 0 or length == 0:
+            return ()
+        return (max(length - suffix_length, 0), length - 1)
+
+    first_byte = int(first)
+    last_byte = int(last) if last != '' else length - 1
+    if last_byte < first_byte:
+        return None
+    if first_byte >= length:
+        return ()
+    return (first_byte, min(last_byte, length - 1))
+
+
+def set_validators(response, content, etag, last_modified):
+    """
+    Sets the headers with which the client can cache and revalidate the content
+    """
+    response['Last-Modified'] = http_date(last_modified)
+    if etag is not None:
+        response['ETag'] = etag
+    cache_control = get_cache_control(content.content_type)
+    if cache_control is not None:
+        response['Cache-Control'] = cache_control
+
+
+def get_cache_control(content_type):
+    """
+    Returns the Cache-Control header for content of the given type from
+    settings.STATIC_CONTENT_CACHE_CONTROL, trying the full content type, then
+    its major type (e.g. 'video'), then 'default'
+    """
+    cache_controls = getattr(settings, 'STATIC_CONTENT_CACHE_CONTROL', {})
+    if content_type:
+        content_type = content_type.split(';')[0].strip().lower()
+        for key in (content_type, content_type.split('/')[0]):
+            if key in cache_controls:
+                return cache_controls[key]
+    return cache_controls.get('default')
@@ -7,9 +7,11 @@ Uses pyparsing to parse. Main function as of now is evaluator().
 import math
 import operator
 import numbers
+
 import numpy
 import scipy.constants
 import calcfunctions
+from lru_cache import LRUCache
 
 # Have numpy ignore errors on functions outside its domain.
 # See http://docs.scipy.org/doc/numpy/reference/generated/numpy.seterr.html
@@ -78,6 +80,10 @@ SUFFIXES = {
 }
 
 
+# The number of parsed expressions to keep for reuse by later evaluations.
+PARSE_CACHE_SIZE = 1000
+
+
 class UndefinedVariable(Exception):
     """
     Indicate when a student inputs a variable which was not expected.
@@ -205,6 +211,70 @@ def eval_product(parse_result):
     return prod
 
 
+# The following evaluation actions are used instead of the ones above when the
+# expression is evaluated over arrays of sample points (see `evaluator`).
+# Arrays aren't `numbers.Number`s, so operators are told apart as strings instead.
+
+def eval_atom_vectorized(parse_result):
+    """
+    Return the value wrapped by the atom, which may be an array.
+    """
+    return next(k for k in parse_result if not isinstance(k, basestring))
+
+
+def eval_power_vectorized(parse_result):
+    """
+    Exponentiate the inputs, which may be arrays, right to left.
+    """
+    parse_result = reversed(
+        [k for k in parse_result if not isinstance(k, basestring)]
+    )
+    return reduce(lambda a, b: b ** a, parse_result)
+
+
+def eval_parallel_vectorized(parse_result):
+    """
+    Compute the parallel resistors operator of inputs which may be arrays.
+
+    Return NaN at the sample points where there is a zero among the inputs.
+    """
+    values = [k for k in parse_result if not isinstance(k, basestring)]
+    if len(values) == 1:
+        return values[0]
+    has_zero = reduce(numpy.logical_or, [numpy.equal(value, 0) for value in values])
+    # numpy's division doesn't raise on zeros; those results are replaced anyway
+    result = numpy.true_divide(1., sum(numpy.true_divide(1., value) for value in values))
+    return numpy.where(has_zero, float('nan'), result)
+
+
+def eval_sum_vectorized(parse_result):
+    """
+    Add the inputs, which may be arrays, keeping in mind their sign.
+    """
+    total = 0.0
+    current_op = operator.add
+    for token in parse_result:
+        if isinstance(token, basestring):
+            current_op = operator.add if token == '+' else operator.sub
+        else:
+            total = current_op(total, token)
+    return total
+
+
+def eval_product_vectorized(parse_result):
+    """
+    Multiply the inputs, which may be arrays.
+    """
+    prod = 1.0
+    current_op = operator.mul
+    for token in parse_result:
+        if isinstance(token, basestring):
+            current_op = operator.mul if token == '*' else operator.truediv
+        else:
+            prod = current_op(prod, token)
+    return prod
+
+
 def add_defaults(variables, functions, case_sensitive):
     """
     Create dictionaries with both the default and user-defined variables.
@@ -221,13 +291,87 @@ def add_defaults(variables, functions, case_sensitive):
     return (all_variables, all_functions)
 
 
-def evaluator(variables, functions, math_expr, case_sensitive=False):
+def build_grammar():
+    """
+    Build the pyparsing grammar of algebraic expressions.
+
+    Its parse result is a tree with proper groupings to reflect parenthesis and
+    order of operations. All operators are left in the tree, and no strings of
+    numbers are parsed into their float versions.
+    """
+    # 0.33 or 7 or .34 or 16.
+    number_part = Word(nums)
+    inner_number = (number_part + Optional("." + Optional(number_part))) | ("." + number_part)
+    # pyparsing allows spaces between tokens--`Combine` prevents that.
+    inner_number = Combine(inner_number)
+
+    # SI suffixes and percent.
+    number_suffix = MatchFirst(Literal(k) for k in SUFFIXES.keys())
+
+    # 0.33k or 17
+    plus_minus = Literal('+') | Literal('-')
+    number = Group(
+        Optional(plus_minus) +
+        inner_number +
+        Optional(CaselessLiteral("E") + Optional(plus_minus) + number_part) +
+        Optional(number_suffix)
+    )
+    number = number("number")
+
+    # Predefine recursive variables.
+    expr = Forward()
+
+    # Handle variables passed in. They must start with letters/underscores
+    # and may contain numbers afterward.
+    inner_varname = Word(alphas + "_", alphanums + "_")
+    varname = Group(inner_varname)("variable")
+
+    # Same thing for functions.
+    function = Group(inner_varname + Suppress("(") + expr + Suppress(")"))("function")
+
+    atom = number | function | varname | "(" + expr + ")"
+    atom = Group(atom)("atom")
+
+    # Do the following in the correct order to preserve order of operation.
+    pow_term = atom + ZeroOrMore("^" + atom)
+    pow_term = Group(pow_term)("power")
+
+    par_term = pow_term + ZeroOrMore('||' + pow_term)  # 5k || 4k
+    par_term = Group(par_term)("parallel")
+
+    prod_term = par_term + ZeroOrMore((Literal('*') | Literal('/')) + par_term)  # 7 * 5 / 4
+    prod_term = Group(prod_term)("product")
+
+    sum_term = Optional(plus_minus) + prod_term + ZeroOrMore(plus_minus + prod_term)  # -5 + 4 - 3
+    sum_term = Group(sum_term)("sum")
+
+    # Finish the recursion.
+    expr << sum_term  # pylint: disable=W0104
+    return expr + stringEnd
+
+
+# Building the grammar is costly, and parsing doesn't change it; so, it's shared.
+GRAMMAR = build_grammar()
+
+
+# Maps each math expression to its (tree, variables used, functions used).
+# The trees must not be modified.
+parse_cache = LRUCache(PARSE_CACHE_SIZE)
+
+
+def evaluator(variables, functions, math_expr, case_sensitive=False, vectorized=False):
     """
     Evaluate an expression; that is, take a string of math and return a float.
 
     -Variables are passed as a dictionary from string to value. They must be
      python numbers.
     -Unary functions are passed as a dictionary from string to function.
+
+    If `vectorized`, the variables may also be numpy arrays of values at a
+    number of sample points, and the expression is evaluated at all of them in
+    one pass, returning an array (or a number, if it uses no arrays). The
+    functions must then accept arrays. Unlike the scalar evaluation, numpy
+    doesn't raise on e.g. division by zero, but returns inf or nan.
     """
     # No need to go further.
     if math_expr.strip() == "":
@@ -259,10 +403,34 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
         'product': eval_product,
         'sum': eval_sum
     }
+    if vectorized:
+        evaluate_actions.update({
+            'atom': eval_atom_vectorized,
+            'power': eval_power_vectorized,
+            'parallel': eval_parallel_vectorized,
+            'product': eval_product_vectorized,
+            'sum': eval_sum_vectorized
+        })
 
     return math_interpreter.reduce_tree(evaluate_actions)
 
 
+def find_names(node, variables_used, functions_used):
+    """
+    Add the names of the variables and functions in the parse tree `node` to
+    the sets `variables_used` and `functions_used`.
+    """
+    if not isinstance(node, ParseResults):
+        return
+    node_name = node.getName()
+    if node_name == 'variable':
+        variables_used.add(node[0])
+    elif node_name == 'function':
+        functions_used.add(node[0])
+    for child in node:
+        find_names(child, variables_used, functions_used)
+
+
 class ParseAugmenter(object):
     """
     Holds the data for a particular parse.
@@ -283,86 +451,35 @@ class ParseAugmenter(object):
         self.variables_used = set()
         self.functions_used = set()
 
-        def vpa(tokens):
-            """
-            When a variable is recognized, store it in `variables_used`.
-            """
-            varname = tokens[0][0]
-            self.variables_used.add(varname)
-
-        def fpa(tokens):
-            """
-            When a function is recognized, store it in `functions_used`.
-            """
-            varname = tokens[0][0]
-            self.functions_used.add(varname)
-
-        self.variable_parse_action = vpa
-        self.function_parse_action = fpa
-
     def parse_algebra(self):
         """
         Parse an algebraic expression into a tree.
 
         Store a `pyparsing.ParseResult` in `self.tree` with proper groupings to
-        reflect parenthesis and order of operations. Leave all operators in the
-        tree and do not parse any strings of numbers into their float versions.
+        reflect parenthesis and order of operations (see `build_grammar`), and
+        the names of the variables and functions it uses.
+
+        The parse doesn't depend on `case_sensitive` or on the values of the
+        variables, so it's taken from `parse_cache` when the same expression
+        was parsed before. The tree is shared then; so, it must not be modified.
 
         Adding the groups and result names makes the `repr()` of the result
         really gross. For debugging, use something like
           print OBJ.tree.asXML()
         """
-        # 0.33 or 7 or .34 or 16.
-        number_part = Word(nums)
-        inner_number = (number_part + Optional("." + Optional(number_part))) | ("." + number_part)
-        # pyparsing allows spaces between tokens--`Combine` prevents that.
-        inner_number = Combine(inner_number)
-
-        # SI suffixes and percent.
-        number_suffix = MatchFirst(Literal(k) for k in SUFFIXES.keys())
-
-        # 0.33k or 17
-        plus_minus = Literal('+') | Literal('-')
-        number = Group(
-            Optional(plus_minus) +
-            inner_number +
-            Optional(CaselessLiteral("E") + Optional(plus_minus) + number_part) +
-            Optional(number_suffix)
-        )
-        number = number("number")
-
-        # Predefine recursive variables.
-        expr = Forward()
-
-        # Handle variables passed in. They must start with letters/underscores
-        # and may contain numbers afterward.
-        inner_varname = Word(alphas + "_", alphanums + "_")
-        varname = Group(inner_varname)("variable")
-        varname.setParseAction(self.variable_parse_action)
-
-        # Same thing for functions.
-        function = Group(inner_varname + Suppress("(") + expr + Suppress(")"))("function")
-        function.setParseAction(self.function_parse_action)
-
-        atom = number | function | varname | "(" + expr + ")"
-        atom = Group(atom)("atom")
-
-        # Do the following in the correct order to preserve order of operation.
-        pow_term = atom + ZeroOrMore("^" + atom)
-        pow_term = Group(pow_term)("power")
-
-        par_term = pow_term + ZeroOrMore('||' + pow_term)  # 5k || 4k
-        par_term = Group(par_term)("parallel")
-
-        prod_term = par_term + ZeroOrMore((Literal('*') | Literal('/')) + par_term)  # 7 * 5 / 4
-        prod_term = Group(prod_term)("product")
-
-        sum_term = Optional(plus_minus) + prod_term + ZeroOrMore(plus_minus + prod_term)  # -5 + 4 - 3
-        sum_term = Group(sum_term)("sum")
-
-        # Finish the recursion.
-        expr << sum_term  # pylint: disable=W0104
-        self.tree = (expr + stringEnd).parseString(self.math_expr)[0]
+        parsed = parse_cache.get(self.math_expr)
+        if parsed is None:
+            tree = GRAMMAR.parseString(self.math_expr)[0]
+            variables_used = set()
+            functions_used = set()
+            find_names(tree, variables_used, functions_used)
+            parsed = (tree, frozenset(variables_used), frozenset(functions_used))
+            parse_cache.set(self.math_expr, parsed)
+
+        tree, variables_used, functions_used = parsed
+        self.tree = tree
+        self.variables_used = set(variables_used)
+        self.functions_used = set(functions_used)
 
     def reduce_tree(self, handle_actions, terminal_converter=None):
         """
@@ -2,9 +2,10 @@ from setuptools import setup
 
 setup(
     name="calc",
-    version="0.1.1",
+    version="0.1.2",
     py_modules=["calc"],
     install_requires=[
+        "lru_cache",
         "pyparsing==1.5.6",
         "numpy",
         "scipy"
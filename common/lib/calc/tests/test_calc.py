@@ -3,6 +3,7 @@ Unit tests for calc.py
 """
 
 import unittest
+import mock
 import numpy
 import calc
 from pyparsing import ParseException
@@ -553,3 +554,50 @@ class EvaluatorTest(unittest.TestCase):
             calc.evaluator({'r1': 5}, {}, "r1+r2")
         with self.assertRaisesRegexp(calc.UndefinedVariable, 'r1 r3'):
             calc.evaluator(variables, {}, "r1*r3", case_sensitive=True)
+
+    def test_parse_cache(self):
+        """
+        Check that an expression is parsed once, and that its parse is reused
+        w/ other variables and case sensitivities
+        """
+        calc.parse_cache.clear()
+        with mock.patch.object(calc.GRAMMAR, 'parseString', wraps=calc.GRAMMAR.parseString) as parse:
+            self.assertEqual(calc.evaluator({'x': 2.0}, {}, '3*x+sin(0)'), 6.0)
+            self.assertEqual(calc.evaluator({'x': -1.0}, {}, '3*x+sin(0)'), -3.0)
+            self.assertEqual(
+                calc.evaluator({'X': 1.0}, {}, '3*x+sin(0)', case_sensitive=False), 3.0
+            )
+            with self.assertRaisesRegexp(calc.UndefinedVariable, 'x'):
+                calc.evaluator({'X': 1.0}, {}, '3*x+sin(0)', case_sensitive=True)
+        self.assertEqual(parse.call_count, 1)
+
+        parser = calc.ParseAugmenter('3*x+sin(0)')
+        parser.parse_algebra()
+        self.assertEqual(parser.variables_used, set(['x']))
+        self.assertEqual(parser.functions_used, set(['sin']))
+        # the sets are the parser's own
+        parser.variables_used.add('y')
+        parser = calc.ParseAugmenter('3*x+sin(0)')
+        parser.parse_algebra()
+        self.assertEqual(parser.variables_used, set(['x']))
+
+    def test_vectorized(self):
+        """
+        Check that evaluating over arrays of sample points gives the same
+        values as evaluating at each point
+        """
+        xs = numpy.array([-2.5, -1.0, 0.5, 3.0])
+        ys = numpy.array([1.0, 2.0, 4.0, 8.0])
+        expressions = [
+            '-x + 2*y - 3', 'x*y/4', 'y^x^2', 'x||y', '0||y', '2.5k * x',
+            'sin(x)^2 + cos(x)^2', 'sqrt(y) * (x + y)', 'i*x', '5'
+        ]
+        for expression in expressions:
+            results = calc.evaluator({'x': xs, 'y': ys}, {}, expression, vectorized=True)
+            results = numpy.broadcast_arrays(results, xs)[0]
+            for x, y, result in zip(xs, ys, results):
+                expected = calc.evaluator({'x': x, 'y': y}, {}, expression)
+                if numpy.isnan(expected):
+                    self.assertTrue(numpy.isnan(result), msg=expression)
+                else:
+                    self.assertAlmostEqual(expected, result, msg=expression)
@@ -14,10 +14,12 @@ This is used by capa_module.
 '''
 
 from datetime import datetime
+import hashlib
 import logging
 import os.path
 import re
 
+from lru_cache import LRUCache
 from lxml import etree
 from xml.sax.saxutils import unescape
 from copy import deepcopy
@@ -61,8 +63,51 @@ html_problem_semantics = [
     "openendedrubric"
 ]
 
+# the number of problems whose parsed XML is kept between loads
+PROBLEM_TEMPLATE_CACHE_SIZE = 500
+
 log = logging.getLogger(__name__)
 
+
+class ProblemTemplate(object):
+    '''
+    The seed-independent part of loading a problem: its XML tree w/ the includes expanded
+    and the ID's of the responses and their inputs assigned.
+    '''
+    def __init__(self, problem_text, tree, responses, included_files):
+        '''
+        problem_text: the problem's XML, w/ startouttext/endouttext converted
+        tree: the problem's element tree, which must not be modified
+        responses: (response, input fields) for each response element in the tree
+        included_files: filename -> version (see LoncapaProblem._get_file_version) for each
+            file the tree includes
+        '''
+        self.problem_text = problem_text
+        self.tree = tree
+        self.included_files = included_files
+        # positions in tree.iter() order, so that the elements can be found in copies
+        positions = dict((element, index) for index, element in enumerate(tree.iter()))
+        self.responses = [
+            (positions[response], [positions[inputfield] for inputfield in inputfields])
+            for response, inputfields in responses
+        ]
+
+    def instantiate(self):
+        '''
+        Returns a copy of the tree which the problem may modify, and the
+        (response, input fields) of each response in the copy
+        '''
+        tree = deepcopy(self.tree)
+        elements = list(tree.iter())
+        responses = [
+            (elements[response], [elements[inputfield] for inputfield in inputfields])
+            for response, inputfields in self.responses
+        ]
+        return tree, responses
+
+
+problem_template_cache = LRUCache(PROBLEM_TEMPLATE_CACHE_SIZE)
+
 #-----------------------------------------------------------------------------
 # main class for this module
 
@@ -113,25 +158,19 @@ class LoncapaProblem(object):
         self.done = state.get('done', False)
         self.input_state = state.get('input_state', {})
 
-        # Convert startouttext and endouttext to proper <text></text>
-        problem_text = re.sub(r"startouttext\s*/", "text", problem_text)
-        problem_text = re.sub(r"endouttext\s*/", "/text", problem_text)
-        self.problem_text = problem_text
-
-        # parse problem XML file into an element tree
-        self.tree = etree.XML(problem_text)
-
-        # handle any <include file="foo"> tags
-        self._process_includes()
+        # The parsing of the XML doesn't depend on the seed; so, it's shared by all the
+        # loads of the problem, each of which gets its own copy of the tree
+        template = self._get_template(problem_text)
+        self.problem_text = template.problem_text
+        self.tree, responses = template.instantiate()
 
         # construct script processor context (eg for customresponse problems)
         self.context = self._extract_context(self.tree)
 
-        # Pre-parse the XML tree: modifies it to add ID's and perform some in-place
-        # transformations.  This also creates the dict (self.responders) of Response
-        # instances for each question in the problem. The dict has keys = xml subtree of
-        # Response, values = Response instance
-        self._preprocess_problem(self.tree)
+        # Performs some in-place transformations of the XML tree, and creates the dict
+        # (self.responders) of Response instances for each question in the problem.
+        # The dict has keys = xml subtree of Response, values = Response instance
+        self._preprocess_problem(self.tree, responses)
 
         if not self.student_answers:  # True when student_answers is an empty dict
             self.set_initial_display()
@@ -406,15 +445,70 @@ class LoncapaProblem(object):
 
     # ======= Private Methods Below ========
 
-    def _process_includes(self):
+    def _get_template(self, problem_text):
+        '''
+        Returns the ProblemTemplate of problem_text, from problem_template_cache if the
+        files it includes haven't changed since it was cached
+        '''
+        key = (
+            hashlib.sha1(problem_text.encode('utf-8') if isinstance(problem_text, unicode) else problem_text).hexdigest(),
+            self.problem_id,
+            getattr(self.system.filestore, 'root_path', None),
+        )
+        template = problem_template_cache.get(key)
+        if template is not None and all(
+            self._get_file_version(filename) == version
+            for filename, version in template.included_files.iteritems()
+        ):
+            return template
+
+        template = self._load_template(problem_text)
+        # the tree is incomplete if an include failed, so only cache it if they all worked
+        if None not in template.included_files.values():
+            problem_template_cache.set(key, template)
+        return template
+
+    def _load_template(self, problem_text):
+        '''
+        Parses problem_text into a new ProblemTemplate
+        '''
+        # Convert startouttext and endouttext to proper <text></text>
+        problem_text = re.sub(r"startouttext\s*/", "text", problem_text)
+        problem_text = re.sub(r"endouttext\s*/", "/text", problem_text)
+
+        # parse problem XML file into an element tree
+        tree = etree.XML(problem_text)
+
+        # handle any <include file="foo"> tags
+        included_files = self._process_includes(tree)
+
+        # add ID's to the responses and their inputs
+        responses = self._assign_response_ids(tree)
+        return ProblemTemplate(problem_text, tree, responses, included_files)
+
+    def _get_file_version(self, filename):
+        '''
+        Returns the modified time and size of filename in the filestore, or None if they're unknown
+        '''
+        try:
+            info = self.system.filestore.getinfo(filename)
+        except Exception:
+            return None
+        return (info.get('modified_time'), info.get('size'))
+
+    def _process_includes(self, tree):
         '''
         Handle any <include file="foo"> tags by reading in the specified file and inserting it
-        into our XML tree.  Fail gracefully if debugging.
+        into the XML tree.  Fail gracefully if debugging.
+
+        Returns filename -> version (None if the include failed) for the included files.
         '''
-        includes = self.tree.findall('.//include')
+        included_files = {}
+        includes = tree.findall('.//include')
         for inc in includes:
             filename = inc.get('file')
             if filename is not None:
+                included_files[filename] = None
                 try:
                     # open using ModuleSystem OSFS filestore
                     ifp = self.system.filestore.open(filename)
@@ -457,6 +551,9 @@ class LoncapaProblem(object):
                 parent.insert(parent.index(inc), incxml)
                 parent.remove(inc)
                 log.debug('Included %s into %s' % (filename, self.problem_id))
+                included_files[filename] = self._get_file_version(filename)
+
+        return included_files
 
     def _extract_system_path(self, script):
         """
@@ -632,19 +729,16 @@ class LoncapaProblem(object):
 
         return tree
 
-    def _preprocess_problem(self, tree):  # private
+    def _assign_response_ids(self, tree):  # private
         '''
         Assign IDs to all the responses
         Assign sub-IDs to all entries (textline, schematic, etc.)
-        Annoted correctness and value
         In-place transformation
 
-        Also create capa Response instances for each responsetype and save as self.responders
-
-        Obtain all responder answers and save as self.responder_answers dict (key = response)
+        Returns (response, input fields) for each response
         '''
         response_id = 1
-        self.responders = {}
+        responses = []
         for response in tree.xpath('//' + "|//".join(response_tag_dict)):
             response_id_str = self.problem_id + "_" + str(response_id)
             # create and save ID for this response
@@ -665,6 +759,21 @@ class LoncapaProblem(object):
                 entry.attrib['id'] = "%s_%i_%i" % (self.problem_id, response_id, answer_id)
                 answer_id = answer_id + 1
 
+            responses.append((response, inputfields))
+
+        return responses
+
+    def _preprocess_problem(self, tree, responses):  # private
+        '''
+        Create capa Response instances for each of the (response, input fields) of the
+        tree, and save as self.responders
+
+        Obtain all responder answers and save as self.responder_answers dict (key = response)
+
+        Assign IDs to the solutions
+        '''
+        self.responders = {}
+        for response, inputfields in responses:
             # instantiate capa Response
             responder = response_tag_dict[response.tag](response, inputfields,
                                                         self.context, self.system)
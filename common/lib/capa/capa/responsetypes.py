@@ -1732,15 +1732,23 @@ class FormulaResponse(LoncapaResponse):
                            samples.split('@')[1].split('#')[0].split(':')))
 
         ranges = dict(zip(variables, sranges))
+        sample_points = []
         for _ in range(numsamples):
-            instructor_variables = self.strip_dict(dict(self.context))
-            student_variables = dict()
             # ranges give numerical ranges for testing
-            for var in ranges:
-                # TODO: allow specified ranges (i.e. integers and complex numbers) for random variables
-                value = random.uniform(*ranges[var])
-                instructor_variables[str(var)] = value
-                student_variables[str(var)] = value
+            # TODO: allow specified ranges (i.e. integers and complex numbers) for random variables
+            sample_points.append(dict(
+                (str(var), random.uniform(*ranges[var])) for var in ranges
+            ))
+
+        correctness = self.check_formula_vectorized(expected, given, sample_points)
+        if correctness is not None:
+            return correctness
+
+        context_variables = self.strip_dict(dict(self.context))
+        for sample_point in sample_points:
+            instructor_variables = dict(context_variables)
+            instructor_variables.update(sample_point)
+            student_variables = dict(sample_point)
             # log.debug('formula: instructor_vars=%s, expected=%s' %
             # (instructor_variables,expected))
 
@@ -1799,6 +1807,46 @@ class FormulaResponse(LoncapaResponse):
                 return "incorrect"
         return "correct"
 
+    def check_formula_vectorized(self, expected, given, sample_points):
+        '''
+        Evaluates both formulas at all the sample points at once over numpy arrays.
+
+        Returns "correct" or "incorrect", or None if the formulas can't be evaluated
+        over arrays, or if a value isn't finite. Such values may stand for errors
+        (e.g. a division by zero) which numpy doesn't raise; so, check_formula then
+        evaluates the formulas one sample point at a time to handle them.
+        '''
+        if not sample_points:
+            return "correct"
+        sample_arrays = dict(
+            (var, numpy.array([sample_point[var] for sample_point in sample_points]))
+            for var in sample_points[0]
+        )
+        instructor_variables = self.strip_dict(dict(self.context))
+        instructor_variables.update(sample_arrays)
+        try:
+            instructor_results = evaluator(
+                instructor_variables, dict(), expected,
+                case_sensitive=self.case_sensitive, vectorized=True
+            )
+            student_results = evaluator(
+                dict(sample_arrays), dict(), given,
+                case_sensitive=self.case_sensitive, vectorized=True
+            )
+            # formulas w/o sampled variables evaluate to a single number
+            instructor_results, student_results, _ = numpy.broadcast_arrays(
+                instructor_results, student_results, numpy.empty(len(sample_points))
+            )
+            if not (numpy.all(numpy.isfinite(instructor_results)) and
+                    numpy.all(numpy.isfinite(student_results))):
+                return None
+            correct = numpy.all(vectorized_compare_with_tolerance(
+                student_results, instructor_results, self.tolerance
+            ))
+        except Exception:
+            return None
+        return "correct" if correct else "incorrect"
+
     def strip_dict(self, d):
         ''' Takes a dict. Returns an identical dict, with all non-word
         keys and all non-numeric values stripped out. All values also
@@ -0,0 +1,70 @@
+"""
+Tests of the sharing of parsed problem XML between loads of a problem
+"""
+import os
+import shutil
+import tempfile
+import textwrap
+import unittest
+
+import fs.osfs
+from mock import patch
+
+from capa.capa_problem import LoncapaProblem, problem_template_cache
+from . import test_system
+
+
+class ProblemTemplateCacheTest(unittest.TestCase):
+
+    xml = textwrap.dedent("""
+        <problem>
+            <script type="loncapa/python">
+        x = random.randint(0, 1000000)
+            </script>
+            <customresponse cfn="check" expect="42">
+                <textline size="10"/>
+            </customresponse>
+            <solution><p>The answer</p></solution>
+        </problem>
+    """)
+
+    def setUp(self):
+        super(ProblemTemplateCacheTest, self).setUp()
+        problem_template_cache.clear()
+        self.addCleanup(problem_template_cache.clear)
+        self.system = test_system()
+
+    def load_problem(self, xml, seed=1):
+        return LoncapaProblem(xml, id='1', seed=seed, system=self.system)
+
+    def test_parsed_once(self):
+        with patch.object(LoncapaProblem, '_load_template', autospec=True,
+                          side_effect=LoncapaProblem._load_template) as load_template:
+            first = self.load_problem(self.xml, seed=1)
+            second = self.load_problem(self.xml, seed=2)
+        self.assertEqual(1, load_template.call_count)
+
+        # each load gets its own tree, responders and context
+        self.assertIsNot(first.tree, second.tree)
+        self.assertNotEqual(first.context['x'], second.context['x'])
+        self.assertEqual(first.get_answer_ids(), second.get_answer_ids())
+        self.assertEqual([['1_2_1']], second.get_answer_ids())
+        self.assertEqual('1_solution_1', second.tree.find('.//solution').get('id'))
+        first.tree.find('.//p').text = 'changed'
+        self.assertEqual('The answer', self.load_problem(self.xml).tree.find('.//p').text)
+
+    def test_changed_include(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.system.filestore = fs.osfs.OSFS(directory)
+        include_path = os.path.join(directory, 'include.xml')
+        xml = '<problem><include file="include.xml"/></problem>'
+
+        with open(include_path, 'w') as include_file:
+            include_file.write('<p>first</p>')
+        self.assertEqual('first', self.load_problem(xml).tree.find('p').text)
+        self.assertEqual('first', self.load_problem(xml).tree.find('p').text)
+
+        with open(include_path, 'w') as include_file:
+            include_file.write('<p>second version</p>')
+        self.assertEqual('second version', self.load_problem(xml).tree.find('p').text)
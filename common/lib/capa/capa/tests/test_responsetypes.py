@@ -14,6 +14,7 @@ from . import new_loncapa_problem, test_system
 
 from capa.responsetypes import LoncapaProblemError, \
     StudentInputError, ResponseError
+from calc import evaluator
 from capa.correctmap import CorrectMap
 from capa.util import convert_files_to_filenames
 from capa.xqueue_interface import dateformat
@@ -579,6 +580,26 @@ class FormulaResponseTest(ResponseTest):
         input_dict = {'1_2_1': '1/0'}
         self.assertRaises(StudentInputError, problem.grade_answers, input_dict)
 
+    def test_vectorized_sampling(self):
+        """
+        See if the formulas are evaluated at all the sample points at once, and
+        if errors numpy doesn't raise are still found.
+        """
+        sample_dict = {'x': (-10, 10), 'y': (1, 10)}
+        problem = self.build_problem(sample_dict=sample_dict,
+                                     num_samples=200,
+                                     tolerance="1%",
+                                     answer="x^2 + sqrt(y) + x||y")
+        with mock.patch('capa.responsetypes.evaluator', wraps=evaluator) as mock_evaluator:
+            self.assert_grade(problem, "sqrt(y) + x*x + (y||x)", "correct")
+            self.assert_grade(problem, "sqrt(y) + x*x", "incorrect")
+        # each formula is evaluated once for all the samples
+        self.assertEqual(mock_evaluator.call_count, 4)
+
+        # dividing arrays by zero gives inf, so it's evaluated a sample at a time
+        input_dict = {'1_2_1': 'x/0'}
+        self.assertRaises(StudentInputError, problem.grade_answers, input_dict)
+
 
 class StringResponseTest(ResponseTest):
     from capa.tests.response_xml_factory import StringResponseXMLFactory
@@ -1,5 +1,6 @@
 from calc import evaluator
 from cmath import isinf
+import numpy
 
 #-----------------------------------------------------------------------------
 #
@@ -31,6 +32,27 @@ def compare_with_tolerance(v1, v2, tol):
         return abs(v1 - v2) <= tolerance
 
 
+def vectorized_compare_with_tolerance(v1, v2, tol):
+    ''' Compare the arrays v1 and v2 elementwise like compare_with_tolerance
+
+     - v1    :  student results (numpy array)
+     - v2    :  instructor results (numpy array)
+     - tol   :  tolerance (string representing a number)
+
+    Returns a boolean array.
+    '''
+    relative = tol.endswith('%')
+    if relative:
+        tolerance_rel = evaluator(dict(), dict(), tol[:-1]) * 0.01
+        tolerance = tolerance_rel * numpy.maximum(numpy.abs(v1), numpy.abs(v2))
+    else:
+        tolerance = evaluator(dict(), dict(), tol)
+
+    # see compare_with_tolerance about infinite inputs
+    infinite = numpy.isinf(v1) | numpy.isinf(v2)
+    return numpy.where(infinite, v1 == v2, numpy.abs(v1 - v2) <= tolerance)
+
+
 def contextualize_text(text, context):  # private
     ''' Takes a string with variables. E.g. $a+$b.
     Does a substitution of those variables from the context '''
@@ -0,0 +1,84 @@
+"""
+A thread safe LRU cache, shared by the parsers and modulestores of a process
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    A thread safe, dict-like cache of at most `max_size` entries, for sharing
+    between the threads of a process.  When full, adding an entry
+    evicts the entry that was least recently read or written.
+
+    If `size_of` is given, it is called on each value and the cache is instead
+    bounded by the sum of those sizes (e.g. an approximate number of bytes).
+    A value bigger than `max_size` on its own is not cached.
+    """
+    def __init__(self, max_size, size_of=None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1, not {0}".format(max_size))
+        self.max_size = max_size
+        self.size_of = size_of
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value at `key`, marking it as the most recently used, or
+        `default` if there is none
+        """
+        with self._lock:
+            try:
+                entry = self._entries.pop(key)
+            except KeyError:
+                return default
+            self._entries[key] = entry
+            return entry[0]
+
+    def set(self, key, value):
+        """
+        Sets the value at `key`, evicting least recently used entries until the
+        cache is within its bound
+        """
+        entry_size = self.size_of(value) if self.size_of is not None else 1
+        with self._lock:
+            self._remove(key)
+            if entry_size > self.max_size:
+                return
+            self._entries[key] = (value, entry_size)
+            self.size += entry_size
+            while self.size > self.max_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def delete(self, key):
+        """
+        Removes the value at `key`, if any
+        """
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        """
+        Removes all the entries
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        """
+        Removes the entry at `key`, if any.  The caller must hold the lock.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
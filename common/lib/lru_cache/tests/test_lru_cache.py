@@ -0,0 +1,54 @@
+"""
+Unit tests for lru_cache.LRUCache
+"""
+
+import unittest
+
+from lru_cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_get_set(self):
+        cache = LRUCache(2)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual('default', cache.get('a', 'default'))
+        cache.set('a', 1)
+        self.assertEqual(1, cache.get('a'))
+        self.assertIn('a', cache)
+        cache.delete('a')
+        self.assertNotIn('a', cache)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # reading 'a' makes 'b' the least recently used
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(2, len(cache))
+        self.assertNotIn('b', cache)
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+
+    def test_max_size(self):
+        with self.assertRaises(ValueError):
+            LRUCache(0)
+
+    def test_size_of(self):
+        cache = LRUCache(10, size_of=len)
+        cache.set('a', 'xxxx')
+        cache.set('b', 'xxxx')
+        self.assertEqual(8, cache.size)
+        # 'c' only fits once 'a' is evicted
+        cache.set('c', 'xxxx')
+        self.assertNotIn('a', cache)
+        self.assertEqual(8, cache.size)
+        # replacing a value accounts for the size of the old one
+        cache.set('b', 'xx')
+        self.assertEqual(6, cache.size)
+        # values bigger than the whole cache aren't kept
+        cache.set('d', 'x' * 11)
+        self.assertNotIn('d', cache)
+        cache.clear()
+        self.assertEqual(0, cache.size)
@@ -865,6 +865,24 @@ class CapaModule(CapaFields, XModule):
             'max_value': score['total'],
         })
 
+    def publish_answers(self, previous_answers):
+        """
+        Publishes a change in the student's saved answers to the system as an event,
+        so that answer distributions can be kept up to date.
+
+        `previous_answers` are the student's saved answers before the change.  Answers
+        are published as strings, since they can be lists or other unhashable values.
+        """
+        previous = dict((answer_id, unicode(answer)) for answer_id, answer in previous_answers.iteritems())
+        current = dict((answer_id, unicode(answer)) for answer_id, answer in self.student_answers.iteritems())
+        if previous == current:
+            return
+        self.system.publish({
+            'event_name': 'answers',
+            'previous': previous,
+            'current': current,
+        })
+
     def check_problem(self, data):
         """
         Checks whether answers to a problem are correct
@@ -902,6 +920,7 @@ class CapaModule(CapaFields, XModule):
                     wait=waittime_between_requests)
                 return {'success': msg, 'html': ''}  # Prompts a modal dialog in ajax callback
 
+        previous_answers = dict(self.student_answers)
         try:
             correct_map = self.lcp.grade_answers(answers)
             self.attempts = self.attempts + 1
@@ -933,6 +952,7 @@ class CapaModule(CapaFields, XModule):
             raise
 
         self.publish_grade()
+        self.publish_answers(previous_answers)
 
         # success = correct if ALL questions in this problem are correct
         success = 'correct'
@@ -1065,9 +1085,11 @@ class CapaModule(CapaFields, XModule):
             return {'success': False,
                     'msg': "Problem needs to be reset prior to save"}
 
+        previous_answers = dict(self.student_answers)
         self.lcp.student_answers = answers
 
         self.set_state_from_lcp()
+        self.publish_answers(previous_answers)
 
         self.system.track_function('save_problem_success', event_info)
         msg = "Your answers have been saved"
@@ -1109,10 +1131,12 @@ class CapaModule(CapaFields, XModule):
             self.choose_new_seed()
 
         # Generate a new problem with either the previous seed or a new seed
+        previous_answers = dict(self.student_answers)
         self.lcp = self.new_lcp(None)
 
         # Pull in the new problem seed
         self.set_state_from_lcp()
+        self.publish_answers(previous_answers)
 
         event_info['new_state'] = self.lcp.get_state()
         self.system.track_function('reset_problem', event_info)
@@ -3,6 +3,13 @@ XASSET_SRCREF_PREFIX = 'xasset:'
 
 XASSET_THUMBNAIL_TAIL_NAME = '.jpg'
 
+# the (width, height) within which thumbnails fit unless other dimensions are asked for
+DEFAULT_THUMBNAIL_DIMENSIONS = (128, 128)
+
+# the size of the chunks in which to stream content whose stream doesn't have its own
+# chunk size (GridFS files do); this is the GridFS default chunk size
+STREAM_CHUNK_SIZE = 256 * 1024
+
 import os
 import logging
 import StringIO
@@ -15,7 +22,7 @@ from PIL import Image
 
 class StaticContent(object):
     def __init__(self, loc, name, content_type, data, last_modified_at=None, thumbnail_location=None, import_path=None,
-                 length=None):
+                 length=None, content_digest=None):
         self.location = loc
         self.name = name   # a display string which can be edited, and thus not part of the location which needs to be fixed
         self.content_type = content_type
@@ -26,14 +33,23 @@ class StaticContent(object):
         # optional information about where this file was imported from. This is needed to support import/export
         # cycles
         self.import_path = import_path
+        # the md5 hex digest of the data, if known
+        self.content_digest = content_digest
 
     @property
     def is_thumbnail(self):
         return self.location.category == 'thumbnail'
 
     @staticmethod
-    def generate_thumbnail_name(original_name):
-        return ('{0}' + XASSET_THUMBNAIL_TAIL_NAME).format(os.path.splitext(original_name)[0])
+    def generate_thumbnail_name(original_name, dimensions=None):
+        """
+        The name of the thumbnail of original_name. Pass the dimensions of any thumbnail
+        other than the primary one (the one its asset's thumbnail_location points to).
+        """
+        name = os.path.splitext(original_name)[0]
+        if dimensions is not None:
+            name = u'{0}-{1}x{2}'.format(name, dimensions[0], dimensions[1])
+        return name + XASSET_THUMBNAIL_TAIL_NAME
 
     @staticmethod
     def compute_location(org, course, name, revision=None, is_thumbnail=False):
@@ -103,20 +119,56 @@ class StaticContent(object):
     def stream_data(self):
         yield self._data
 
+    def stream_data_in_range(self, first_byte, last_byte):
+        """
+        Yields the data from first_byte to last_byte, inclusive
+        """
+        yield self._data[first_byte:last_byte + 1]
+
 
 class StaticContentStream(StaticContent):
     def __init__(self, loc, name, content_type, stream, last_modified_at=None, thumbnail_location=None, import_path=None,
-                 length=None):
+                 length=None, content_digest=None, chunk_size=None):
         super(StaticContentStream, self).__init__(loc, name, content_type, None, last_modified_at=last_modified_at,
                                                   thumbnail_location=thumbnail_location, import_path=import_path,
-                                                  length=length)
+                                                  length=length, content_digest=content_digest)
         self._stream = stream
+        # read in whole chunks of the underlying storage so that each read is a single chunk fetch
+        if chunk_size is None:
+            chunk_size = getattr(stream, 'chunk_size', None) or STREAM_CHUNK_SIZE
+        self.chunk_size = chunk_size
+
+    @property
+    def data(self):
+        """
+        An iterator over the content's data, from the start, so that the content
+        can be saved (e.g. cloned) w/o reading it all into memory
+        """
+        self._stream.seek(0)
+        return self.stream_data()
 
     def stream_data(self):
         while True:
-            chunk = self._stream.read(1024)
+            chunk = self._stream.read(self.chunk_size)
+            if len(chunk) == 0:
+                break
+            yield chunk
+
+    def stream_data_in_range(self, first_byte, last_byte):
+        """
+        Yields the data from first_byte to last_byte, inclusive, seeking the
+        stream to first_byte rather than reading the data before it
+        """
+        self._stream.seek(first_byte)
+        remaining = last_byte - first_byte + 1
+        # read up to the end of first_byte's chunk, then whole chunks
+        read_size = self.chunk_size - first_byte % self.chunk_size
+        while remaining > 0:
+            chunk = self._stream.read(min(read_size, remaining))
             if len(chunk) == 0:
                 break
+            remaining -= len(chunk)
+            read_size = self.chunk_size
             yield chunk
 
     def close(self):
@@ -126,7 +178,7 @@ class StaticContentStream(StaticContent):
         self._stream.seek(0)
         content = StaticContent(self.location, self.name, self.content_type, self._stream.read(),
                                 last_modified_at=self.last_modified_at, thumbnail_location=self.thumbnail_location,
-                                import_path=self.import_path, length=self.length)
+                                import_path=self.import_path, length=self.length, content_digest=self.content_digest)
         return content
 
 
@@ -162,10 +214,38 @@ class ContentStore(object):
         '''
         raise NotImplementedError
 
-    def generate_thumbnail(self, content, tempfile_path=None):
+    def get_content_page_for_course(self, location, start=0, maxresults=None, sort=None, text=None,
+                                    content_type=None):
+        '''
+        Returns one page of the course's static assets, in the format of get_all_content_for_course,
+        along with the number of assets in the whole listing: (assets, total_count).
+
+        start, maxresults: the offset and the maximum size (None for no limit) of the page
+        sort: a list of (field, pymongo.ASCENDING or pymongo.DESCENDING) pairs. The fields
+            may be 'uploadDate' and 'displayname'. Defaults to the most recently uploaded first.
+        text: only list the assets whose display name contains text, ignoring case
+        content_type: only list the assets whose content type starts with content_type (e.g. 'image/')
+        '''
+        raise NotImplementedError
+
+    def set_thumbnail_location(self, location, thumbnail_location):
+        '''
+        Points the content at location to its thumbnail, w/o rewriting the content
+        '''
+        raise NotImplementedError
+
+    def generate_thumbnail(self, content, tempfile_path=None, dimensions=None, thumbnail_name=None):
+        '''
+        Saves a JPEG thumbnail of image content which fits within dimensions (defaults to
+        DEFAULT_THUMBNAIL_DIMENSIONS). Returns the thumbnail content (None if the content
+        isn't an image or can't be thumbnailed) and its location.
+
+        thumbnail_name defaults to the name of the content's primary thumbnail.
+        '''
         thumbnail_content = None
         # use a naming convention to associate originals with the thumbnail
-        thumbnail_name = StaticContent.generate_thumbnail_name(content.location.name)
+        if thumbnail_name is None:
+            thumbnail_name = StaticContent.generate_thumbnail_name(content.location.name)
 
         thumbnail_file_location = StaticContent.compute_location(content.location.org, content.location.course,
                                                                  thumbnail_name, is_thumbnail=True)
@@ -177,7 +257,6 @@ class ContentStore(object):
                 # use PIL to do the thumbnail generation (http://www.pythonware.com/products/pil/)
                 # My understanding is that PIL will maintain aspect ratios while restricting
                 # the max-height/width to be whatever you pass in as 'size'
-                # @todo: move the thumbnail size to a configuration setting?!?
                 if tempfile_path is None:
                     im = Image.open(StringIO.StringIO(content.data))
                 else:
@@ -186,7 +265,7 @@ class ContentStore(object):
                 # I've seen some exceptions from the PIL library when trying to save palletted
                 # PNG files to JPEG. Per the google-universe, they suggest converting to RGB first.
                 im = im.convert('RGB')
-                size = 128, 128
+                size = dimensions if dimensions is not None else DEFAULT_THUMBNAIL_DIMENSIONS
                 im.thumbnail(size, Image.ANTIALIAS)
                 thumbnail_file = StringIO.StringIO()
                 im.save(thumbnail_file, 'JPEG')
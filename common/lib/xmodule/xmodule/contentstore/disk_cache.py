@@ -0,0 +1,134 @@
+"""
+A size bounded, least recently used cache of files in a local directory, which
+can be shared by all the processes of an app server.
+"""
+
+import glob
+import hashlib
+import os
+import tempfile
+
+
+class DiskLRUCache(object):
+    """
+    Caches a version of the data for each key in a file of `directory`, evicting
+    the least recently used files once they take more than `max_size` bytes.
+
+    The files are named by a hash of the key and by the version, so a stale
+    version is never returned even when another process changed the data.
+    Recency is tracked through the files' modification times, which every hit
+    updates.
+    """
+    def __init__(self, directory, max_size):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1, not {0}".format(max_size))
+        self.directory = directory
+        self.max_size = max_size
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _key_prefix(self, key):
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _path(self, key, version):
+        return os.path.join(self.directory, '{0}-{1}'.format(self._key_prefix(key), version))
+
+    def get(self, key, version):
+        """
+        Returns an open file of the cached data for `key` at `version`, or None
+        if it isn't cached
+        """
+        path = self._path(key, version)
+        try:
+            cached_file = open(path, 'rb')
+        except IOError:
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            # another process just evicted it, but we already have it open
+            pass
+        return cached_file
+
+    def set(self, key, version, chunks):
+        """
+        Caches the data in the iterable `chunks` for `key` at `version`, and
+        returns an open file of it. Returns None if the data is too big to
+        cache.
+        """
+        self.delete(key)
+        temp_fd, temp_path = tempfile.mkstemp(prefix='.tmp', dir=self.directory)
+        size = 0
+        try:
+            with os.fdopen(temp_fd, 'wb') as temp_file:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_size:
+                        break
+                    temp_file.write(chunk)
+            if size > self.max_size:
+                os.remove(temp_path)
+                return None
+            # rename so that no process ever reads a partially written file
+            os.rename(temp_path, self._path(key, version))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        cached_file = self.get(key, version)
+        self._evict()
+        return cached_file
+
+    def delete(self, key):
+        """
+        Removes all the cached versions of `key`
+        """
+        for path in glob.glob(os.path.join(self.directory, self._key_prefix(key) + '-*')):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """
+        Removes all the cached files
+        """
+        for path, _, _ in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _entries(self):
+        """
+        Returns (path, size, last used time) for each of the cached files
+        """
+        entries = []
+        for filename in os.listdir(self.directory):
+            if filename.startswith('.tmp'):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        """
+        Removes the least recently used files until the cache fits in max_size
+        """
+        entries = self._entries()
+        total_size = sum(size for _, size, _ in entries)
+        if total_size <= self.max_size:
+            return
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+            if total_size <= self.max_size:
+                break
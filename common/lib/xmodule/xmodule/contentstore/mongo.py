@@ -1,4 +1,4 @@
-from pymongo import Connection
+from pymongo import Connection, ASCENDING, DESCENDING
 import gridfs
 from gridfs.errors import NoFile
 
@@ -9,13 +9,34 @@ from xmodule.contentstore.content import XASSET_LOCATION_TAG
 import logging
 
 from .content import StaticContent, ContentStore, StaticContentStream
+from .disk_cache import DiskLRUCache
 from xmodule.exceptions import NotFoundError
 from fs.osfs import OSFS
 import os
+import re
+import threading
+
+# the fields by which asset listings can be sorted; each has an index for listing
+# a course's assets in its order
+ASSET_SORT_FIELDS = ('uploadDate', 'displayname')
+ASSET_ID_FIELDS = ('_id.tag', '_id.org', '_id.course', '_id.category', '_id.revision')
 
 
 class MongoContentStore(ContentStore):
-    def __init__(self, host, db, port=27017, user=None, password=None, bucket='fs', **kwargs):
+    def __init__(self, host, db, port=27017, user=None, password=None, bucket='fs', stream_chunk_size=None,
+                 disk_cache_dir=None, disk_cache_size=1024 * 1024 * 1024, **kwargs):
+        """
+        stream_chunk_size: the size of the reads when streaming content. Defaults to the
+        GridFS chunk size of each file.
+
+        disk_cache_dir: if given, a local directory in which to cache the content found as
+        streams, so that it's read from GridFS only once per app server. The cached files
+        are keyed by the content's md5; so, changes made through other servers are seen
+        at once. Content that isn't cached yet is streamed from GridFS while a background
+        thread caches it.
+
+        disk_cache_size: the number of bytes of content to keep in disk_cache_dir
+        """
         logging.debug('Using MongoDB for static content serving at host={0} db={1}'.format(host, db))
         _db = Connection(host=host, port=port, **kwargs)[db]
 
@@ -25,6 +46,20 @@ class MongoContentStore(ContentStore):
         self.fs = gridfs.GridFS(_db, bucket)
 
         self.fs_files = _db[bucket + ".files"]   # the underlying collection GridFS uses
+        # Index each course's assets in each order they can be listed in, so that a page
+        # of them is read w/o scanning or sorting the whole course
+        for sort_field in ASSET_SORT_FIELDS:
+            self.fs_files.ensure_index(
+                [(field, ASCENDING) for field in ASSET_ID_FIELDS] + [(sort_field, ASCENDING)]
+            )
+        self.stream_chunk_size = stream_chunk_size
+        if disk_cache_dir is not None:
+            self.disk_cache = DiskLRUCache(disk_cache_dir, disk_cache_size)
+        else:
+            self.disk_cache = None
+        # disk cache key -> the thread caching that content
+        self._disk_cache_fills = {}
+        self._disk_cache_fills_lock = threading.Lock()
 
     def save(self, content):
         id = content.get_id()
@@ -41,9 +76,17 @@ class MongoContentStore(ContentStore):
             else:
                 fp.write(content.data)
 
+        # the database's timestamp, so that callers needn't read the content back for it
+        content.last_modified_at = fp.uploadDate
         return content
 
+    def set_thumbnail_location(self, location, thumbnail_location):
+        id = StaticContent.get_id_from_location(location)
+        self.fs_files.update({'_id': id}, {'$set': {'thumbnail_location': thumbnail_location}})
+
     def delete(self, id):
+        if self.disk_cache is not None:
+            self.disk_cache.delete(self._disk_cache_key(id))
         if self.fs.exists({"_id": id}):
             self.fs.delete(id)
 
@@ -52,22 +95,80 @@ class MongoContentStore(ContentStore):
         try:
             if as_stream:
                 fp = self.fs.get(id)
-                return StaticContentStream(location, fp.displayname, fp.content_type, fp, last_modified_at=fp.uploadDate,
+                # only the file's metadata has been read so far; so, check the disk cache before its data
+                stream = self._get_disk_cached_stream(id, fp)
+                return StaticContentStream(location, fp.displayname, fp.content_type, stream, last_modified_at=fp.uploadDate,
                                            thumbnail_location=fp.thumbnail_location if hasattr(fp, 'thumbnail_location') else None,
                                            import_path=fp.import_path if hasattr(fp, 'import_path') else None,
-                                           length=fp.length)
+                                           length=fp.length, content_digest=fp.md5,
+                                           chunk_size=self.stream_chunk_size or fp.chunk_size)
             else:
                 with self.fs.get(id) as fp:
                     return StaticContent(location, fp.displayname, fp.content_type, fp.read(), last_modified_at=fp.uploadDate,
                                          thumbnail_location=fp.thumbnail_location if hasattr(fp, 'thumbnail_location') else None,
                                          import_path=fp.import_path if hasattr(fp, 'import_path') else None,
-                                         length=fp.length)
+                                         length=fp.length, content_digest=fp.md5)
         except NoFile:
             if throw_on_not_found:
                 raise NotFoundError()
             else:
                 return None
 
+    @staticmethod
+    def _disk_cache_key(id):
+        return u'/'.join(unicode(id[field]) for field in ('tag', 'org', 'course', 'category', 'name', 'revision'))
+
+    def _get_disk_cached_stream(self, id, fp):
+        """
+        Returns a stream of the GridFS file fp's data from the disk cache, or fp itself if
+        there's no disk cache or the file isn't cached. A file which isn't cached is cached
+        in the background rather than before any of it is served: that could take long
+        enough for big files to time out the request.
+        """
+        if self.disk_cache is None or fp.md5 is None:
+            return fp
+        # don't pull a file from GridFS just to find out that it's too big to cache
+        if fp.length > self.disk_cache.max_size:
+            return fp
+        key = self._disk_cache_key(id)
+        cached_file = self.disk_cache.get(key, fp.md5)
+        if cached_file is None:
+            self._start_disk_cache_fill(id, key, fp.md5)
+            return fp
+        fp.close()
+        return cached_file
+
+    def _start_disk_cache_fill(self, id, key, md5):
+        """
+        Starts a thread caching the GridFS file `id` at `key`, unless one already is
+        """
+        with self._disk_cache_fills_lock:
+            if key in self._disk_cache_fills:
+                return
+            thread = threading.Thread(target=self._fill_disk_cache, args=(id, key, md5))
+            thread.daemon = True
+            self._disk_cache_fills[key] = thread
+        thread.start()
+
+    def _fill_disk_cache(self, id, key, md5):
+        """
+        Caches the GridFS file `id` at `key`, if it's still at version `md5`
+        """
+        try:
+            with self.fs.get(id) as fp:
+                if fp.md5 == md5:
+                    cached_file = self.disk_cache.set(key, md5, iter(lambda: fp.read(fp.chunk_size), ''))
+                    if cached_file is not None:
+                        cached_file.close()
+        except NoFile:
+            # deleted since it was found
+            pass
+        except Exception:
+            logging.exception('Unable to cache {0} on disk'.format(key))
+        finally:
+            with self._disk_cache_fills_lock:
+                del self._disk_cache_fills[key]
+
     def get_stream(self, location):
         id = StaticContent.get_id_from_location(location)
         try:
@@ -84,7 +185,7 @@ class MongoContentStore(ContentStore):
             pass
 
     def export(self, location, output_directory):
-        content = self.find(location)
+        content = self.find(location, as_stream=True)
 
         if content.import_path is not None:
             output_directory = output_directory + '/' + os.path.dirname(content.import_path)
@@ -94,8 +195,12 @@ class MongoContentStore(ContentStore):
 
         disk_fs = OSFS(output_directory)
 
-        with disk_fs.open(content.name, 'wb') as asset_file:
-            asset_file.write(content.data)
+        try:
+            with disk_fs.open(content.name, 'wb') as asset_file:
+                for chunk in content.data:
+                    asset_file.write(chunk)
+        finally:
+            content.close()
 
     def export_all_for_course(self, course_location, output_directory):
         assets = self.get_all_content_for_course(course_location)
@@ -135,3 +240,26 @@ class MongoContentStore(ContentStore):
         # 'borrow' the function 'location_to_query' from the Mongo modulestore implementation
         items = self.fs_files.find(location_to_query(course_filter))
         return list(items)
+
+    def get_content_page_for_course(self, location, start=0, maxresults=None, sort=None, text=None,
+                                    content_type=None):
+        course_filter = Location(XASSET_LOCATION_TAG, category="asset", course=location.course, org=location.org)
+        query = location_to_query(course_filter)
+        if text:
+            query['displayname'] = {'$regex': re.escape(text), '$options': 'i'}
+        if content_type:
+            query['contentType'] = {'$regex': '^' + re.escape(content_type)}
+
+        if sort is None:
+            sort = [('uploadDate', DESCENDING)]
+        for field, _ in sort:
+            if field not in ASSET_SORT_FIELDS:
+                raise ValueError("Can't sort assets by {0}".format(field))
+
+        cursor = self.fs_files.find(query).sort(sort)
+        # count() ignores skip and limit, so this is the size of the whole listing
+        total_count = cursor.count()
+        cursor = cursor.skip(start)
+        if maxresults is not None:
+            cursor = cursor.limit(maxresults)
+        return list(cursor), total_count
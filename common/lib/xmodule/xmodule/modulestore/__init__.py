@@ -340,6 +340,18 @@ class ModuleStore(object):
         """
         raise NotImplementedError
 
+    def update(self, location, data=None, children=None, metadata=None, allow_not_found=False):
+        """
+        Set the data, children and metadata of the item specified by the
+        location all at once.  Any of them which is None is left alone.
+
+        location: Something that can be passed to Location
+        data: A nested dictionary of problem data
+        children: A list of child item identifiers
+        metadata: A nested dictionary of module metadata
+        """
+        raise NotImplementedError
+
     def delete_item(self, location):
         """
         Delete an item from this modulestore
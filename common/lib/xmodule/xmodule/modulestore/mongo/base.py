@@ -15,9 +15,11 @@ structure:
 import pymongo
 import sys
 import logging
-import copy
+import cPickle
+import threading
 
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
 from fs.osfs import OSFS
 from itertools import repeat
 from path import path
@@ -31,6 +33,7 @@ from xmodule.x_module import XModuleDescriptor
 from xmodule.error_module import ErrorDescriptor
 from xblock.runtime import DbModel, KeyValueStore, InvalidScopeError
 from xblock.core import Scope
+from lru_cache import LRUCache
 
 from xmodule.modulestore import ModuleStoreBase, Location, namedtuple_to_son
 from xmodule.modulestore.exceptions import ItemNotFoundError
@@ -260,6 +263,66 @@ def location_to_query(location, wildcard=True):
 
 metadata_cache_key = attrgetter('org', 'course')
 
+# The categories of the modules whose metadata is inherited by their children.
+# Note this is a bit ugly as when we add new categories of containers, we have to add it here
+INHERITANCE_CONTAINER_CATEGORIES = [
+    'course', 'chapter', 'sequential', 'vertical', 'wrapper', 'problemset', 'conditional', 'randomize'
+]
+
+# The revision of draft modules, see xmodule.modulestore.mongo.draft
+DRAFT_REVISION = 'draft'
+
+# How many writes bulk_write_operations buffers before sending them to Mongo
+BULK_WRITE_BATCH_SIZE = 1000
+
+
+def _record_from_update(location, update):
+    """
+    Returns the record an upserting $set of `update` creates for a new module at `location`
+    """
+    record = {'_id': location.dict()}
+    for key, value in update.iteritems():
+        target = record
+        path = key.split('.')
+        for part in path[:-1]:
+            target = target.setdefault(part, {})
+        target[path[-1]] = value
+    return record
+
+
+def _compute_inherited_metadata(tree, url, parent_metadata):
+    """
+    Helper method for computing the metadata inherited by the module at `url` and all
+    its descendants into tree['inherited'], given the metadata it inherits from its parent
+    """
+    container = tree['containers'].get(url)
+    if container is None:
+        # this is likely a leaf node, so let's record what metadata it needs to inherit
+        tree['inherited'][url] = parent_metadata
+        return
+
+    my_metadata = dict(parent_metadata)
+    my_metadata.update(container['metadata'])
+    if url != tree['root']:
+        tree['inherited'][url] = my_metadata
+
+    for child in container['children']:
+        _compute_inherited_metadata(tree, child, my_metadata)
+
+
+def _get_parents(tree):
+    """
+    Returns a dict mapping the url of each module in the course of `tree` to the urls
+    (including the revision) of its parents, computing it the first time
+    """
+    if 'parents' not in tree:
+        parents = {}
+        for parent, children in tree['children'].iteritems():
+            for child in children:
+                parents.setdefault(child, []).append(parent)
+        tree['parents'] = parents
+    return tree['parents']
+
 
 class MongoModuleStore(ModuleStoreBase):
     """
@@ -271,7 +334,13 @@ class MongoModuleStore(ModuleStoreBase):
                  port=27017, default_class=None,
                  error_tracker=null_error_tracker,
                  user=None, password=None, request_cache=None,
-                 metadata_inheritance_cache_subsystem=None, **kwargs):
+                 metadata_inheritance_cache_subsystem=None, descriptor_cache_size=0, **kwargs):
+        """
+        descriptor_cache_size: how many module records to keep in the process-level
+            descriptor cache (see _find_records), or 0 not to cache them.  The cache is
+            only used with a metadata_inheritance_cache_subsystem, through which all
+            processes learn of writes to a course.
+        """
 
         super(MongoModuleStore, self).__init__()
 
@@ -305,19 +374,23 @@ class MongoModuleStore(ModuleStoreBase):
         self.ignore_write_events_on_courses = []
         self.request_cache = request_cache
         self.metadata_inheritance_cache_subsystem = metadata_inheritance_cache_subsystem
+        if descriptor_cache_size and metadata_inheritance_cache_subsystem is not None:
+            self.descriptor_cache = LRUCache(descriptor_cache_size)
+        else:
+            self.descriptor_cache = None
+        # the courses in bulk_write_operations and their buffered writes, in each thread
+        self._bulk_writes = threading.local()
 
-    def compute_metadata_inheritance_tree(self, location):
-        '''
-        TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
-        '''
+    def _get_tree_records(self, query):
+        """
+        Returns a pair of dicts for the modules matching `query`:
 
-        # get all collections in the course, this query should not return any leaf nodes
-        # note this is a bit ugly as when we add new categories of containers, we have to add it here
-        query = {'_id.org': location.org,
-                 '_id.course': location.course,
-                 '_id.category': {'$in': ['course', 'chapter', 'sequential', 'vertical',
-                                          'wrapper', 'problemset', 'conditional', 'randomize']}
-                 }
+        - mapping the url of each container to its children and inheritable metadata,
+          collating between draft and non-draft versions of the container (draft
+          verticals can have children which are not in the non-draft version)
+        - mapping the url (including the revision) of each module which has children
+          to its children
+        """
         # we just want the Location, children, and inheritable metadata
         record_filter = {'_id': 1, 'definition.children': 1}
 
@@ -326,97 +399,202 @@ class MongoModuleStore(ModuleStoreBase):
         for attr in INHERITABLE_METADATA:
             record_filter['metadata.{0}'.format(attr)] = 1
 
-        # call out to the DB
-        resultset = self.collection.find(query, record_filter)
-
-        results_by_url = {}
-        root = None
-
-        # now go through the results and order them by the location url
-        for result in resultset:
+        self._flush_bulk_writes()
+        containers = {}
+        children = {}
+        for result in self.collection.find(query, record_filter):
             location = Location(result['_id'])
-            # We need to collate between draft and non-draft
-            # i.e. draft verticals can have children which are not in non-draft versions
-            location = location.replace(revision=None)
-            location_url = location.url()
-            if location_url in results_by_url:
-                existing_children = results_by_url[location_url].get('definition', {}).get('children', [])
-                additional_children = result.get('definition', {}).get('children', [])
-                total_children = existing_children + additional_children
-                if 'definition' not in results_by_url[location_url]:
-                    results_by_url[location_url]['definition'] = {}
-                results_by_url[location_url]['definition']['children'] = total_children
-            results_by_url[location.url()] = result
-            if location.category == 'course':
-                root = location.url()
-
-        # now traverse the tree and compute down the inherited metadata
-        metadata_to_inherit = {}
-
-        def _compute_inherited_metadata(url):
-            """
-            Helper method for computing inherited metadata for a specific location url
-            """
+            result_children = result.get('definition', {}).get('children', [])
+            if result_children:
+                children[location.url()] = result_children
+            if location.category not in INHERITANCE_CONTAINER_CATEGORIES:
+                continue
+
+            container = containers.setdefault(
+                location.replace(revision=None).url(), {'children': [], 'metadata': {}}
+            )
+            for child in result_children:
+                if child not in container['children']:
+                    container['children'].append(child)
             # check for presence of metadata key. Note that a given module may not yet be fully formed.
             # example: update_item -> update_children -> update_metadata sequence on new item create
             # if we get called here without update_metadata called first then 'metadata' hasn't been set
-            # as we're not fully transactional at the DB layer. Same comment applies to below key name
-            # check
-            my_metadata = results_by_url[url].get('metadata', {})
-
-            # go through all the children and recurse, but only if we have
-            # in the result set. Remember results will not contain leaf nodes
-            for child in results_by_url[url].get('definition', {}).get('children', []):
-                if child in results_by_url:
-                    new_child_metadata = copy.deepcopy(my_metadata)
-                    new_child_metadata.update(results_by_url[child].get('metadata', {}))
-                    results_by_url[child]['metadata'] = new_child_metadata
-                    metadata_to_inherit[child] = new_child_metadata
-                    _compute_inherited_metadata(child)
-                else:
-                    # this is likely a leaf node, so let's record what metadata we need to inherit
-                    metadata_to_inherit[child] = my_metadata
+            # as we're not fully transactional at the DB layer.
+            if location.revision == DRAFT_REVISION or not container['metadata']:
+                container['metadata'] = result.get('metadata', {})
+        return containers, children
+
+    def compute_metadata_inheritance_tree(self, location):
+        '''
+        Returns the metadata inheritance tree of the course of `location`: a dict with the
+        children and own inheritable metadata of every container in the course ('containers'),
+        the url of the course ('root'), the metadata every module in the course inherits
+        ('inherited') and the children of every module in the course which has any
+        ('children', from which get_parent_locations finds parents).
 
+        TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
+        '''
+
+        # get all collections in the course, and whatever else has children, this query
+        # should not return any leaf nodes
+        query = {'_id.org': location.org,
+                 '_id.course': location.course,
+                 '$or': [
+                     {'_id.category': {'$in': INHERITANCE_CONTAINER_CATEGORIES}},
+                     {'definition.children.0': {'$exists': True}},
+                 ]}
+        containers, children = self._get_tree_records(query)
+
+        root = None
+        for url in containers:
+            if Location(url).category == 'course':
+                root = url
+
+        tree = {'version': 0, 'root': root, 'containers': containers, 'inherited': {}, 'children': children}
         if root is not None:
-            _compute_inherited_metadata(root)
+            _compute_inherited_metadata(tree, root, {})
+
+        return tree
+
+    def _patch_metadata_inheritance_tree(self, tree, location):
+        """
+        Update `tree` for the changes written to the module at `location`, re-reading just
+        that module and, if it's a container, recomputing the metadata inherited by its
+        descendants
+        """
+        location = location.replace(revision=None)
+        url = location.url()
+        query = location_to_query(location, wildcard=False)
+        del query['_id.revision']
+        records, children = self._get_tree_records(query)
+
+        tree['children'].pop(url, None)
+        tree['children'].pop(location.replace(revision=DRAFT_REVISION).url(), None)
+        tree['children'].update(children)
+        # the parents are recomputed when next needed
+        tree.pop('parents', None)
+
+        if location.category not in INHERITANCE_CONTAINER_CATEGORIES:
+            return
+        containers = tree['containers']
+
+        # forget what the container's old descendants inherited
+        to_forget = [url]
+        forgotten = set()
+        while to_forget:
+            descendant = to_forget.pop()
+            if descendant in forgotten:
+                continue
+            forgotten.add(descendant)
+            tree['inherited'].pop(descendant, None)
+            to_forget.extend(containers.get(descendant, {}).get('children', []))
+
+        containers.pop(url, None)
+        containers.update(records)
+        if url in containers and location.category == 'course':
+            tree['root'] = url
+
+        root = tree['root']
+        if url == root:
+            if url in containers:
+                _compute_inherited_metadata(tree, url, {})
+            return
+
+        for parent_url, parent in containers.iteritems():
+            if url in parent['children'] and (parent_url == root or parent_url in tree['inherited']):
+                if parent_url == root:
+                    parent_metadata = containers[root]['metadata']
+                else:
+                    parent_metadata = tree['inherited'][parent_url]
+                _compute_inherited_metadata(tree, url, parent_metadata)
+                return
+        # otherwise the container isn't in the course (yet), so it doesn't inherit anything
 
-        return metadata_to_inherit
+    def _next_metadata_inheritance_version(self, key):
+        """
+        Bump and return the version of the cached metadata inheritance tree at `key`
+        """
+        version_key = key + ('version',)
+        try:
+            return self.metadata_inheritance_cache_subsystem.incr(version_key)
+        except ValueError:
+            # the version expired or was never set
+            self.metadata_inheritance_cache_subsystem.set(version_key, 1)
+            return 1
+
+    def _set_cached_metadata_inheritance_tree(self, key, tree):
+        """
+        Writes `tree` to the metadata_inheritance_cache_subsystem at `key`, unless another
+        process has bumped the version since `tree['version']` was taken, in which case
+        the other process's tree is the newer one.  Returns whether `tree` was written.
+        """
+        version_key = key + ('version',)
+        if self.metadata_inheritance_cache_subsystem.get(version_key) != tree['version']:
+            return False
+        self.metadata_inheritance_cache_subsystem.set(key, tree)
+        return True
+
+    def _get_request_cached_metadata_inheritance_tree(self, key):
+        """
+        Returns the tree at `key` in the request cache, if any
+        """
+        if self.request_cache is None:
+            return None
+        return self.request_cache.data.get('metadata_inheritance', {}).get(key)
+
+    def _set_request_cached_metadata_inheritance_tree(self, key, tree):
+        """
+        Puts `tree` in the request cache at `key`, or removes what's there if `tree` is None
+        """
+        if self.request_cache is None:
+            return
+        # we can't assume the 'metadata_inheritance' part of the request cache dict has been
+        # defined
+        trees = self.request_cache.data.setdefault('metadata_inheritance', {})
+        if tree is None:
+            trees.pop(key, None)
+        else:
+            trees[key] = tree
 
     def get_cached_metadata_inheritance_tree(self, location, force_refresh=False):
         '''
         TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
         '''
         key = metadata_cache_key(location)
-        tree = {}
+        tree = None
 
         if not force_refresh:
             # see if we are first in the request cache (if present)
-            if self.request_cache is not None and key in self.request_cache.data.get('metadata_inheritance', {}):
-                return self.request_cache.data['metadata_inheritance'][key]
+            tree = self._get_request_cached_metadata_inheritance_tree(key)
+            if tree is not None:
+                return tree
 
             # then look in any caching subsystem (e.g. memcached)
             if self.metadata_inheritance_cache_subsystem is not None:
-                tree = self.metadata_inheritance_cache_subsystem.get(key, {})
+                version_key = key + ('version',)
+                cached = self.metadata_inheritance_cache_subsystem.get_many([key, version_key])
+                tree = cached.get(key)
+                # a writer which lost a race may have written back a tree older than the
+                # latest version; such a tree is recomputed rather than served
+                if tree and tree.get('version') != cached.get(version_key):
+                    tree = None
             else:
                 logging.warning('Running MongoModuleStore without a metadata_inheritance_cache_subsystem. This is OK in localdev and testing environment. Not OK in production.')
 
-        if not tree:
+        # trees cached in an older format don't have what's needed to patch them
+        if not tree or 'children' not in tree:
             # if not in subsystem, or we are on force refresh, then we have to compute
             tree = self.compute_metadata_inheritance_tree(location)
 
             # now write out computed tree to caching subsystem (e.g. memcached), if available
             if self.metadata_inheritance_cache_subsystem is not None:
-                self.metadata_inheritance_cache_subsystem.set(key, tree)
+                tree['version'] = self._next_metadata_inheritance_version(key)
+                self._set_cached_metadata_inheritance_tree(key, tree)
 
         # now populate a request_cache, if available. NOTE, we are outside of the
         # scope of the above if: statement so that after a memcache hit, it'll get
         # put into the request_cache
-        if self.request_cache is not None:
-            # we can't assume the 'metadatat_inheritance' part of the request cache dict has been
-            # defined
-            if 'metadata_inheritance' not in self.request_cache.data:
-                self.request_cache.data['metadata_inheritance'] = {}
-            self.request_cache.data['metadata_inheritance'][key] = tree
+        self._set_request_cached_metadata_inheritance_tree(key, tree)
 
         return tree
 
@@ -429,6 +607,58 @@ class MongoModuleStore(ModuleStoreBase):
         if pseudo_course_id not in self.ignore_write_events_on_courses:
             self.get_cached_metadata_inheritance_tree(location, force_refresh=True)
 
+    def update_cached_metadata_inheritance_tree(self, location, children_changed=True):
+        """
+        Update the cached metadata inheritance tree for the org/course combination for
+        location after a write to location.  `children_changed` is False for writes which
+        can't have changed the children of location.
+
+        Rather than recomputing the whole tree, only the subtree of the written container is
+        patched.  Every write bumps the tree's version, which is kept under its own key
+        next to the tree, so that a process can tell whether the copy it read is still the
+        latest before patching and writing it back; when it isn't, the tree is recomputed.
+        Readers also check the version, so a tree written back by a writer which lost a race
+        is never served.
+        """
+        location = Location(location)
+        if get_course_id_no_run(location) in self.ignore_write_events_on_courses:
+            return
+        # only containers pass metadata down, so writes to anything else only change the tree
+        # through their children
+        if location.category not in INHERITANCE_CONTAINER_CATEGORIES and not children_changed:
+            return
+
+        key = metadata_cache_key(location)
+        if self.metadata_inheritance_cache_subsystem is not None:
+            tree = self.metadata_inheritance_cache_subsystem.get(key)
+        else:
+            tree = self._get_request_cached_metadata_inheritance_tree(key)
+
+        if not tree or 'children' not in tree:
+            # nothing to patch: the tree gets computed the next time it's needed
+            self._set_request_cached_metadata_inheritance_tree(key, None)
+            return
+
+        if self.metadata_inheritance_cache_subsystem is None:
+            self._patch_metadata_inheritance_tree(tree, location)
+            tree['version'] += 1
+            return
+
+        version = self._next_metadata_inheritance_version(key)
+        if version != tree['version'] + 1:
+            # the tree was changed by someone else since we read it
+            self.get_cached_metadata_inheritance_tree(location, force_refresh=True)
+            return
+
+        self._patch_metadata_inheritance_tree(tree, location)
+        tree['version'] = version
+        # re-check the version just before writing: another writer may have moved it on
+        # while this one patched, and its tree mustn't be overwritten by this older one
+        if self._set_cached_metadata_inheritance_tree(key, tree):
+            self._set_request_cached_metadata_inheritance_tree(key, tree)
+        else:
+            self._set_request_cached_metadata_inheritance_tree(key, None)
+
     def _clean_item_data(self, item):
         """
         Renames the '_id' field in item to 'location'
@@ -438,10 +668,110 @@ class MongoModuleStore(ModuleStoreBase):
 
     def _query_children_for_cache_children(self, items):
         # first get non-draft in a round-trip
-        query = {
-            '_id': {'$in': [namedtuple_to_son(Location(item)) for item in items]}
-        }
-        return list(self.collection.find(query))
+        return self._find_records([Location(item) for item in items])
+
+    def _get_course_edit_version(self, location):
+        """
+        Returns the token identifying the current version of the course of `location`,
+        which changes on every write to the course, or None if there's no telling.
+
+        The token is shared by all processes through the metadata_inheritance_cache_subsystem,
+        and only read once per request.
+        """
+        key = metadata_cache_key(location) + ('edit_version',)
+        versions = {}
+        if self.request_cache is not None:
+            versions = self.request_cache.data.setdefault('course_edit_version', {})
+        if key not in versions:
+            if self.metadata_inheritance_cache_subsystem is None:
+                # other processes couldn't tell this one about their writes
+                return None
+            # add, rather than set, so that concurrent first readers agree on the token
+            self.metadata_inheritance_cache_subsystem.add(key, uuid4().hex)
+            versions[key] = self.metadata_inheritance_cache_subsystem.get(key)
+        return versions[key]
+
+    def _bump_course_edit_version(self, location):
+        """
+        Change the token identifying the current version of the course of `location`, so
+        that no process uses the records it cached before the write to `location`.  This
+        must be called after the write, lest the old record is cached for the new version.
+        """
+        if self.metadata_inheritance_cache_subsystem is None:
+            return
+        key = metadata_cache_key(location) + ('edit_version',)
+        version = uuid4().hex
+        self.metadata_inheritance_cache_subsystem.set(key, version)
+        if self.request_cache is not None:
+            self.request_cache.data.setdefault('course_edit_version', {})[key] = version
+
+    def _descriptor_cache_key(self, location):
+        """
+        Returns the key of the record at `location` in the descriptor cache, or None if it
+        can't be cached
+        """
+        if self.descriptor_cache is None:
+            return None
+        version = self._get_course_edit_version(location)
+        if version is None:
+            return None
+        return (version, location.url())
+
+    def _get_cached_record(self, cache_key):
+        """
+        Returns a copy of the record cached at `cache_key` (which is free for the caller to
+        modify), False if the record is cached as not existing, or None if it isn't cached
+        """
+        if cache_key is None:
+            return None
+        record = self.descriptor_cache.get(cache_key)
+        if record:
+            return cPickle.loads(record)
+        return record
+
+    def _cache_record(self, cache_key, record):
+        """
+        Caches `record` (None if it doesn't exist) at `cache_key`, if it can be cached
+        """
+        if cache_key is not None:
+            self.descriptor_cache.set(
+                cache_key,
+                False if record is None else cPickle.dumps(record, cPickle.HIGHEST_PROTOCOL)
+            )
+
+    def _find_records(self, locations):
+        """
+        Returns the records of the modules at `locations` which exist.
+
+        The records are read from the process-level descriptor cache, if enabled, and the
+        rest are queried in one round-trip.  Cached records are keyed by the version of
+        their course as well as their location, so they are never used after a write to
+        the course.
+        """
+        # send any buffered writes first, as they change the course version
+        self._flush_bulk_writes()
+        records = []
+        to_query = {}
+        for location in locations:
+            cache_key = self._descriptor_cache_key(location)
+            record = self._get_cached_record(cache_key)
+            if record is None:
+                to_query[location.url()] = (location, cache_key)
+            elif record:
+                records.append(record)
+
+        if to_query:
+            query = {
+                '_id': {'$in': [namedtuple_to_son(location) for location, __ in to_query.values()]}
+            }
+            found = dict((Location(record['_id']).url(), record) for record in self.collection.find(query))
+            for url, (location, cache_key) in to_query.iteritems():
+                record = found.get(url)
+                self._cache_record(cache_key, record)
+                if record is not None:
+                    records.append(record)
+
+        return records
 
     def _cache_children(self, items, depth=0):
         """
@@ -491,7 +821,7 @@ class MongoModuleStore(ModuleStoreBase):
 
         cached_metadata = {}
         if apply_cached_metadata:
-            cached_metadata = self.get_cached_metadata_inheritance_tree(Location(item['location']))
+            cached_metadata = self.get_cached_metadata_inheritance_tree(Location(item['location']))['inherited']
 
         # TODO (cdodge): When the 'split module store' work has been completed, we should remove
         # the 'metadata_inheritance_tree' parameter
@@ -539,11 +869,17 @@ class MongoModuleStore(ModuleStoreBase):
         specified, returns the latest.  If the item is not present, raise
         ItemNotFoundError.
         '''
-        item = self.collection.find_one(
-            location_to_query(location, wildcard=False),
-            sort=[('revision', pymongo.ASCENDING)],
-        )
+        location = Location(location)
+        self._flush_bulk_writes()
+        cache_key = self._descriptor_cache_key(location)
+        item = self._get_cached_record(cache_key)
         if item is None:
+            item = self.collection.find_one(
+                location_to_query(location, wildcard=False),
+                sort=[('revision', pymongo.ASCENDING)],
+            )
+            self._cache_record(cache_key, item)
+        if not item:
             raise ItemNotFoundError(location)
         return item
 
@@ -591,6 +927,7 @@ class MongoModuleStore(ModuleStoreBase):
         return self.get_item(location, depth=depth)
 
     def get_items(self, location, course_id=None, depth=0):
+        self._flush_bulk_writes()
         items = self.collection.find(
             location_to_query(location),
             sort=[('revision', pymongo.ASCENDING)],
@@ -646,6 +983,7 @@ class MongoModuleStore(ModuleStoreBase):
         # Save any changes to the xmodule to the MongoKeyValueStore
         xmodule.save()
         # split mongo's persist_dag is more general and useful.
+        self._flush_bulk_writes()
         self.collection.save({
                 '_id': xmodule.location.dict(),
                 'metadata': own_metadata(xmodule),
@@ -654,8 +992,9 @@ class MongoModuleStore(ModuleStoreBase):
                     'children': xmodule.children if xmodule.has_children else []
                 }
             })
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(xmodule.location)
+        self._bump_course_edit_version(xmodule.location)
+        # update the metadata inheritance tree which is cached
+        self.update_cached_metadata_inheritance_tree(xmodule.location)
         self.fire_updated_modulestore_signal(get_course_id_no_run(xmodule.location), xmodule.location)
 
     def create_and_save_xmodule(self, location, definition_data=None, metadata=None, system=None):
@@ -693,10 +1032,107 @@ class MongoModuleStore(ModuleStoreBase):
             course.save()
             self.update_metadata(course.location, course.xblock_kvs._metadata)
 
+    @contextmanager
+    def bulk_write_operations(self, location):
+        """
+        A context for writing a lot to the course of `location` (as when importing or cloning it)
+        in this thread.
+
+        Within it, the writes of update, update_item, update_children and update_metadata to the
+        course are buffered and sent to Mongo in batches, with the new modules inserted all at
+        once, and they neither update the cached metadata inheritance tree nor send signals.  On
+        leaving it, the buffered writes are sent, the tree is recomputed and one signal is sent
+        for the course.  Reads, and other writes, send the buffered writes first.
+        """
+        location = Location(location)
+        course_id = get_course_id_no_run(location)
+        courses = self._get_bulk_write_courses()
+        if course_id in courses:
+            # already within bulk_write_operations for the course
+            yield
+            return
+
+        ignoring_writes = course_id in self.ignore_write_events_on_courses
+        if not ignoring_writes:
+            self.ignore_write_events_on_courses.append(course_id)
+        courses.add(course_id)
+        try:
+            yield
+        finally:
+            try:
+                self._flush_bulk_writes()
+            finally:
+                courses.discard(course_id)
+                if not ignoring_writes:
+                    self.ignore_write_events_on_courses.remove(course_id)
+                    self.refresh_cached_metadata_inheritance_tree(location)
+                self.fire_updated_modulestore_signal(course_id, location)
+
+    def _get_bulk_write_courses(self):
+        """
+        Returns the set of the courses within bulk_write_operations in this thread
+        """
+        if not hasattr(self._bulk_writes, 'courses'):
+            self._bulk_writes.courses = set()
+            self._bulk_writes.updates = OrderedDict()
+        return self._bulk_writes.courses
+
+    def _buffer_bulk_write(self, location, update):
+        """
+        Buffers the $set of `update` on the item at `location`, if its course is within
+        bulk_write_operations.  Returns whether it was buffered.
+        """
+        if get_course_id_no_run(location) not in self._get_bulk_write_courses():
+            return False
+
+        updates = self._bulk_writes.updates
+        updates.setdefault(location, {}).update(update)
+        if len(updates) >= BULK_WRITE_BATCH_SIZE:
+            self._flush_bulk_writes()
+        return True
+
+    def _flush_bulk_writes(self):
+        """
+        Sends the writes buffered by bulk_write_operations in this thread to Mongo: one
+        insert for all the new modules, and an update for each of the others
+        """
+        updates = getattr(self._bulk_writes, 'updates', None)
+        if not updates:
+            return
+        self._bulk_writes.updates = OrderedDict()
+
+        existing = set(
+            Location(record['_id'])
+            for record in self.collection.find(
+                {'_id': {'$in': [namedtuple_to_son(location) for location in updates]}},
+                {'_id': True}
+            )
+        )
+        new_records = []
+        for location, update in updates.iteritems():
+            if location in existing:
+                self.collection.update(
+                    {'_id': location.dict()},
+                    {'$set': update},
+                    multi=False,
+                    upsert=True,
+                    safe=self.collection.safe
+                )
+            else:
+                new_records.append(_record_from_update(location, update))
+        if new_records:
+            self.collection.insert(new_records, safe=self.collection.safe)
+
+        for location in set(location.replace(category=None, name=None, revision=None) for location in updates):
+            self._bump_course_edit_version(location)
+
     def fire_updated_modulestore_signal(self, course_id, location):
         """
         Send a signal using `self.modulestore_update_signal`, if that has been set
         """
+        if course_id in self._get_bulk_write_courses():
+            # bulk_write_operations sends one signal at the end
+            return
         if self.modulestore_update_signal is not None:
             self.modulestore_update_signal.send(self, modulestore=self, course_id=course_id,
                                                 location=location)
@@ -734,6 +1170,9 @@ class MongoModuleStore(ModuleStoreBase):
         if the location doesn't exist
         """
 
+        if self._buffer_bulk_write(Location(location), update):
+            return
+
         # See http://www.mongodb.org/display/DOCS/Updating for
         # atomic update syntax
         result = self.collection.update(
@@ -745,6 +1184,7 @@ class MongoModuleStore(ModuleStoreBase):
             # from overriding our default value set in the init method.
             safe=self.collection.safe
         )
+        self._bump_course_edit_version(Location(location))
         if result['n'] == 0:
             raise ItemNotFoundError(location)
 
@@ -772,8 +1212,8 @@ class MongoModuleStore(ModuleStoreBase):
         """
 
         self._update_single_item(location, {'definition.children': children})
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(Location(location))
+        # update the metadata inheritance tree which is cached
+        self.update_cached_metadata_inheritance_tree(Location(location))
         # fire signal that we've written to DB
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
@@ -785,15 +1225,63 @@ class MongoModuleStore(ModuleStoreBase):
         location: Something that can be passed to Location
         metadata: A nested dictionary of module metadata
         """
+        loc = Location(location)
+        self._update_static_tab_name(loc, metadata)
+
+        self._update_single_item(location, {'metadata': metadata})
+        # update the metadata inheritance tree which is cached
+        self.update_cached_metadata_inheritance_tree(loc, children_changed=False)
+        self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
+
+    def update(self, location, data=None, children=None, metadata=None, allow_not_found=False):
+        """
+        Set the data, children and metadata of the item specified by the location at
+        once: with a single write, a single update of the cached metadata inheritance
+        tree and a single signal.  Any of them which is None is left alone.
+
+        location: Something that can be passed to Location
+        data: A nested dictionary of problem data
+        children: A list of child item identifiers
+        metadata: A nested dictionary of module metadata
+        allow_not_found: as for update_item
+        """
+        loc = Location(location)
+        update = {}
+        if data is not None:
+            update['definition.data'] = data
+        if children is not None:
+            update['definition.children'] = children
+        if metadata is not None:
+            self._update_static_tab_name(loc, metadata)
+            update['metadata'] = metadata
+        if not update:
+            return
+
+        try:
+            self._update_single_item(loc, update)
+        except ItemNotFoundError:
+            if not allow_not_found:
+                raise
+
+        # as for update_item, changing just the data affects neither the tree nor the course
+        if children is not None or metadata is not None:
+            # update the metadata inheritance tree which is cached
+            self.update_cached_metadata_inheritance_tree(loc, children_changed=children is not None)
+            self.fire_updated_modulestore_signal(get_course_id_no_run(loc), loc)
+
+    def _update_static_tab_name(self, location, metadata):
+        """
+        Update the name of the course's tab of the static_tab at location, if it is one, for
+        its new metadata
+        """
         # VS[compat] cdodge: This is a hack because static_tabs also have references from the course module, so
         # if we add one then we need to also add it to the policy information (i.e. metadata)
         # we should remove this once we can break this reference from the course to static tabs
-        loc = Location(location)
-        if loc.category == 'static_tab':
-            course = self.get_course_for_item(loc)
+        if location.category == 'static_tab':
+            course = self.get_course_for_item(location)
             existing_tabs = course.tabs or []
             for tab in existing_tabs:
-                if tab.get('url_slug') == loc.name:
+                if tab.get('url_slug') == location.name:
                     tab['name'] = metadata.get('display_name')
                     break
             course.tabs = existing_tabs
@@ -801,11 +1289,6 @@ class MongoModuleStore(ModuleStoreBase):
             course.save()
             self.update_metadata(course.location, own_metadata(course))
 
-        self._update_single_item(location, {'metadata': metadata})
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(loc)
-        self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
-
     def delete_item(self, location, delete_all_versions=False):
         """
         Delete an item from this modulestore
@@ -825,11 +1308,13 @@ class MongoModuleStore(ModuleStoreBase):
             course.save()
             self.update_metadata(course.location, own_metadata(course))
 
+        self._flush_bulk_writes()
         # Must include this to avoid the django debug toolbar (which defines the deprecated "safe=False")
         # from overriding our default value set in the init method.
         self.collection.remove({'_id': Location(location).dict()}, safe=self.collection.safe)
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(Location(location))
+        self._bump_course_edit_version(Location(location))
+        # update the metadata inheritance tree which is cached
+        self.update_cached_metadata_inheritance_tree(Location(location))
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
     def get_parent_locations(self, location, course_id):
@@ -837,9 +1322,17 @@ class MongoModuleStore(ModuleStoreBase):
         course.  Needed for path_to_location().
         '''
         location = Location.ensure_fully_specified(location)
-        items = self.collection.find({'definition.children': location.url()},
-                                     {'_id': True})
-        return [i['_id'] for i in items]
+        # the cached tree isn't kept up to date while writes are ignored, and when there's
+        # nowhere to cache it, computing it is dearer than querying
+        if (get_course_id_no_run(location) in self.ignore_write_events_on_courses or
+                (self.request_cache is None and self.metadata_inheritance_cache_subsystem is None)):
+            self._flush_bulk_writes()
+            items = self.collection.find({'definition.children': location.url()},
+                                         {'_id': True})
+            return [Location(i['_id']) for i in items]
+
+        tree = self.get_cached_metadata_inheritance_tree(location)
+        return [Location(parent) for parent in _get_parents(tree).get(location.url(), [])]
 
     def get_errored_courses(self):
         """
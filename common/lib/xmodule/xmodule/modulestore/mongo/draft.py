@@ -9,7 +9,7 @@ and otherwise returns i4x://org/course/cat/name).
 from datetime import datetime
 
 from xmodule.exceptions import InvalidVersionError
-from xmodule.modulestore import Location, namedtuple_to_son
+from xmodule.modulestore import Location
 from xmodule.modulestore.exceptions import ItemNotFoundError, DuplicateItemError
 from xmodule.modulestore.inheritance import own_metadata
 from xmodule.modulestore.mongo.base import location_to_query, get_course_id_no_run, MongoModuleStore
@@ -141,6 +141,7 @@ class DraftModuleStore(MongoModuleStore):
 
         :param source: the location of the source (its revision must be None)
         """
+        self._flush_bulk_writes()
         original = self.collection.find_one(location_to_query(source_location))
         draft_location = as_draft(source_location)
         if draft_location.category in DIRECT_ONLY_CATEGORIES:
@@ -150,8 +151,9 @@ class DraftModuleStore(MongoModuleStore):
             self.collection.insert(original)
         except pymongo.errors.DuplicateKeyError:
             raise DuplicateItemError(original['_id'])
+        self._bump_course_edit_version(draft_location)
 
-        self.refresh_cached_metadata_inheritance_tree(draft_location)
+        self.update_cached_metadata_inheritance_tree(draft_location)
         self.fire_updated_modulestore_signal(get_course_id_no_run(draft_location), draft_location)
 
         return self._load_items([original])[0]
@@ -209,6 +211,25 @@ class DraftModuleStore(MongoModuleStore):
 
         return super(DraftModuleStore, self).update_metadata(draft_loc, metadata)
 
+    def update(self, location, data=None, children=None, metadata=None, allow_not_found=False):
+        """
+        Set the data, children and metadata of the draft of the item specified by the
+        location at once, see MongoModuleStore.update
+        """
+        draft_loc = as_draft(location)
+        try:
+            draft_item = self.get_item(location)
+            if not getattr(draft_item, 'is_draft', False):
+                self.convert_to_draft(location)
+        except ItemNotFoundError:
+            if not allow_not_found:
+                raise
+
+        if metadata is not None and 'is_draft' in metadata:
+            del metadata['is_draft']
+
+        return super(DraftModuleStore, self).update(draft_loc, data, children, metadata, allow_not_found)
+
     def delete_item(self, location, delete_all_versions=False):
         """
         Delete an item from this modulestore
@@ -258,10 +279,7 @@ class DraftModuleStore(MongoModuleStore):
             to_process_dict[Location(non_draft["_id"])] = non_draft
 
         # now query all draft content in another round-trip
-        query = {
-            '_id': {'$in': [namedtuple_to_son(as_draft(Location(item))) for item in items]}
-        }
-        to_process_drafts = list(self.collection.find(query))
+        to_process_drafts = self._find_records([as_draft(item) for item in items])
 
         # now we have to go through all drafts and replace the non-draft
         # with the draft. This is because the semantics of the DraftStore is to
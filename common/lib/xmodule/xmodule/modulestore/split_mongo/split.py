@@ -3,8 +3,11 @@ import datetime
 import logging
 import pymongo
 import re
+import time
+import cPickle as pickle
 from importlib import import_module
 from path import path
+from lru_cache import LRUCache
 
 from xmodule.errortracker import null_error_tracker
 from xmodule.x_module import XModuleDescriptor
@@ -39,6 +42,19 @@ log = logging.getLogger(__name__)
 #==============================================================================
 
 
+# Default bound, in approximate bytes, of the process wide cache of course structures
+DEFAULT_STRUCTURE_CACHE_SIZE = 100 * 1024 * 1024
+# Default number of course structure versions for which each thread keeps its descriptors
+DEFAULT_SYSTEM_CACHE_SIZE = 32
+# Default number of seconds a fetched course index entry may be reused
+DEFAULT_INDEX_CACHE_TTL = 5
+# Default number of course structure versions for which to keep the block indexes
+DEFAULT_BLOCK_INDEX_CACHE_SIZE = 100
+# The block fields get_items can look up w/ a block index rather than by scanning the course;
+# 'children' is looked up in the index of parents
+INDEXED_BLOCK_FIELDS = ('category', 'definition', 'children')
+
+
 class SplitMongoModuleStore(ModuleStoreBase):
     """
     A Mongodb backed ModuleStore supporting versions, inheritance,
@@ -48,7 +64,24 @@ class SplitMongoModuleStore(ModuleStoreBase):
                  port=27017, default_class=None,
                  error_tracker=null_error_tracker,
                  user=None, password=None,
+                 structure_cache_size=DEFAULT_STRUCTURE_CACHE_SIZE,
+                 system_cache_size=DEFAULT_SYSTEM_CACHE_SIZE,
+                 index_cache_ttl=DEFAULT_INDEX_CACHE_TTL,
+                 block_index_cache_size=DEFAULT_BLOCK_INDEX_CACHE_SIZE,
                  **kwargs):
+        """
+        structure_cache_size: the approximate number of bytes of course structures to keep in memory,
+        shared by all the threads of the process. 0 disables the cache.
+
+        system_cache_size: the number of course versions for which each thread keeps the loaded descriptors.
+
+        index_cache_ttl: the number of seconds for which a course index entry read by _lookup_course
+        may be reused. Writes through this store invalidate it immediately, but writes from other
+        processes may be missed for that long. 0 disables the cache.
+
+        block_index_cache_size: the number of course versions for which to keep the indexes of blocks
+        by category, definition and parent which get_items and get_parent_locations use.
+        """
 
         ModuleStoreBase.__init__(self)
 
@@ -59,16 +92,24 @@ class SplitMongoModuleStore(ModuleStoreBase):
             **kwargs
         ), db)
 
-        # TODO add caching of structures to thread_cache to prevent repeated fetches (but not index b/c
-        # it changes w/o having a change in id)
         self.course_index = self.db[collection + '.active_versions']
         self.structures = self.db[collection + '.structures']
         self.definitions = self.db[collection + '.definitions']
 
-        # ??? Code review question: those familiar w/ python threading. Should I instead
-        # use django cache? How should I expire entries?
-        # _add_cache could use a lru mechanism to control the cache size?
+        # descriptor systems hold xblocks which aren't thread safe; so, each thread gets its own
         self.thread_cache = threading.local()
+        self.system_cache_size = system_cache_size
+        # structures never change once saved; so, they can be shared w/o invalidation. They're
+        # stored pickled so that no caller can mutate the cached copy.
+        if structure_cache_size > 0:
+            self.structure_cache = LRUCache(structure_cache_size, size_of=len)
+        else:
+            self.structure_cache = None
+        # index entries change w/o changing their id; so, they're only reused for a short time
+        self.index_cache_ttl = index_cache_ttl
+        self.index_cache = LRUCache(1000)
+        # like structures, the indexes of a structure's blocks never need invalidation
+        self.block_index_cache = LRUCache(block_index_cache_size)
 
         if user is not None and password is not None:
             self.db.authenticate(user, password)
@@ -159,7 +200,7 @@ class SplitMongoModuleStore(ModuleStoreBase):
         :param course_version_guid:
         """
         if not hasattr(self.thread_cache, 'course_cache'):
-            self.thread_cache.course_cache = {}
+            self.thread_cache.course_cache = LRUCache(self.system_cache_size)
         system = self.thread_cache.course_cache
         return system.get(course_version_guid)
 
@@ -170,15 +211,79 @@ class SplitMongoModuleStore(ModuleStoreBase):
         :param system:
         """
         if not hasattr(self.thread_cache, 'course_cache'):
-            self.thread_cache.course_cache = {}
-        self.thread_cache.course_cache[course_version_guid] = system
+            self.thread_cache.course_cache = LRUCache(self.system_cache_size)
+        self.thread_cache.course_cache.set(course_version_guid, system)
         return system
 
     def _clear_cache(self):
         """
         Should only be used by testing or something which implements transactional boundary semantics
         """
-        self.thread_cache.course_cache = {}
+        self.thread_cache.course_cache = LRUCache(self.system_cache_size)
+        if self.structure_cache is not None:
+            self.structure_cache.clear()
+        self.index_cache.clear()
+        self.block_index_cache.clear()
+
+    def _get_structure(self, version_guid):
+        """
+        Get the structure w/ the given version guid from the structure cache or the db. Returns a copy
+        which the caller is free to change. Returns None if there's no such structure.
+        """
+        if self.structure_cache is not None:
+            pickled = self.structure_cache.get(version_guid)
+            if pickled is not None:
+                return pickle.loads(pickled)
+        structure = self.structures.find_one({'_id': version_guid})
+        if structure is not None:
+            self._cache_structure(structure)
+        return structure
+
+    def _get_structures(self, version_guids):
+        """
+        Get copies of all of the structures w/ the given version guids, fetching the ones which
+        aren't in the structure cache in one query.
+        """
+        result = []
+        missing = []
+        for version_guid in version_guids:
+            pickled = self.structure_cache.get(version_guid) if self.structure_cache is not None else None
+            if pickled is None:
+                missing.append(version_guid)
+            else:
+                result.append(pickle.loads(pickled))
+        if missing:
+            for structure in self.structures.find({'_id': {'$in': missing}}):
+                self._cache_structure(structure)
+                result.append(structure)
+        return result
+
+    def _cache_structure(self, structure):
+        """
+        Save a copy of the structure in the structure cache. Must only be called w/ structures as
+        saved in the db.
+        """
+        if self.structure_cache is not None:
+            self.structure_cache.set(structure['_id'], pickle.dumps(structure, pickle.HIGHEST_PROTOCOL))
+
+    def _get_course_index(self, course_id):
+        """
+        Get the index entry for the course from the index cache if it was fetched within the last
+        index_cache_ttl seconds or else from the db. Returns None if the course doesn't exist.
+
+        Don't use this for version conflict checks on writes (see _get_index_if_valid).
+        """
+        if self.index_cache_ttl > 0:
+            cached = self.index_cache.get(course_id)
+            if cached is not None and cached[0] > time.time():
+                return pickle.loads(cached[1])
+        index = self.course_index.find_one({'_id': course_id})
+        if index is not None and self.index_cache_ttl > 0:
+            self.index_cache.set(
+                course_id,
+                (time.time() + self.index_cache_ttl, pickle.dumps(index, pickle.HIGHEST_PROTOCOL))
+            )
+        return index
 
     def _lookup_course(self, course_locator):
         '''
@@ -193,14 +298,14 @@ class SplitMongoModuleStore(ModuleStoreBase):
 
         :param course_locator: any subclass of CourseLocator
         '''
-        # NOTE: if and when this uses cache, the update if changed logic will break if the cache
-        # holds the same objects as the descriptors!
+        # NOTE: the structure cache returns copies; otherwise, the update if changed logic would
+        # break as the cache would hold the same objects as the descriptors!
         if not course_locator.is_fully_specified():
             raise InsufficientSpecificationError('Not fully specified: %s' % course_locator)
 
         if course_locator.course_id is not None and course_locator.branch is not None:
             # use the course_id
-            index = self.course_index.find_one({'_id': course_locator.course_id})
+            index = self._get_course_index(course_locator.course_id)
             if index is None:
                 raise ItemNotFoundError(course_locator)
             if course_locator.branch not in index['versions']:
@@ -215,7 +320,7 @@ class SplitMongoModuleStore(ModuleStoreBase):
 
         # cast string to ObjectId if necessary
         version_guid = course_locator.as_object_id(version_guid)
-        entry = self.structures.find_one({'_id': version_guid})
+        entry = self._get_structure(version_guid)
 
         # b/c more than one course can use same structure, the 'course_id' is not intrinsic to structure
         # and the one assoc'd w/ it by another fetch may not be the one relevant to this fetch; so,
@@ -249,7 +354,7 @@ class SplitMongoModuleStore(ModuleStoreBase):
             version_guids.append(version_guid)
             id_version_map[version_guid] = course_entry['_id']
 
-        course_entries = self.structures.find({'_id': {'$in': version_guids}})
+        course_entries = self._get_structures(version_guids)
 
         # get the block for the course element (s/b the root)
         result = []
@@ -336,8 +441,11 @@ class SplitMongoModuleStore(ModuleStoreBase):
         # TODO extend to only search a subdag of the course?
         course = self._lookup_course(locator)
         items = []
-        for usage_id, value in course['blocks'].iteritems():
-            if self._block_matches(value, qualifiers):
+        candidates = self._indexed_candidates(course, qualifiers)
+        if candidates is None:
+            candidates = course['blocks'].iterkeys()
+        for usage_id in candidates:
+            if self._block_matches(course['blocks'][usage_id], qualifiers):
                 items.append(usage_id)
 
         if len(items) > 0:
@@ -356,13 +464,42 @@ class SplitMongoModuleStore(ModuleStoreBase):
         if usage_id is None:
             usage_id = locator.usage_id
         course = self._lookup_course(locator)
-        items = []
-        for parent_id, value in course['blocks'].iteritems():
-            for child_id in value['children']:
-                if usage_id == child_id:
-                    locator = locator.as_course_locator()
-                    items.append(BlockUsageLocator(url=locator, usage_id=parent_id))
-        return items
+        parent_ids = self._get_block_index(course)['children'].get(usage_id, [])
+        if parent_ids:
+            locator = locator.as_course_locator()
+        return [BlockUsageLocator(url=locator, usage_id=parent_id) for parent_id in parent_ids]
+
+    def _get_block_index(self, structure):
+        """
+        Get the indexes of the structure's blocks, building them the first time they're needed for
+        this version of the structure. Returns a dict from each of INDEXED_BLOCK_FIELDS to a dict
+        from the field's values to the list of usage_ids of the blocks having that value. For
+        'children', the lists hold the usage_ids of the parents. Callers must not change the lists.
+        """
+        block_index = self.block_index_cache.get(structure['_id'])
+        if block_index is None:
+            block_index = {field: {} for field in INDEXED_BLOCK_FIELDS}
+            for usage_id, block in structure['blocks'].iteritems():
+                block_index['category'].setdefault(block['category'], []).append(usage_id)
+                block_index['definition'].setdefault(block['definition'], []).append(usage_id)
+                for child_id in block['children']:
+                    block_index['children'].setdefault(child_id, []).append(usage_id)
+            self.block_index_cache.set(structure['_id'], block_index)
+        return block_index
+
+    def _indexed_candidates(self, structure, qualifiers):
+        """
+        Use the block indexes to find the usage_ids of the only blocks which could match the
+        qualifiers. Returns None if no qualifier can be looked up in an index, in which case every
+        block must be checked.
+        """
+        for field in INDEXED_BLOCK_FIELDS:
+            criteria = qualifiers.get(field)
+            # None, dict (e.g., $regex) and unhashable criteria need the full scan
+            if criteria is None or isinstance(criteria, (dict, list)):
+                continue
+            return self._get_block_index(structure)[field].get(criteria, [])
+        return None
 
     def get_course_index_info(self, course_locator):
         """
@@ -786,6 +923,7 @@ class SplitMongoModuleStore(ModuleStoreBase):
             'edited_on': datetime.datetime.utcnow(),
             'versions': versions_dict}
         new_id = self.course_index.insert(index_entry)
+        self.index_cache.delete(new_id)
         return self.get_course(CourseLocator(course_id=new_id, branch=master_version))
 
     def update_item(self, descriptor, user_id, force=False):
@@ -979,6 +1117,7 @@ class SplitMongoModuleStore(ModuleStoreBase):
             raise ValueError("Cannot override versions without setting update_versions")
         self.course_index.update({'_id': course_locator.course_id},
             {'$set': new_values_dict})
+        self.index_cache.delete(course_locator.course_id)
 
     def delete_item(self, usage_locator, user_id, force=False):
         """
@@ -1049,6 +1188,7 @@ class SplitMongoModuleStore(ModuleStoreBase):
             raise ItemNotFoundError(course_id)
         # this is the only real delete in the system. should it do something else?
         self.course_index.remove(index['_id'])
+        self.index_cache.delete(index['_id'])
 
     # TODO remove all callers and then this
     def get_errored_courses(self):
@@ -1238,3 +1378,4 @@ class SplitMongoModuleStore(ModuleStoreBase):
         self.course_index.update(
             {"_id": index_entry["_id"]},
             {"$set": {"versions.{}".format(branch): new_id}})
+        self.index_cache.delete(index_entry["_id"])
@@ -125,9 +125,8 @@ def _clone_modules(modulestore, modules, source_location, dest_location):
             data = rewrite_nonportable_content_links(
                 source_location.course_id, dest_location.course_id, data)
 
-        modulestore.update_item(module.location, data)
-
         # repoint children
+        new_children = None
         if module.has_children:
             new_children = []
             for child_loc_url in module.children:
@@ -139,10 +138,7 @@ def _clone_modules(modulestore, modules, source_location, dest_location):
                 )
                 new_children.append(child_loc.url())
 
-            modulestore.update_children(module.location, new_children)
-
-        # save metadata
-        modulestore.update_metadata(module.location, own_metadata(module))
+        modulestore.update(module.location, data=data, children=new_children, metadata=own_metadata(module))
 
 
 def clone_course(modulestore, contentstore, source_location, dest_location, delete_original=False):
@@ -176,31 +172,36 @@ def clone_course(modulestore, contentstore, source_location, dest_location, dele
 
     # Get all modules under this namespace which is (tag, org, course) tuple
 
-    modules = modulestore.get_items([source_location.tag, source_location.org, source_location.course, None, None, None])
-    _clone_modules(modulestore, modules, source_location, dest_location)
+    with modulestore.bulk_write_operations(dest_location):
+        modules = modulestore.get_items([source_location.tag, source_location.org, source_location.course, None, None, None])
+        _clone_modules(modulestore, modules, source_location, dest_location)
 
-    modules = modulestore.get_items([source_location.tag, source_location.org, source_location.course, None, None, 'draft'])
-    _clone_modules(modulestore, modules, source_location, dest_location)
+        modules = modulestore.get_items([source_location.tag, source_location.org, source_location.course, None, None, 'draft'])
+        _clone_modules(modulestore, modules, source_location, dest_location)
 
     # now iterate through all of the assets and clone them
     # first the thumbnails
     thumbs = contentstore.get_all_content_thumbnails_for_course(source_location)
     for thumb in thumbs:
         thumb_loc = Location(thumb["_id"])
-        content = contentstore.find(thumb_loc)
+        content = contentstore.find(thumb_loc, as_stream=True)
         content.location = content.location._replace(org=dest_location.org,
                                                      course=dest_location.course)
 
         print "Cloning thumbnail {0} to {1}".format(thumb_loc, content.location)
 
-        contentstore.save(content)
+        # streamed content is copied a chunk at a time rather than read into memory
+        try:
+            contentstore.save(content)
+        finally:
+            content.close()
 
     # now iterate through all of the assets, also updating the thumbnail pointer
 
     assets = contentstore.get_all_content_for_course(source_location)
     for asset in assets:
         asset_loc = Location(asset["_id"])
-        content = contentstore.find(asset_loc)
+        content = contentstore.find(asset_loc, as_stream=True)
         content.location = content.location._replace(org=dest_location.org,
                                                      course=dest_location.course)
 
@@ -211,7 +212,10 @@ def clone_course(modulestore, contentstore, source_location, dest_location, dele
 
         print "Cloning asset {0} to {1}".format(asset_loc, content.location)
 
-        contentstore.save(content)
+        try:
+            contentstore.save(content)
+        finally:
+            content.close()
 
     return True
 
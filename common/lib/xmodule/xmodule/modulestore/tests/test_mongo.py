@@ -1,6 +1,7 @@
 from pprint import pprint
 
 from nose.tools import assert_equals, assert_raises, assert_not_equals, assert_false
+from mock import patch
 import pymongo
 from uuid import uuid4
 
@@ -10,6 +11,7 @@ from xblock.runtime import KeyValueStore, InvalidScopeError
 from xmodule.tests import DATA_DIR
 from xmodule.modulestore import Location
 from xmodule.modulestore.mongo import MongoModuleStore, MongoKeyValueStore
+from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.modulestore.xml_importer import import_from_xml
 
 from xmodule.modulestore.tests.test_modulestore import check_path_to_location
@@ -24,6 +26,24 @@ DEFAULT_CLASS = 'xmodule.raw_module.RawDescriptor'
 RENDER_TEMPLATE = lambda t_n, d, ctx = None, nsp = 'main': ''
 
 
+class DictCache(dict):
+    """The parts of the django cache API that MongoModuleStore uses, in a dict"""
+    def set(self, key, value):
+        self[key] = value
+
+    def add(self, key, value):
+        self.setdefault(key, value)
+
+    def get_many(self, keys):
+        return dict((key, self[key]) for key in keys if key in self)
+
+    def incr(self, key):
+        if key not in self:
+            raise ValueError("Key '%s' not found" % (key,))
+        self[key] += 1
+        return self[key]
+
+
 class TestMongoModuleStore(object):
     '''Tests!'''
     @classmethod
@@ -117,6 +137,50 @@ class TestMongoModuleStore(object):
                 '{0} is a template course'.format(course)
             )
 
+    def test_descriptor_cache(self):
+        store = MongoModuleStore(HOST, DB, COLLECTION, FS_ROOT, RENDER_TEMPLATE,
+            default_class=DEFAULT_CLASS, descriptor_cache_size=100,
+            metadata_inheritance_cache_subsystem=DictCache())
+        location = Location("i4x://edX/toy/html/toyhtml")
+        missing_location = Location("i4x://edX/toy/html/missing")
+
+        with patch.object(store.collection, 'find_one', wraps=store.collection.find_one) as find_one:
+            html = store.get_item(location)
+            assert_raises(ItemNotFoundError, store.get_item, missing_location)
+            assert_equals(find_one.call_count, 2)
+
+            # cached, both found and missing items
+            assert_equals(store.get_item(location).data, html.data)
+            assert_raises(ItemNotFoundError, store.get_item, missing_location)
+            assert_equals(find_one.call_count, 2)
+
+            # writes to the course invalidate what was cached
+            store.update_item(location, html.data)
+            store.get_item(location)
+            assert_equals(find_one.call_count, 3)
+
+    def test_no_descriptor_cache_without_shared_cache(self):
+        # nothing would tell this process of writes by other processes
+        store = MongoModuleStore(HOST, DB, COLLECTION, FS_ROOT, RENDER_TEMPLATE,
+            default_class=DEFAULT_CLASS, descriptor_cache_size=100)
+        assert_equals(store.descriptor_cache, None)
+
+    def test_descriptor_cache_children(self):
+        store = MongoModuleStore(HOST, DB, COLLECTION, FS_ROOT, RENDER_TEMPLATE,
+            default_class=DEFAULT_CLASS, descriptor_cache_size=100,
+            metadata_inheritance_cache_subsystem=DictCache())
+        location = Location("i4x://edX/toy/course/2012_Fall")
+
+        course = store.get_item(location, depth=None)
+        with patch.object(store.collection, 'find', wraps=store.collection.find) as find:
+            cached_course = store.get_item(location, depth=None)
+            # the children, like the metadata inheritance tree, come from the caches
+            assert_equals(find.call_count, 0)
+        assert_equals(
+            [child.location for child in cached_course.get_children()],
+            [child.location for child in course.get_children()]
+        )
+
 class TestMongoKeyValueStore(object):
 
     def setUp(self):
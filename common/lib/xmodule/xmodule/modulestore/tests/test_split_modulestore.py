@@ -434,6 +434,14 @@ class SplitModuleItemTests(SplitModuleTest):
         self.assertEqual(len(matches), 1)
         self.assertEqual(matches[0].location.usage_id, 'head12345')
 
+        # the lookups above built the block indexes of this version once
+        version_guid = locator.as_object_id(self.GUID_D0)
+        self.assertIn(version_guid, modulestore().block_index_cache)
+        # pylint: disable=W0212
+        block_index = modulestore()._get_block_index({'_id': version_guid, 'blocks': {}})
+        self.assertEqual(len(block_index['category']['chapter']), 3)
+        self.assertEqual(block_index['children']['chapter2'], ['head12345'])
+
     def test_get_parents(self):
         '''
         get_parent_locations(locator, [usage_id], [branch]): [BlockUsageLocator]
@@ -949,6 +957,56 @@ class TestCourseCreation(SplitModuleTest):
         self.assertEqual(str(course.location.version_guid), self.GUID_D1)
 
 
+class TestCaching(SplitModuleTest):
+    """
+    Test the structure and course index caches
+    """
+    def test_structure_cache(self):
+        # pylint: disable=W0212
+        modulestore()._clear_cache()
+        locator = CourseLocator(course_id="GreekHero", branch='draft')
+        structure = modulestore()._lookup_course(locator)
+        self.assertIn(structure['_id'], modulestore().structure_cache)
+
+        # changing the returned structure must not change the cached one
+        structure['blocks'][structure['root']]['metadata']['display_name'] = 'changed'
+        structure = modulestore()._lookup_course(locator)
+        self.assertEqual(
+            structure['blocks'][structure['root']]['metadata']['display_name'],
+            "The Ancient Greek Hero"
+        )
+
+        courses = modulestore().get_courses('draft')
+        self.assertEqual(len(courses), 3)
+        for course in courses:
+            self.assertIn(course.location.as_object_id(course.location.version_guid), modulestore().structure_cache)
+
+    def test_index_cache(self):
+        # pylint: disable=W0212
+        modulestore()._clear_cache()
+        locator = CourseLocator(course_id="GreekHero", branch='draft')
+        course = modulestore().get_course(locator)
+        self.assertEqual(str(course.location.version_guid), self.GUID_D0)
+
+        # changes made behind the store's back aren't seen until the cached entry expires
+        index = modulestore().get_course_index_info(locator)
+        versions = index['versions']
+        versions['draft'] = self.GUID_D1
+        modulestore().course_index.update({'_id': "GreekHero"}, {'$set': {'versions': versions}})
+        course = modulestore().get_course(locator)
+        self.assertEqual(str(course.location.version_guid), self.GUID_D0)
+
+        modulestore()._clear_cache()
+        course = modulestore().get_course(locator)
+        self.assertEqual(str(course.location.version_guid), self.GUID_D1)
+
+        # but changes made through the store are seen at once
+        versions['draft'] = self.GUID_D0
+        modulestore().update_course_index(locator, {'versions': versions}, update_versions=True)
+        course = modulestore().get_course(locator)
+        self.assertEqual(str(course.location.version_guid), self.GUID_D0)
+
+
 class TestInheritance(SplitModuleTest):
     """
     Test the metadata inheritance mechanism.
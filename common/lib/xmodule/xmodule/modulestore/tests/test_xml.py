@@ -1,8 +1,12 @@
 import os.path
+import shutil
+from tempfile import mkdtemp
 
+from mock import patch
 from nose.tools import assert_raises
 
 from xmodule.course_module import CourseDescriptor
+from xmodule.modulestore.inheritance import own_metadata
 from xmodule.modulestore.xml import XMLModuleStore
 
 from xmodule.tests import DATA_DIR
@@ -37,3 +41,49 @@ class TestXMLModuleStore(object):
         location = CourseDescriptor.id_to_location("edX/toy/2012_Fall")
         errors = modulestore.get_item_errors(location)
         assert errors == []
+
+    def test_load_times(self):
+        """Each course's load time is recorded"""
+        course_dirs = ['toy', 'simple']
+        modulestore = XMLModuleStore(DATA_DIR, course_dirs=course_dirs)
+        assert sorted(modulestore.load_times.keys()) == course_dirs
+
+    def test_course_snapshots(self):
+        """Courses loaded from snapshots are the same as parsed ones, until their files change"""
+        temp_dir = mkdtemp()
+        try:
+            data_dir = os.path.join(temp_dir, 'data')
+            snapshot_dir = os.path.join(temp_dir, 'snapshots')
+            for course_dir in ('toy', 'simple'):
+                shutil.copytree(os.path.join(DATA_DIR, course_dir), os.path.join(data_dir, course_dir))
+
+            parsed = XMLModuleStore(data_dir, course_dirs=['toy', 'simple'], snapshot_dir=snapshot_dir)
+            assert parsed.loaded_from_snapshot == set()
+            snapshotted = XMLModuleStore(data_dir, course_dirs=['toy', 'simple'], snapshot_dir=snapshot_dir)
+            assert snapshotted.loaded_from_snapshot == set(['toy', 'simple'])
+
+            for course_dir in ('toy', 'simple'):
+                course_id = parsed.courses[course_dir].id
+                assert snapshotted.courses[course_dir].id == course_id
+                assert snapshotted.modules[course_id] == parsed.modules[course_id]
+                for location, descriptor in parsed.modules[course_id].iteritems():
+                    assert own_metadata(snapshotted.modules[course_id][location]) == own_metadata(descriptor)
+                    if parsed.parent_trackers[course_id].is_known(location):
+                        assert (sorted(snapshotted.get_parent_locations(location, course_id)) ==
+                                sorted(parsed.get_parent_locations(location, course_id)))
+                assert (snapshotted.get_item_errors(parsed.courses[course_dir].location) ==
+                        parsed.get_item_errors(parsed.courses[course_dir].location))
+            check_path_to_location(snapshotted)
+
+            # changing any file makes the course be parsed again
+            with open(os.path.join(data_dir, 'toy', 'course.xml'), 'a') as course_file:
+                course_file.write('\n')
+            reloaded = XMLModuleStore(data_dir, course_dirs=['toy', 'simple'], snapshot_dir=snapshot_dir)
+            assert reloaded.loaded_from_snapshot == set(['simple'])
+
+            # as does changing the code which parses courses
+            with patch('xmodule.modulestore.xml.loader_code_fingerprint', return_value='new code'):
+                redeployed = XMLModuleStore(data_dir, course_dirs=['toy', 'simple'], snapshot_dir=snapshot_dir)
+            assert redeployed.loaded_from_snapshot == set()
+        finally:
+            shutil.rmtree(temp_dir)
@@ -1,3 +1,4 @@
+import cPickle as pickle
 import hashlib
 import json
 import logging
@@ -5,6 +6,7 @@ import os
 import re
 import sys
 import glob
+import time
 
 from collections import defaultdict
 from cStringIO import StringIO
@@ -32,6 +34,43 @@ etree.set_default_parser(edx_xml_parser)
 
 log = logging.getLogger(__name__)
 
+# Bump whenever the format of the snapshots changes.  Changes to the code that
+# parses courses needn't bump it: see loader_code_fingerprint.
+SNAPSHOT_VERSION = 1
+
+# The packages whose code turns course files into descriptors
+SNAPSHOT_CODE_PACKAGES = ('xmodule', 'xblock', 'capa')
+
+_loader_code_fingerprint = None
+
+
+def loader_code_fingerprint():
+    """
+    Return a hash of the sources of SNAPSHOT_CODE_PACKAGES, so that snapshots
+    are only used by the code which wrote them: after a deploy changing how
+    descriptors are parsed or their fields' defaults, unchanged courses are
+    parsed afresh.
+    """
+    global _loader_code_fingerprint
+    if _loader_code_fingerprint is None:
+        fingerprint = hashlib.sha1()
+        for package_name in SNAPSHOT_CODE_PACKAGES:
+            package_dir = os.path.dirname(import_module(package_name).__file__)
+            for dirpath, dirnames, filenames in os.walk(package_dir):
+                # walk in a fixed order so that the hash only depends on the sources
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if not filename.endswith('.py'):
+                        continue
+                    filepath = os.path.join(dirpath, filename)
+                    fingerprint.update(package_name + '/' + os.path.relpath(filepath, package_dir))
+                    fingerprint.update('\0')
+                    with open(filepath, 'rb') as source_file:
+                        fingerprint.update(source_file.read())
+                    fingerprint.update('\0')
+        _loader_code_fingerprint = fingerprint.hexdigest()
+    return _loader_code_fingerprint
+
 
 # VS[compat]
 # TODO (cpennington): Remove this once all fall 2012 courses have been imported
@@ -257,7 +296,8 @@ class XMLModuleStore(ModuleStoreBase):
     """
     An XML backed ModuleStore
     """
-    def __init__(self, data_dir, default_class=None, course_dirs=None, load_error_modules=True):
+    def __init__(self, data_dir, default_class=None, course_dirs=None, load_error_modules=True,
+                 snapshot_dir=None):
         """
         Initialize an XMLModuleStore from data_dir
 
@@ -268,6 +308,11 @@ class XMLModuleStore(ModuleStoreBase):
 
         course_dirs: If specified, the list of course_dirs to load. Otherwise,
             load all course dirs
+
+        snapshot_dir: If specified, the directory in which to save a snapshot
+            of each loaded course. A course whose files haven't changed since
+            its snapshot was saved is loaded from the snapshot rather than by
+            parsing its xml.
         """
         super(XMLModuleStore, self).__init__()
 
@@ -275,6 +320,9 @@ class XMLModuleStore(ModuleStoreBase):
         self.modules = defaultdict(dict)  # course_id -> dict(location -> XModuleDescriptor)
         self.courses = {}  # course_dir -> XModuleDescriptor for the course
         self.errored_courses = {}  # course_dir -> errorlog, for dirs that failed to load
+        self.load_times = {}  # course_dir -> seconds taken to load the course
+        self.snapshot_dir = path(snapshot_dir) if snapshot_dir is not None else None
+        self.loaded_from_snapshot = set()  # course_dirs loaded from their snapshots
 
         self.load_error_modules = load_error_modules
 
@@ -295,12 +343,18 @@ class XMLModuleStore(ModuleStoreBase):
         if course_dirs is None:
             course_dirs = sorted([d for d in os.listdir(self.data_dir) if
                                   os.path.exists(self.data_dir / d / "course.xml")])
+
+        start = time.time()
         for course_dir in course_dirs:
             self.try_load_course(course_dir)
 
+        if course_dirs:
+            self._log_load_times(course_dirs, time.time() - start)
+
     def try_load_course(self, course_dir):
         '''
-        Load a course, keeping track of errors as we go along.
+        Load a course, keeping track of errors as we go along. Times the load
+        in self.load_times.
         '''
         # Special-case code here, since we don't have a location for the
         # course before it loads.
@@ -308,12 +362,28 @@ class XMLModuleStore(ModuleStoreBase):
         # place after the course loads and we have its location
         errorlog = make_error_tracker()
         course_descriptor = None
-        try:
-            course_descriptor = self.load_course(course_dir, errorlog.tracker)
-        except Exception as e:
-            msg = "ERROR: Failed to load course '{0}': {1}".format(course_dir, str(e))
-            log.exception(msg)
-            errorlog.tracker(msg)
+        start = time.time()
+        content_hash = None
+        self.loaded_from_snapshot.discard(course_dir)
+        if self.snapshot_dir is not None:
+            try:
+                content_hash = self.course_content_hash(course_dir)
+            except (IOError, OSError):
+                log.exception("Unable to hash the content of course %s", course_dir)
+            else:
+                course_descriptor = self.load_snapshot(course_dir, content_hash, errorlog)
+
+        if course_descriptor is None:
+            try:
+                course_descriptor = self.load_course(course_dir, errorlog.tracker)
+            except Exception as e:
+                msg = "ERROR: Failed to load course '{0}': {1}".format(course_dir, str(e))
+                log.exception(msg)
+                errorlog.tracker(msg)
+            else:
+                if content_hash is not None and not isinstance(course_descriptor, ErrorDescriptor):
+                    self.save_snapshot(course_dir, content_hash, course_descriptor, errorlog.errors)
+        self.load_times[course_dir] = time.time() - start
 
         if course_descriptor is not None and not isinstance(course_descriptor, ErrorDescriptor):
             self.courses[course_dir] = course_descriptor
@@ -323,6 +393,150 @@ class XMLModuleStore(ModuleStoreBase):
             # Didn't load course.  Instead, save the errors elsewhere.
             self.errored_courses[course_dir] = errorlog
 
+    def _log_load_times(self, course_dirs, total_time):
+        '''
+        Log how long loading each of course_dirs took, slowest first
+        '''
+        report = ["Loaded {0} xml courses in {1:.2f}s".format(len(course_dirs), total_time)]
+        for course_dir in sorted(course_dirs, key=lambda course_dir: -self.load_times[course_dir]):
+            report.append("  {0:.2f}s {1}{2}{3}".format(
+                self.load_times[course_dir],
+                course_dir,
+                " (snapshot)" if course_dir in self.loaded_from_snapshot else "",
+                " (errored)" if course_dir in self.errored_courses else ""
+            ))
+        log.info("\n".join(report))
+
+    def course_content_hash(self, course_dir):
+        '''
+        Return a hash of the names and contents of all the files in course_dir
+        '''
+        content_hash = hashlib.sha1()
+        course_path = self.data_dir / course_dir
+        for dirpath, dirnames, filenames in os.walk(course_path):
+            # walk in a fixed order so that the hash only depends on the files
+            dirnames.sort()
+            for filename in sorted(filenames):
+                filepath = path(dirpath) / filename
+                content_hash.update(os.path.relpath(filepath, course_path).encode('utf-8'))
+                content_hash.update('\0')
+                with open(filepath, 'rb') as content_file:
+                    content_hash.update(content_file.read())
+                content_hash.update('\0')
+        return content_hash.hexdigest()
+
+    def _snapshot_path(self, course_dir):
+        return self.snapshot_dir / '{0}.pickle'.format(course_dir)
+
+    def save_snapshot(self, course_dir, content_hash, course_descriptor, errors):
+        '''
+        Save a snapshot of the course just loaded from course_dir, from which
+        load_snapshot can rebuild it as long as neither the course's content_hash
+        nor the loader_code_fingerprint change.
+
+        The snapshot holds the model data of each of the course's descriptors,
+        less the metadata they inherit, which is recomputed on load.
+        '''
+        course_id = course_descriptor.id
+        modules = []
+        for descriptor in self.modules[course_id].itervalues():
+            if getattr(descriptor, 'data_dir', None) != course_dir:
+                continue
+            inherited_metadata = getattr(descriptor, '_inherited_metadata', {})
+            model_data = dict(
+                (key, value) for key, value in descriptor._model_data.iteritems()
+                if key not in inherited_metadata
+            )
+            modules.append((type(descriptor), model_data))
+
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'code_fingerprint': loader_code_fingerprint(),
+            'content_hash': content_hash,
+            'load_error_modules': self.load_error_modules,
+            'default_class': self.default_class,
+            'course_id': course_id,
+            'course_location': course_descriptor.location.url(),
+            'policy': course_descriptor.system.policy,
+            'errors': errors,
+            'modules': modules,
+        }
+        snapshot_path = self._snapshot_path(course_dir)
+        temp_path = '{0}.{1}.tmp'.format(snapshot_path, os.getpid())
+        try:
+            if not os.path.isdir(self.snapshot_dir):
+                os.makedirs(self.snapshot_dir)
+            with open(temp_path, 'wb') as snapshot_file:
+                pickle.dump(snapshot, snapshot_file, pickle.HIGHEST_PROTOCOL)
+            # rename so that readers never see a partially written snapshot
+            os.rename(temp_path, snapshot_path)
+        except Exception:
+            log.exception("Unable to save a snapshot of course %s", course_dir)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def load_snapshot(self, course_dir, content_hash, errorlog):
+        '''
+        Load the course in course_dir from its snapshot, if it has one for
+        content_hash. Appends the errors recorded while the course was parsed
+        to errorlog.
+
+        Returns the CourseDescriptor, or None if there's no usable snapshot.
+        '''
+        snapshot_path = self._snapshot_path(course_dir)
+        if not snapshot_path.isfile():
+            return None
+        try:
+            with open(snapshot_path, 'rb') as snapshot_file:
+                snapshot = pickle.load(snapshot_file)
+        except Exception:
+            log.exception("Unable to read the snapshot of course %s", course_dir)
+            return None
+        if (snapshot.get('version') != SNAPSHOT_VERSION or
+                snapshot.get('code_fingerprint') != loader_code_fingerprint() or
+                snapshot['content_hash'] != content_hash or
+                snapshot['load_error_modules'] != self.load_error_modules or
+                snapshot['default_class'] != self.default_class):
+            return None
+
+        course_id = snapshot['course_id']
+        course_modules = self.modules[course_id]
+        system = ImportSystem(
+            self,
+            course_id,
+            course_dir,
+            snapshot['policy'],
+            errorlog.tracker,
+            self.parent_trackers[course_id],
+            self.load_error_modules,
+        )
+        descriptors = []
+        try:
+            for descriptor_class, model_data in snapshot['modules']:
+                descriptor = descriptor_class(system, model_data)
+                descriptor.data_dir = course_dir
+                course_modules[descriptor.location] = descriptor
+                descriptors.append(descriptor)
+
+            # as in ImportSystem.process_xml, but only once all the descriptors exist
+            for descriptor in descriptors:
+                if hasattr(descriptor, 'children'):
+                    for child in descriptor.get_children():
+                        self.parent_trackers[course_id].add_parent(child.location, descriptor.location)
+                descriptor.save()
+
+            course_descriptor = course_modules[Location(snapshot['course_location'])]
+            compute_inherited_metadata(course_descriptor)
+        except Exception:
+            log.exception("Unable to load course %s from its snapshot", course_dir)
+            for descriptor in descriptors:
+                course_modules.pop(descriptor.location, None)
+            return None
+
+        errorlog.errors.extend(snapshot['errors'])
+        self.loaded_from_snapshot.add(course_dir)
+        return course_descriptor
+
     def __unicode__(self):
         '''
         String representation - for debugging
@@ -589,6 +803,13 @@ class XMLModuleStore(ModuleStoreBase):
         """
         raise NotImplementedError("XMLModuleStores are read-only")
 
+    def update(self, location, data=None, children=None, metadata=None, allow_not_found=False):
+        """
+        Set the data, children and metadata of the item specified by the
+        location all at once
+        """
+        raise NotImplementedError("XMLModuleStores are read-only")
+
     def get_parent_locations(self, location, course_id):
         '''Find all locations that are the parents of this location in this
         course.  Needed for path_to_location().
@@ -98,11 +98,10 @@ def import_from_xml(store, data_dir, course_dirs=None,
             course_id_components = course_id.split('/')
             pseudo_course_id = '/'.join([course_id_components[0], course_id_components[1]])
 
-        try:
-            # turn off all write signalling while importing as this is a high volume operation
-            if pseudo_course_id not in store.ignore_write_events_on_courses:
-                store.ignore_write_events_on_courses.append(pseudo_course_id)
-
+        # buffer the writes and turn off all write signalling while importing as this is a high
+        # volume operation
+        org, course = pseudo_course_id.split('/')
+        with store.bulk_write_operations(Location('i4x', org, course, None, None)):
             course_data_path = None
             course_location = None
 
@@ -158,19 +157,11 @@ def import_from_xml(store, data_dir, course_dirs=None,
                 import_module(module, store, course_data_path, static_content_store, course_location,
                               target_location_namespace if target_location_namespace else course_location)
 
-            # now import any 'draft' items
-            if draft_store is not None:
-                import_course_draft(xml_module_store, store, draft_store, course_data_path,
-                                    static_content_store, course_location, target_location_namespace if target_location_namespace
-                                    else course_location)
-
-        finally:
-            # turn back on all write signalling
-            if pseudo_course_id in store.ignore_write_events_on_courses:
-                store.ignore_write_events_on_courses.remove(pseudo_course_id)
-                store.refresh_cached_metadata_inheritance_tree(
-                    target_location_namespace if target_location_namespace is not None else course_location
-                )
+        # now import any 'draft' items
+        if draft_store is not None:
+            import_course_draft(xml_module_store, store, draft_store, course_data_path,
+                                static_content_store, course_location, target_location_namespace if target_location_namespace
+                                else course_location)
 
     return xml_module_store, course_items
 
@@ -202,17 +193,14 @@ def import_module(module, store, course_data_path, static_content_store,
         module_data = rewrite_nonportable_content_links(
             source_course_location.course_id, dest_course_location.course_id, module_data)
 
-    if allow_not_found:
-        store.update_item(module.location, module_data, allow_not_found=allow_not_found)
-    else:
-        store.update_item(module.location, module_data)
-
+    children = None
     if hasattr(module, 'children') and module.children != []:
-        store.update_children(module.location, module.children)
+        children = module.children
 
     # NOTE: It's important to use own_metadata here to avoid writing
     # inherited metadata everywhere.
-    store.update_metadata(module.location, dict(own_metadata(module)))
+    store.update(module.location, data=module_data, children=children, metadata=dict(own_metadata(module)),
+                 allow_not_found=allow_not_found)
 
 
 def import_course_draft(xml_module_store, store, draft_store, course_data_path, static_content_store, source_location_namespace, target_location_namespace):
@@ -434,6 +434,26 @@ class CapaModuleTest(unittest.TestCase):
         # Expect that the number of attempts is incremented by 1
         self.assertEqual(module.attempts, 1)
 
+    def test_check_problem_publishes_answers(self):
+
+        module = CapaFactory.create(attempts=0)
+        module.system.publish = Mock()
+
+        with patch('capa.correctmap.CorrectMap.is_correct') as mock_is_correct:
+            mock_is_correct.return_value = False
+            module.check_problem({CapaFactory.input_key(): '3.14'})
+            module.check_problem({CapaFactory.input_key(): '3.15'})
+
+        # Expect an answers event for each change of answer
+        answer_events = [call_args[0][0] for call_args in module.system.publish.call_args_list
+                         if call_args[0][0]['event_name'] == 'answers']
+        self.assertEqual(answer_events, [
+            {'event_name': 'answers', 'previous': {}, 'current': {CapaFactory.answer_key(): '3.14'}},
+            {'event_name': 'answers',
+             'previous': {CapaFactory.answer_key(): '3.14'},
+             'current': {CapaFactory.answer_key(): '3.15'}},
+        ])
+
     def test_check_problem_closed(self):
         module = CapaFactory.create(attempts=3)
 
@@ -1,5 +1,6 @@
 import unittest
-from xmodule.contentstore.content import StaticContent
+from StringIO import StringIO
+from xmodule.contentstore.content import StaticContent, StaticContentStream
 from xmodule.contentstore.content import ContentStore
 from xmodule.modulestore import Location
 
@@ -30,3 +31,16 @@ class ContentTest(unittest.TestCase):
         # still happen.
         asset_location = StaticContent.compute_location('mitX', '400', 'subs__1eo_jXvZnE .srt.sjson')
         self.assertEqual(Location(u'c4x', u'mitX', u'400', u'asset', u'subs__1eo_jXvZnE_.srt.sjson', None), asset_location)
+
+    def test_stream_data_in_chunks(self):
+        stream = StringIO('abcdefghij')
+        stream.chunk_size = 4
+        content = StaticContentStream('loc', 'name', 'content_type', stream, length=10)
+        self.assertEqual(list(content.stream_data()), ['abcd', 'efgh', 'ij'])
+        # data always iterates from the start
+        self.assertEqual(list(content.data), ['abcd', 'efgh', 'ij'])
+        # ranges are read up to a chunk boundary, then chunk by chunk
+        self.assertEqual(list(content.stream_data_in_range(2, 8)), ['cd', 'efgh', 'i'])
+
+        content = StaticContentStream('loc', 'name', 'content_type', StringIO('abcdefghij'), chunk_size=3)
+        self.assertEqual(list(content.stream_data()), ['abc', 'def', 'ghi', 'j'])
@@ -0,0 +1,103 @@
+import os
+import shutil
+import unittest
+from tempfile import mkdtemp
+from uuid import uuid4
+
+import pymongo
+from mock import patch
+
+from xmodule.contentstore.content import StaticContent
+from xmodule.contentstore.disk_cache import DiskLRUCache
+from xmodule.contentstore.mongo import MongoContentStore
+
+
+class TestDiskLRUCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_get_set_delete(self):
+        cache = DiskLRUCache(self.directory, 100)
+        self.assertIsNone(cache.get('a', 'v1'))
+        cached_file = cache.set('a', 'v1', ['ab', 'cd'])
+        self.assertEqual('abcd', cached_file.read())
+        self.assertEqual('abcd', cache.get('a', 'v1').read())
+        # other versions aren't returned, and setting a version replaces the others
+        self.assertIsNone(cache.get('a', 'v2'))
+        cache.set('a', 'v2', ['efgh'])
+        self.assertIsNone(cache.get('a', 'v1'))
+        cache.delete('a')
+        self.assertIsNone(cache.get('a', 'v2'))
+
+    def test_evicts_least_recently_used(self):
+        cache = DiskLRUCache(self.directory, 10)
+        cache.set('a', 'v1', ['xxxx'])
+        cache.set('b', 'v1', ['xxxx'])
+        # backdate both so that reading 'a' makes 'b' the least recently used even
+        # w/ a coarse file system clock
+        os.utime(cache._path('a', 'v1'), (0, 0))
+        os.utime(cache._path('b', 'v1'), (1, 1))
+        cache.get('a', 'v1')
+        cache.set('c', 'v1', ['xxxx'])
+        self.assertIsNone(cache.get('b', 'v1'))
+        self.assertIsNotNone(cache.get('a', 'v1'))
+        self.assertIsNotNone(cache.get('c', 'v1'))
+
+    def test_too_big(self):
+        cache = DiskLRUCache(self.directory, 3)
+        self.assertIsNone(cache.set('a', 'v1', ['xx', 'xx']))
+        self.assertEqual([], os.listdir(self.directory))
+
+
+class TestMongoContentStoreDiskCache(unittest.TestCase):
+    """
+    Needs a local mongo
+    """
+    def setUp(self):
+        self.db = 'test_disk_cache_%s' % uuid4().hex
+        self.directory = mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(pymongo.MongoClient('localhost').drop_database, self.db)
+        self.contentstore = MongoContentStore('localhost', self.db, disk_cache_dir=self.directory)
+        self.location = StaticContent.compute_location('edX', 'disk', 'asset.txt')
+
+    def wait_for_disk_cache_fills(self):
+        for thread in self.contentstore._disk_cache_fills.values():
+            thread.join()
+
+    def test_disk_cache(self):
+        self.contentstore.save(StaticContent(self.location, 'asset.txt', 'text/plain', 'first'))
+        # the first read is served from GridFS, while the content is cached in the background
+        content = self.contentstore.find(self.location, as_stream=True)
+        self.assertNotIsInstance(content._stream, file)
+        self.assertEqual('first', ''.join(content.stream_data()))
+        self.wait_for_disk_cache_fills()
+        self.assertEqual(1, len(os.listdir(self.directory)))
+
+        # the data is read from disk from now on
+        content = self.contentstore.find(self.location, as_stream=True)
+        self.assertIsInstance(content._stream, file)
+        self.assertEqual('first', ''.join(content.stream_data()))
+
+        # saving invalidates the cached copy
+        self.contentstore.save(StaticContent(self.location, 'asset.txt', 'text/plain', 'second'))
+        self.assertEqual([], os.listdir(self.directory))
+        content = self.contentstore.find(self.location, as_stream=True)
+        self.assertEqual('second', ''.join(content.stream_data()))
+        self.wait_for_disk_cache_fills()
+
+        # as does deleting
+        self.contentstore.delete(content.get_id())
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_too_big_for_disk_cache(self):
+        self.contentstore.disk_cache.max_size = 4
+        self.contentstore.save(StaticContent(self.location, 'asset.txt', 'text/plain', 'too big'))
+        with patch.object(self.contentstore.disk_cache, 'set') as disk_cache_set:
+            content = self.contentstore.find(self.location, as_stream=True)
+            self.assertEqual('too big', ''.join(content.stream_data()))
+            self.wait_for_disk_cache_fills()
+        self.assertFalse(disk_cache_set.called)
+        self.assertEqual([], os.listdir(self.directory))
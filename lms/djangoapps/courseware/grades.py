@@ -1,34 +1,28 @@
 # Compute grades using real division, with no integer truncation
 from __future__ import division
 
+import hashlib
+import json
 import random
 import logging
 
 from collections import defaultdict
+from datetime import datetime
 from django.conf import settings
-from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.utils.timezone import UTC
 
-from .model_data import ModelDataCache, LmsKeyValueStore
+from .access import has_access
+from .model_data import ModelDataCache, LmsKeyValueStore, chunks
 from xblock.core import Scope
-from .module_render import get_module, get_module_for_descriptor
+from .module_render import get_module, get_module_for_descriptor, get_module_for_descriptor_internal
 from xmodule import graders
-from xmodule.capa_module import CapaModule
 from xmodule.graders import Score
-from .models import StudentModule
+from .models import ProblemAnswerCount, StudentModule, StudentSectionGrade
 
 log = logging.getLogger("mitx.courseware")
 
 
-def yield_module_descendents(module):
-    stack = module.get_display_items()
-    stack.reverse()
-
-    while len(stack) > 0:
-        next_module = stack.pop()
-        stack.extend(next_module.get_display_items())
-        yield next_module
-
-
 def yield_dynamic_descriptor_descendents(descriptor, module_creator):
     """
     This returns all of the descendants of a descriptor. If the descriptor
@@ -50,48 +44,6 @@ def yield_dynamic_descriptor_descendents(descriptor, module_creator):
         yield next_descriptor
 
 
-def yield_problems(request, course, student):
-    """
-    Return an iterator over capa_modules that this student has
-    potentially answered.  (all that student has answered will definitely be in
-    the list, but there may be others as well).
-    """
-    grading_context = course.grading_context
-
-    descriptor_locations = (descriptor.location.url() for descriptor in grading_context['all_descriptors'])
-    existing_student_modules = set(StudentModule.objects.filter(
-        module_state_key__in=descriptor_locations
-    ).values_list('module_state_key', flat=True))
-
-    sections_to_list = []
-    for _, sections in grading_context['graded_sections'].iteritems():
-        for section in sections:
-
-            section_descriptor = section['section_descriptor']
-
-            # If the student hasn't seen a single problem in the section, skip it.
-            for moduledescriptor in section['xmoduledescriptors']:
-                if moduledescriptor.location.url() in existing_student_modules:
-                    sections_to_list.append(section_descriptor)
-                    break
-
-    model_data_cache = ModelDataCache(sections_to_list, course.id, student)
-    for section_descriptor in sections_to_list:
-        section_module = get_module(student, request,
-                                    section_descriptor.location, model_data_cache,
-                                    course.id)
-        if section_module is None:
-            # student doesn't have access to this module, or something else
-            # went wrong.
-            # log.debug("couldn't get module for student {0} for section location {1}"
-            #           .format(student.username, section_descriptor.location))
-            continue
-
-        for problem in yield_module_descendents(section_module):
-            if isinstance(problem, CapaModule):
-                yield problem
-
-
 def answer_distributions(request, course):
     """
     Given a course_descriptor, compute frequencies of answers for each problem:
@@ -100,21 +52,28 @@ def answer_distributions(request, course):
 
     dict: (problem url_name, problem display_name, problem_id) -> (dict : answer ->  count)
 
-    TODO (vshnayder): this is currently doing a full linear pass through all
-    students and all problems.  This will be just a little slow.
+    The counts are read from ProblemAnswerCount, which is kept up to date as
+    students change their answers and enroll or unenroll, so this doesn't need
+    to load any student's state.  As before, only the answers of students
+    enrolled in the course are counted.  Only the problems in graded sections
+    are included.
     """
+    problems = dict(
+        (descriptor.location.url(), descriptor)
+        for descriptor in course.grading_context['all_descriptors']
+        if descriptor.location.category == 'problem'
+    )
 
     counts = defaultdict(lambda: defaultdict(int))
 
-    enrolled_students = User.objects.filter(courseenrollment__course_id=course.id)
-
-    for student in enrolled_students:
-        for capa_module in yield_problems(request, course, student):
-            for problem_id in capa_module.lcp.student_answers:
-                # Answer can be a list or some other unhashable element.  Convert to string.
-                answer = str(capa_module.lcp.student_answers[problem_id])
-                key = (capa_module.url_name, capa_module.display_name_with_default, problem_id)
-                counts[key][answer] += 1
+    answer_counts = ProblemAnswerCount.objects.filter(course_id=course.id, count__gt=0)
+    for module_state_key, problem_id, answer, count in answer_counts.values_list(
+            'module_state_key', 'answer_id', 'answer', 'count'):
+        descriptor = problems.get(module_state_key)
+        if descriptor is None:
+            continue
+        key = (descriptor.url_name, descriptor.display_name_with_default, problem_id)
+        counts[key][answer] += count
 
     return counts
 
@@ -138,70 +97,91 @@ def grade(student, request, course, model_data_cache=None, keep_raw_scores=False
     More information on the format is in the docstring for CourseGrader.
     """
 
-    grading_context = course.grading_context
-    raw_scores = []
-
     if model_data_cache is None:
-        model_data_cache = ModelDataCache(grading_context['all_descriptors'], course.id, student)
+        model_data_cache = ModelDataCache(course.grading_context['all_descriptors'], course.id, student)
+
+    def section_scores(section):
+        """Grade `section` from the student's modules"""
+        return _section_scores(student, request, course, section, model_data_cache)
+
+    return _grade_sections(course, section_scores, keep_raw_scores)
+
+
+def _section_scores(student, request, course, section, model_data_cache):
+    """
+    Return the list of Scores earned by `student` on the problems in `section`
+    (an entry of grading_context['graded_sections']), or None if the student
+    hasn't seen a single problem in it.
+    """
+    section_descriptor = section['section_descriptor']
+
+    should_grade_section = False
+    # If we haven't seen a single problem in the section, we don't have to grade it at all! We can assume 0%
+    for moduledescriptor in section['xmoduledescriptors']:
+        # some problems have state that is updated independently of interaction
+        # with the LMS, so they need to always be scored. (E.g. foldit.)
+        if moduledescriptor.always_recalculate_grades:
+            should_grade_section = True
+            break
+
+        # Create a fake key to pull out a StudentModule object from the ModelDataCache
+
+        key = LmsKeyValueStore.Key(
+            Scope.user_state,
+            student.id,
+            moduledescriptor.location,
+            None
+        )
+        if model_data_cache.find(key):
+            should_grade_section = True
+            break
+
+    if not should_grade_section:
+        return None
+
+    scores = []
+
+    def create_module(descriptor):
+        '''creates an XModule instance given a descriptor'''
+        # TODO: We need the request to pass into here. If we could forego that, our arguments
+        # would be simpler
+        return get_module_for_descriptor(student, request, descriptor, model_data_cache, course.id)
+
+    for module_descriptor in yield_dynamic_descriptor_descendents(section_descriptor, create_module):
+
+        (correct, total) = get_score(course.id, student, module_descriptor, create_module, model_data_cache)
+        if correct is None and total is None:
+            continue
+
+        scores.append(_graded_score(correct, total, module_descriptor))
+
+    return scores
 
+
+def _grade_sections(course, section_scores, keep_raw_scores):
+    """
+    Build the grade() summary for `course` from the scores of its graded
+    sections.
+
+    section_scores: a function that takes an entry of
+        grading_context['graded_sections'] and returns the list of Scores
+        earned in it, or None if the section hasn't been attempted.
+
+    Shared by all the ways of grading a student, so that they produce
+    identical summaries from identical scores.
+    """
+    raw_scores = []
     totaled_scores = {}
     # This next complicated loop is just to collect the totaled_scores, which is
     # passed to the grader
-    for section_format, sections in grading_context['graded_sections'].iteritems():
+    for section_format, sections in course.grading_context['graded_sections'].iteritems():
         format_scores = []
         for section in sections:
             section_descriptor = section['section_descriptor']
             section_name = section_descriptor.display_name_with_default
 
-            should_grade_section = False
-            # If we haven't seen a single problem in the section, we don't have to grade it at all! We can assume 0%
-            for moduledescriptor in section['xmoduledescriptors']:
-                # some problems have state that is updated independently of interaction
-                # with the LMS, so they need to always be scored. (E.g. foldit.)
-                if moduledescriptor.always_recalculate_grades:
-                    should_grade_section = True
-                    break
-
-                # Create a fake key to pull out a StudentModule object from the ModelDataCache
-
-                key = LmsKeyValueStore.Key(
-                    Scope.user_state,
-                    student.id,
-                    moduledescriptor.location,
-                    None
-                )
-                if model_data_cache.find(key):
-                    should_grade_section = True
-                    break
-
-            if should_grade_section:
-                scores = []
-
-                def create_module(descriptor):
-                    '''creates an XModule instance given a descriptor'''
-                    # TODO: We need the request to pass into here. If we could forego that, our arguments
-                    # would be simpler
-                    return get_module_for_descriptor(student, request, descriptor, model_data_cache, course.id)
-
-                for module_descriptor in yield_dynamic_descriptor_descendents(section_descriptor, create_module):
-
-                    (correct, total) = get_score(course.id, student, module_descriptor, create_module, model_data_cache)
-                    if correct is None and total is None:
-                        continue
-
-                    if settings.GENERATE_PROFILE_SCORES:  	# for debugging!
-                        if total > 1:
-                            correct = random.randrange(max(total - 2, 1), total + 1)
-                        else:
-                            correct = total
-
-                    graded = module_descriptor.lms.graded
-                    if not total > 0:
-                        #We simply cannot grade a problem that is 12/0, because we might need it as a percentage
-                        graded = False
-
-                    scores.append(Score(correct, total, graded, module_descriptor.display_name_with_default))
-
+            scores = section_scores(section)
+            if scores is not None:
                 _, graded_total = graders.aggregate_scores(scores, section_name)
                 if keep_raw_scores:
                     raw_scores += scores
@@ -232,6 +212,160 @@ def grade(student, request, course, model_data_cache=None, keep_raw_scores=False
     return grade_summary
 
 
+def cached_grade(student, request, course, model_data_cache=None, keep_raw_scores=False):
+    """
+    Returns the same summary as grade(), but reuses the section scores stored
+    in StudentSectionGrade, so that only the sections whose problems changed
+    since they were last graded (or that have never been graded) are
+    recomputed. Recomputed sections are stored for the next call.
+
+    Sections that can't be graded without instantiating modules for the
+    student (dynamic children, or modules that always recalculate their
+    grades) are never cached.
+    """
+    if settings.GENERATE_PROFILE_SCORES or not student.is_authenticated():
+        return grade(student, request, course, model_data_cache, keep_raw_scores)
+
+    stored_sections = dict(
+        (section_grade.section_key, section_grade)
+        for section_grade in StudentSectionGrade.objects.filter(student=student, course_id=course.id)
+    )
+
+    # Find the sections whose stored scores can't be used, keyed by section location url
+    stale_sections = {}
+    for sections in course.grading_context['graded_sections'].itervalues():
+        for section in sections:
+            section_key = section['section_descriptor'].location.url()
+            problems = _section_problems(section)
+            section_grade = stored_sections.get(section_key)
+            if problems is None or section_grade is None or section_grade.problems != problems:
+                stale_sections[section_key] = problems
+
+    if stale_sections and model_data_cache is None:
+        descriptors = []
+        for sections in course.grading_context['graded_sections'].itervalues():
+            for section in sections:
+                section_descriptor = section['section_descriptor']
+                if section_descriptor.location.url() in stale_sections:
+                    descriptors.extend(_descriptor_and_descendents(section_descriptor))
+        model_data_cache = ModelDataCache(descriptors, course.id, student)
+
+    def section_scores(section):
+        """Grade `section` from the stored scores, recomputing them if they are stale"""
+        section_key = section['section_descriptor'].location.url()
+        if section_key not in stale_sections:
+            scores = json.loads(stored_sections[section_key].scores)
+            return None if scores is None else [Score(*score) for score in scores]
+
+        scores = _section_scores(student, request, course, section, model_data_cache)
+        problems = stale_sections[section_key]
+        if problems is not None:
+            section_grade = stored_sections.get(section_key)
+            if section_grade is None:
+                section_grade = StudentSectionGrade(student=student, course_id=course.id, section_key=section_key)
+            section_grade.problems = problems
+            section_grade.scores = json.dumps(scores)
+            savepoint = transaction.savepoint()
+            try:
+                section_grade.save()
+                transaction.savepoint_commit(savepoint)
+            except IntegrityError:
+                # Another request stored this section first; its scores are just as good
+                transaction.savepoint_rollback(savepoint)
+                log.warning("Section grade for %s in %s was stored concurrently", student, section_key)
+        return scores
+
+    return _grade_sections(course, section_scores, keep_raw_scores)
+
+
+def _section_problems(section):
+    """
+    Returns the JSON description of the problems of `section` that is stored
+    with its cached scores, or None if the section's scores can't be cached.
+
+    Anything that changes the Scores computed for the section (which
+    problems it has, their content, which sets the maximum score of the
+    problems the student hasn't attempted, their weights, graded flags and
+    names) changes the description, so that course edits make the stored
+    scores stale.
+
+    Problems the student can't load yet aren't scored, and which ones those
+    are changes when their start dates pass, without any edit; so sections
+    with problems that haven't started aren't cached.
+    """
+    section_descriptor = section['section_descriptor']
+    if _needs_module_to_grade(section_descriptor):
+        return None
+
+    now = datetime.now(UTC())
+    for module_descriptor in section['xmoduledescriptors']:
+        if module_descriptor.lms.start is not None and module_descriptor.lms.start > now:
+            return None
+
+    return json.dumps([
+        [
+            module_descriptor.location.url(),
+            _content_fingerprint(module_descriptor),
+            module_descriptor.weight,
+            module_descriptor.lms.graded,
+            module_descriptor.display_name_with_default,
+        ]
+        for module_descriptor in section['xmoduledescriptors']
+    ])
+
+
+def _content_fingerprint(module_descriptor):
+    """
+    Returns a hash of the content fields of `module_descriptor` (for problems,
+    their XML), which changes whenever the problem is edited.
+
+    The hash is kept on the descriptor, so that it's computed once per loaded
+    version of the problem rather than each time a student is graded: edits
+    are only seen through newly loaded descriptors.
+    """
+    fingerprint = getattr(module_descriptor, '_content_fingerprint', None)
+    if fingerprint is None:
+        content_hash = hashlib.sha1()
+        for field in module_descriptor.fields:
+            if field.scope == Scope.content:
+                value = getattr(module_descriptor, field.name)
+                content_hash.update(json.dumps([field.name, value], sort_keys=True, default=unicode))
+        fingerprint = module_descriptor._content_fingerprint = content_hash.hexdigest()
+    return fingerprint
+
+
+def cached_grade_differences(student, request, course):
+    """
+    Consistency check for cached_grade(): compares its summary for `student`
+    with a fresh grade(), and returns the list of summary keys whose values
+    differ. An empty list means the cached grade is correct.
+    """
+    cached_summary = cached_grade(student, request, course, keep_raw_scores=True)
+    fresh_summary = grade(student, request, course, keep_raw_scores=True)
+
+    keys = set(cached_summary) | set(fresh_summary)
+    return sorted(key for key in keys if cached_summary.get(key) != fresh_summary.get(key))
+
+
+def _graded_score(correct, total, module_descriptor):
+    """
+    Build the Score that grade() feeds to the section aggregator for a
+    problem worth `correct` out of `total` points.
+    """
+    if settings.GENERATE_PROFILE_SCORES:  	# for debugging!
+        if total > 1:
+            correct = random.randrange(max(total - 2, 1), total + 1)
+        else:
+            correct = total
+
+    graded = module_descriptor.lms.graded
+    if not total > 0:
+        #We simply cannot grade a problem that is 12/0, because we might need it as a percentage
+        graded = False
+
+    return Score(correct, total, graded, module_descriptor.display_name_with_default)
+
+
 def grade_for_percentage(grade_cutoffs, percentage):
     """
     Returns a letter grade as defined in grading_policy (e.g. 'A' 'B' 'C' for 6.002x) or None.
@@ -397,13 +531,195 @@ def get_score(course_id, user, problem_descriptor, module_creator, model_data_ca
         if total is None:
             return (None, None)
 
-    # Now we re-weight the problem, if specified
+    return _reweight_score(correct, total, problem_descriptor)
+
+
+def _reweight_score(correct, total, problem_descriptor):
+    """
+    Re-weight the raw (correct, total) score of a problem by the descriptor's
+    weight, if it specifies one.
+    """
     weight = problem_descriptor.weight
     if weight is not None:
         if total == 0:
-            log.exception("Cannot reweight a problem with zero total points. Problem: " + str(student_module))
+            log.exception("Cannot reweight a problem with zero total points. Problem: " +
+                          str(problem_descriptor.location))
             return (correct, total)
         correct = correct * weight / total
         total = weight
 
     return (correct, total)
+
+
+# Number of students whose StudentModule rows are read with a single query by
+# iterate_grades_for. Keeps the IN clause below sqlite's parameter limit.
+BULK_GRADE_CHUNK_SIZE = 500
+
+
+def iterate_grades_for(course, students, request=None, keep_raw_scores=False):
+    """
+    Grade each student in `students` for `course`, yielding
+    (student, grade_summary) tuples in the order of `students`.
+
+    The grade summaries are the same as those returned by grade(), but they
+    are computed from the course's grading_context and one bulk read of
+    StudentModule rows per chunk of students, rather than by building
+    XModules for every student. A problem is only instantiated when a student
+    has no stored max_grade for it, and then only once for the whole course.
+
+    Modules with dynamic children, and modules that always recalculate their
+    grades (e.g. foldit), can only be scored by instantiating them for each
+    student. If the course contains any of those in a graded section, every
+    student is graded with grade() instead, which requires `request`.
+    """
+    graded_sections = _bulk_graded_sections(course.grading_context)
+    if graded_sections is None:
+        for student in students:
+            yield student, grade(student, request, course, keep_raw_scores=keep_raw_scores)
+        return
+
+    graded_locations = set(
+        descriptor.location.url() for descriptor in course.grading_context['all_descriptors']
+    )
+    # maps problem location urls to the problem's unweighted max score
+    max_scores = {}
+
+    for student_chunk in chunks(students, BULK_GRADE_CHUNK_SIZE):
+        student_rows = defaultdict(dict)
+        student_modules = StudentModule.objects.filter(
+            course_id=course.id,
+            student__in=[student.id for student in student_chunk],
+        ).values_list('student_id', 'module_state_key', 'grade', 'max_grade')
+        for student_id, module_state_key, module_grade, module_max_grade in student_modules:
+            if module_state_key in graded_locations:
+                student_rows[student_id][module_state_key] = (module_grade, module_max_grade)
+
+        for student in student_chunk:
+            yield student, _grade_from_rows(
+                student, course, graded_sections, student_rows[student.id], max_scores, keep_raw_scores
+            )
+
+
+def _descriptor_and_descendents(descriptor):
+    """
+    Yields `descriptor` and all of its static descendents (that is, without
+    creating modules to find dynamic children).
+    """
+    yield descriptor
+    for child in descriptor.get_children():
+        for module_descriptor in _descriptor_and_descendents(child):
+            yield module_descriptor
+
+
+def _needs_module_to_grade(section_descriptor):
+    """
+    Returns True if grading the section requires instantiating modules for the
+    student, because it contains modules with dynamic children or modules
+    that always recalculate their grades.
+    """
+    return any(
+        module_descriptor.has_dynamic_children() or module_descriptor.always_recalculate_grades
+        for module_descriptor in _descriptor_and_descendents(section_descriptor)
+    )
+
+
+def _bulk_graded_sections(grading_context):
+    """
+    Returns a dict mapping the location url of each graded section in
+    `grading_context` to a (section_locations, scored_descriptors) tuple.
+
+    section_locations is the set of location urls of the section's problems,
+    and scored_descriptors are the section's scored descendents, in the order
+    grade() visits them.
+
+    Returns None if any graded section can't be graded without instantiating
+    modules.
+    """
+    graded_sections = {}
+    for sections in grading_context['graded_sections'].itervalues():
+        for section in sections:
+            section_descriptor = section['section_descriptor']
+            if _needs_module_to_grade(section_descriptor):
+                return None
+
+            # No dynamic children, so this walks the tree exactly as grade() does
+            scored_descriptors = [
+                module_descriptor
+                for module_descriptor in yield_dynamic_descriptor_descendents(section_descriptor, None)
+                if module_descriptor.has_score
+            ]
+            section_locations = set(
+                module_descriptor.location.url() for module_descriptor in section['xmoduledescriptors']
+            )
+            graded_sections[section_descriptor.location.url()] = (section_locations, scored_descriptors)
+
+    return graded_sections
+
+
+def _grade_from_rows(student, course, graded_sections, rows, max_scores, keep_raw_scores):
+    """
+    Compute the grade() summary for `student` from `rows`, a dict mapping
+    problem location urls to the (grade, max_grade) stored in the student's
+    StudentModule for that problem.
+
+    graded_sections: as returned by _bulk_graded_sections
+    max_scores: a dict of already computed problem max scores, shared across students
+    """
+    def section_scores(section):
+        """Grade `section` from the student's rows"""
+        section_locations, scored_descriptors = graded_sections[section['section_descriptor'].location.url()]
+
+        # If we haven't seen a single problem in the section, we don't have to grade it at all! We can assume 0%
+        if not any(location in rows for location in section_locations):
+            return None
+
+        scores = []
+        for module_descriptor in scored_descriptors:
+            (correct, total) = _score_from_row(
+                student, course, module_descriptor, rows.get(module_descriptor.location.url()), max_scores
+            )
+            if correct is None and total is None:
+                continue
+
+            scores.append(_graded_score(correct, total, module_descriptor))
+
+        return scores
+
+    return _grade_sections(course, section_scores, keep_raw_scores)
+
+
+def _score_from_row(student, course, problem_descriptor, row, max_scores):
+    """
+    Return the score for `student` on a problem as a tuple (correct, total),
+    like get_score() does, using `row`, the (grade, max_grade) stored in the
+    student's StudentModule for the problem (or None if there isn't one).
+
+    The problem is only instantiated if no max_grade has been stored, and its
+    max score is then remembered in `max_scores` for the following students.
+    """
+    if row is not None and row[1] is not None:
+        correct = row[0] if row[0] is not None else 0
+        total = row[1]
+    else:
+        # get_module_for_descriptor would refuse to build the problem for this student
+        if not has_access(student, problem_descriptor, 'load', course.id):
+            return (None, None)
+
+        location = problem_descriptor.location.url()
+        if location not in max_scores:
+            model_data_cache = ModelDataCache([problem_descriptor], course.id, student)
+            problem = get_module_for_descriptor_internal(
+                student, problem_descriptor, model_data_cache, course.id,
+                lambda event_type, event: None, ''
+            )
+            max_scores[location] = problem.max_score() if problem is not None else None
+
+        correct = 0.0
+        total = max_scores[location]
+
+        # Problem may be an error module (if something in the problem builder failed)
+        # In which case total might be None
+        if total is None:
+            return (None, None)
+
+    return _reweight_score(correct, total, problem_descriptor)
@@ -0,0 +1,72 @@
+"""
+A command to rebuild the answer distribution counts of a course from the
+answers saved in its enrolled students' problem state.
+
+ProblemAnswerCount is kept up to date as students change their answers, so
+this is only needed for answers given before the counts existed, or after
+state was changed behind the problems' backs (e.g. deleted by an instructor).
+The course's counts are replaced in one transaction, so run it while the
+course is quiet: answers changed while it runs may not be counted.
+"""
+
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from courseware.courses import get_course_by_id
+from courseware.model_data import chunks
+from courseware.models import ProblemAnswerCount, StudentModule
+
+# Number of counts written per query
+CREATE_CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    """The backfill_answer_distributions command."""
+
+    args = "<course_id>"
+    help = "Rebuild the answer distribution counts of a course from its students' saved answers."
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("backfill_answer_distributions requires one argument: <course_id>")
+
+        course_id = args[0]
+        # make sure the course exists
+        get_course_by_id(course_id)
+
+        counts = defaultdict(int)
+        # only the answers of enrolled students are counted
+        states = StudentModule.objects.filter(
+            course_id=course_id, module_type='problem',
+            student__courseenrollment__course_id=course_id,
+        ).values_list('module_state_key', 'state')
+        for module_state_key, state in states.iterator():
+            try:
+                student_answers = json.loads(state or '{}').get('student_answers') or {}
+            except ValueError:
+                self.stdout.write("Skipping unparsable state of {0}\n".format(module_state_key))
+                continue
+            for answer_id, answer in student_answers.iteritems():
+                counts[(module_state_key, answer_id, unicode(answer))] += 1
+
+        answer_counts = (
+            ProblemAnswerCount(
+                course_id=course_id,
+                module_state_key=module_state_key,
+                answer_id=answer_id,
+                answer=answer,
+                answer_hash=ProblemAnswerCount.hash_answer(answer),
+                count=count,
+            )
+            for (module_state_key, answer_id, answer), count in counts.iteritems()
+        )
+
+        with transaction.commit_on_success():
+            ProblemAnswerCount.objects.filter(course_id=course_id).delete()
+            for chunk in chunks(answer_counts, CREATE_CHUNK_SIZE):
+                ProblemAnswerCount.objects.bulk_create(chunk)
+
+        self.stdout.write("Stored {0} answer counts for {1}\n".format(len(counts), course_id))
@@ -0,0 +1,61 @@
+"""
+A command to check the cached section grades of a course against freshly
+computed grades.
+
+For every student enrolled in the course, the summary built by
+grades.cached_grade is compared with the one from grades.grade.  Students
+whose summaries differ are reported, and with --repair their cached section
+grades are deleted so that they get recomputed on the next read.
+"""
+
+from optparse import make_option
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from courseware import grades
+from courseware.courses import get_course_by_id
+from courseware.models import StudentSectionGrade
+from instructor.offline_gradecalc import DummyRequest
+
+
+class Command(BaseCommand):
+    """The check_grade_cache command."""
+
+    args = "<course_id>"
+    help = "Compare the cached grades of every student in a course with freshly computed grades."
+
+    option_list = BaseCommand.option_list + (
+        make_option('--repair',
+                    action='store_true',
+                    dest='repair',
+                    default=False,
+                    help="Delete the cached section grades of students whose cached grade is wrong."),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("check_grade_cache requires one argument: <course_id>")
+
+        course = get_course_by_id(args[0])
+        enrolled_students = User.objects.filter(courseenrollment__course_id=course.id).prefetch_related("groups")
+
+        num_checked = 0
+        num_inconsistent = 0
+        for student in enrolled_students:
+            request = DummyRequest()
+            request.user = student
+
+            num_checked += 1
+            differences = grades.cached_grade_differences(student, request, course)
+            if not differences:
+                continue
+
+            num_inconsistent += 1
+            self.stdout.write("Cached grade of {0} differs in: {1}\n".format(student.username, ", ".join(differences)))
+            if options['repair']:
+                StudentSectionGrade.objects.filter(student=student, course_id=course.id).delete()
+
+        self.stdout.write("Checked {0} students, {1} with inconsistent cached grades\n".format(
+            num_checked, num_inconsistent
+        ))
@@ -18,6 +18,8 @@ import traceback
 from django.core.management.base import NoArgsCommand
 from django.db import connection
 
+from courseware.models import StudentModuleHistory
+
 
 class Command(NoArgsCommand):
     """The actual clean_history command to clean history rows."""
@@ -58,7 +60,8 @@ class Command(NoArgsCommand):
 class StudentModuleHistoryCleaner(object):
     """Logic to clean rows from the StudentModuleHistory table."""
 
-    DELETE_GAP_SECS = 0.5   # Rows this close can be discarded.
+    # Rows this close can be discarded: the same gap within which buffered rows are compacted.
+    DELETE_GAP_SECS = StudentModuleHistory.BUFFER_COMPACT_GAP.total_seconds()
     STATE_FILE = "clean_history.json"
     BATCH_SIZE = 100
 
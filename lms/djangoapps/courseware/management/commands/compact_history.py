@@ -0,0 +1,133 @@
+"""A command to compact old rows of the StudentModuleHistory table.
+
+clean_history discards history rows that were quickly followed by another.
+This goes further for history older than a retention period: of the rows of
+each StudentModule in each snapshot period (a day, by default), only the last
+is kept, as a snapshot of the state at the end of the period.  Recent history
+is left alone.
+
+Like clean_history, this works through the StudentModules in batches, and
+saves its progress in a state file so that it can be interrupted and resumed.
+
+"""
+
+import calendar
+import datetime
+import logging
+import optparse
+
+from django.core.management.base import NoArgsCommand
+from pytz import UTC
+
+from courseware.management.commands.clean_history import StudentModuleHistoryCleaner
+
+
+class StudentModuleHistoryCompactor(StudentModuleHistoryCleaner):
+    """Logic to compact old rows of the StudentModuleHistory table."""
+
+    STATE_FILE = "compact_history.json"
+    RETENTION_DAYS = 90
+    SNAPSHOT_HOURS = 24
+
+    def __init__(self, dry_run=False, retention_days=RETENTION_DAYS, snapshot_hours=SNAPSHOT_HOURS, now=None):
+        super(StudentModuleHistoryCompactor, self).__init__(dry_run=dry_run)
+        now = now or datetime.datetime.now(UTC)
+        self.cutoff = naive_utc(now) - datetime.timedelta(days=retention_days)
+        self.snapshot_secs = snapshot_hours * 60 * 60
+
+    def snapshot_period(self, created):
+        """Return the number of the snapshot period that a row `created` then falls in."""
+        return calendar.timegm(naive_utc(created).timetuple()) // self.snapshot_secs
+
+    def clean_one_student_module(self, student_module_id):
+        """Compact one StudentModule's-worth of history.
+
+        `student_module_id`: the id of the StudentModule to process.
+
+        """
+        history = self.get_history_for_student_modules(student_module_id)
+        if not history:
+            self.say("No history for student_module_id {}".format(student_module_id))
+            return
+
+        ids_to_delete = []
+        # The last row seen in the current snapshot period
+        last_id, last_period = None, None
+        for history_id, created in history:
+            if naive_utc(created) >= self.cutoff:
+                break
+            period = self.snapshot_period(created)
+            if period == last_period:
+                ids_to_delete.append(last_id)
+            last_id, last_period = history_id, period
+
+        verb = "Would have deleted" if self.dry_run else "Deleting"
+        self.say("{verb} {to_delete} rows of {total} for student_module_id {id}".format(
+            verb=verb,
+            to_delete=len(ids_to_delete),
+            total=len(history),
+            id=student_module_id,
+        ))
+
+        if ids_to_delete and not self.dry_run:
+            self.delete_history(ids_to_delete)
+
+
+def naive_utc(when):
+    """
+    Return the datetime `when` as a naive datetime in UTC.  Database cursors
+    return naive or aware datetimes, depending on the backend.
+    """
+    if when.tzinfo is not None:
+        when = when.astimezone(UTC).replace(tzinfo=None)
+    return when
+
+
+class Command(NoArgsCommand):
+    """The actual compact_history command to compact history rows."""
+
+    help = "Compacts old rows of the StudentModuleHistory table into periodic snapshots."
+
+    option_list = NoArgsCommand.option_list + (
+        optparse.make_option(
+            '--batch',
+            type='int',
+            default=100,
+            help="Batch size, number of module_ids to examine in a transaction.",
+        ),
+        optparse.make_option(
+            '--dry-run',
+            action='store_true',
+            default=False,
+            help="Don't change the database, just show what would be done.",
+        ),
+        optparse.make_option(
+            '--sleep',
+            type='float',
+            default=0,
+            help="Seconds to sleep between batches.",
+        ),
+        optparse.make_option(
+            '--retention-days',
+            type='int',
+            default=StudentModuleHistoryCompactor.RETENTION_DAYS,
+            help="Days of history to keep in full.",
+        ),
+        optparse.make_option(
+            '--snapshot-hours',
+            type='int',
+            default=StudentModuleHistoryCompactor.SNAPSHOT_HOURS,
+            help="Hours between the snapshots kept of older history.",
+        ),
+    )
+
+    def handle_noargs(self, **options):
+        # We don't want to see the SQL output from the db layer.
+        logging.getLogger("django.db.backends").setLevel(logging.INFO)
+
+        smhc = StudentModuleHistoryCompactor(
+            dry_run=options["dry_run"],
+            retention_days=options["retention_days"],
+            snapshot_hours=options["snapshot_hours"],
+        )
+        smhc.main(batch_size=options["batch"], sleep=options["sleep"])
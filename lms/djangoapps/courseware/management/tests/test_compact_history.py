@@ -0,0 +1,86 @@
+"""Test the compact_history management command."""
+
+from courseware.management.commands.compact_history import StudentModuleHistoryCompactor
+from courseware.management.tests.test_clean_history import HistoryCleanerTest, parse_date
+
+
+class SmhcompSayStubbed(StudentModuleHistoryCompactor):
+    """StudentModuleHistoryCompactor, but with .say() stubbed for testing."""
+    def __init__(self, **kwargs):
+        kwargs.setdefault('now', parse_date("2013-10-01 00:00:00.000"))
+        kwargs.setdefault('retention_days', 30)
+        super(SmhcompSayStubbed, self).__init__(**kwargs)
+        self.said_lines = []
+
+    def say(self, msg):
+        self.said_lines.append(msg)
+
+
+class HistoryCompactorTest(HistoryCleanerTest):
+    """Tests of StudentModuleHistoryCompactor with a real db."""
+
+    def test_no_history(self):
+        smhc = SmhcompSayStubbed()
+        self.write_history([
+            (4, "2013-07-13 16:30:00.000", 11),
+        ])
+
+        smhc.clean_one_student_module(22)
+        self.assert_said(smhc, "No history for student_module_id 22")
+        self.assert_history([
+            (4, "2013-07-13 16:30:00.000", 11),
+        ])
+
+    def test_a_bunch_of_rows(self):
+        # Old rows are compacted to the last of each day, recent rows are kept.
+        smhc = SmhcompSayStubbed()
+        self.write_history([
+            (4, "2013-07-13 09:30:00.000", 11),
+            (8, "2013-07-13 16:30:00.000", 11),
+            (15, "2013-07-13 23:59:59.000", 11),    # keep: last of the day
+            (16, "2013-07-14 00:00:01.000", 11),
+            (17, "2013-07-14 00:00:02.000", 22),    # other student_module_id!
+            (23, "2013-07-14 12:00:00.000", 11),    # keep: last of the day
+            (42, "2013-08-31 23:00:00.000", 11),    # keep: last before the cutoff
+            (98, "2013-09-15 10:00:00.000", 11),    # keep: recent
+            (99, "2013-09-15 10:00:01.000", 11),    # keep: recent
+        ])
+
+        smhc.clean_one_student_module(11)
+        self.assert_said(smhc, "Deleting 3 rows of 8 for student_module_id 11")
+        self.assert_history([
+            (15, "2013-07-13 23:59:59.000", 11),
+            (17, "2013-07-14 00:00:02.000", 22),
+            (23, "2013-07-14 12:00:00.000", 11),
+            (42, "2013-08-31 23:00:00.000", 11),
+            (98, "2013-09-15 10:00:00.000", 11),
+            (99, "2013-09-15 10:00:01.000", 11),
+        ])
+
+    def test_a_bunch_of_rows_dry_run(self):
+        smhc = SmhcompSayStubbed(dry_run=True)
+        self.write_history([
+            (4, "2013-07-13 09:30:00.000", 11),
+            (8, "2013-07-13 16:30:00.000", 11),
+        ])
+
+        smhc.clean_one_student_module(11)
+        self.assert_said(smhc, "Would have deleted 1 rows of 2 for student_module_id 11")
+        self.assert_history([
+            (4, "2013-07-13 09:30:00.000", 11),
+            (8, "2013-07-13 16:30:00.000", 11),
+        ])
+
+    def test_snapshot_hours(self):
+        smhc = SmhcompSayStubbed(snapshot_hours=12)
+        self.write_history([
+            (4, "2013-07-13 09:30:00.000", 11),     # keep: last of the morning
+            (8, "2013-07-13 16:30:00.000", 11),
+            (15, "2013-07-13 23:59:59.000", 11),    # keep: last of the afternoon
+        ])
+
+        smhc.clean_one_student_module(11)
+        self.assert_history([
+            (4, "2013-07-13 09:30:00.000", 11),
+            (15, "2013-07-13 23:59:59.000", 11),
+        ])
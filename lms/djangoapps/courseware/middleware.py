@@ -0,0 +1,26 @@
+"""
+Middleware for the courseware app.
+"""
+
+from courseware.models import StudentModuleHistory
+
+
+class StudentModuleHistoryMiddleware(object):
+    """
+    Buffers the StudentModuleHistory entries saved while handling a request,
+    and writes them in one query at the end of it, rather than one query per
+    StudentModule save.
+
+    This must come after TransactionMiddleware, so that the entries are written
+    in the request's transaction, and discarded when it is rolled back.
+    """
+
+    def process_request(self, request):
+        StudentModuleHistory.start_buffering()
+
+    def process_response(self, request, response):
+        StudentModuleHistory.flush_buffer()
+        return response
+
+    def process_exception(self, request, exception):
+        StudentModuleHistory.discard_buffer()
@@ -2,11 +2,14 @@
 Classes to provide the LMS runtime data storage to XBlocks
 """
 
+import copy
 import json
 from collections import namedtuple, defaultdict
-from itertools import chain
+from itertools import chain, islice
 from .models import (
     StudentModule,
+    StudentModuleHistory,
+    StudentSectionGrade,
     XModuleContentField,
     XModuleSettingsField,
     XModuleStudentPrefsField,
@@ -14,7 +17,7 @@ from .models import (
 )
 import logging
 
-from django.db import DatabaseError
+from django.db import DatabaseError, IntegrityError, transaction
 
 from xblock.runtime import KeyValueStore, InvalidScopeError
 from xblock.core import KeyValueMultiSaveError, Scope
@@ -32,9 +35,16 @@ class InvalidWriteError(Exception):
 def chunks(items, chunk_size):
     """
     Yields the values from items in chunks of size chunk_size
+
+    Items are only read from `items` as each chunk is needed, so it can be
+    a generator or a queryset iterator over more items than fit in memory.
     """
-    items = list(items)
-    return (items[i:i + chunk_size] for i in xrange(0, len(items), chunk_size))
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
 
 
 class ModelDataCache(object):
@@ -56,6 +66,8 @@ class ModelDataCache(object):
         select_for_update: True if rows should be locked until end of transaction
         '''
         self.cache = {}
+        # maps module_state_keys to (state json, decoded state) of StudentModules
+        self._decoded_states = {}
         self.descriptors = descriptors
         self.select_for_update = select_for_update
         self.course_id = course_id
@@ -232,6 +244,124 @@ class ModelDataCache(object):
         '''
         return self.cache.get(self._cache_key_from_kvs_key(key))
 
+    def _field_object_kwargs(self, key):
+        """
+        Return (model_class, lookup, defaults) for the model data object of the
+        LmsKeyValueStore.Key `key`: the class of the object, the values of the
+        fields that identify it, and the values of the other fields of a new one.
+
+        Returns (None, None, None) for scopes that aren't stored in models.
+        """
+        if key.scope == Scope.user_state:
+            return StudentModule, {
+                'course_id': self.course_id,
+                'student': self.user,
+                'module_state_key': key.block_scope_id.url(),
+            }, {
+                'state': json.dumps({}),
+                'module_type': key.block_scope_id.category,
+            }
+        elif key.scope == Scope.content:
+            return XModuleContentField, {
+                'field_name': key.field_name,
+                'definition_id': key.block_scope_id.url(),
+            }, {}
+        elif key.scope == Scope.settings:
+            return XModuleSettingsField, {
+                'field_name': key.field_name,
+                'usage_id': '%s-%s' % (self.course_id, key.block_scope_id.url()),
+            }, {}
+        elif key.scope == Scope.preferences:
+            return XModuleStudentPrefsField, {
+                'field_name': key.field_name,
+                'module_type': key.block_scope_id,
+                'student': self.user,
+            }, {}
+        elif key.scope == Scope.user_info:
+            return XModuleStudentInfoField, {
+                'field_name': key.field_name,
+                'student': self.user,
+            }, {}
+        return None, None, None
+
+    def _query_field_objects(self, scope, keys):
+        """
+        Queries the database for the model data objects of `keys`, which are all in
+        `scope`.  May return other objects as well.
+        """
+        field_names = set(key.field_name for key in keys)
+        if scope == Scope.user_state:
+            return self._chunked_query(
+                StudentModule,
+                'module_state_key__in',
+                set(key.block_scope_id.url() for key in keys),
+                course_id=self.course_id,
+                student=self.user.pk,
+            )
+        elif scope == Scope.content:
+            return self._chunked_query(
+                XModuleContentField,
+                'definition_id__in',
+                set(key.block_scope_id.url() for key in keys),
+                field_name__in=field_names,
+            )
+        elif scope == Scope.settings:
+            return self._chunked_query(
+                XModuleSettingsField,
+                'usage_id__in',
+                set('%s-%s' % (self.course_id, key.block_scope_id.url()) for key in keys),
+                field_name__in=field_names,
+            )
+        elif scope == Scope.preferences:
+            return self._chunked_query(
+                XModuleStudentPrefsField,
+                'module_type__in',
+                set(key.block_scope_id for key in keys),
+                student=self.user.pk,
+                field_name__in=field_names,
+            )
+        elif scope == Scope.user_info:
+            return self._query(
+                XModuleStudentInfoField,
+                student=self.user.pk,
+                field_name__in=field_names,
+            )
+        else:
+            raise InvalidScopeError(scope)
+
+    def _cache_field_objects(self, scope, keys_by_cache_key):
+        """
+        Read the model data objects of the keys in `keys_by_cache_key` (a dict from
+        cache keys to LmsKeyValueStore.Keys, all in `scope`) that exist into the cache
+        """
+        for field_object in self._query_field_objects(scope, keys_by_cache_key.values()):
+            cache_key = self._cache_key_from_field_object(scope, field_object)
+            if cache_key in keys_by_cache_key:
+                self.cache[cache_key] = field_object
+
+    def decoded_state(self, student_module):
+        """
+        Return the decoded state of `student_module`, which is a dict that may be
+        changed in place, followed by a call to encode_state.
+
+        The state is only decoded once for the life of this cache, unless the
+        StudentModule's state json is replaced by something other than encode_state.
+        """
+        state_json, state = self._decoded_states.get(student_module.module_state_key, (None, None))
+        if state_json is None or state_json is not student_module.state:
+            state = json.loads(student_module.state)
+            self._decoded_states[student_module.module_state_key] = (student_module.state, state)
+        return state
+
+    def encode_state(self, student_module):
+        """
+        Store the decoded state of `student_module`, as changed since decoded_state
+        returned it, back into its state json.  The StudentModule isn't saved.
+        """
+        state = self.decoded_state(student_module)
+        student_module.state = json.dumps(state)
+        self._decoded_states[student_module.module_state_key] = (student_module.state, state)
+
     def find_or_create(self, key):
         '''
         Find a model data object in this cache, or create it if it doesn't
@@ -242,42 +372,93 @@ class ModelDataCache(object):
         if field_object is not None:
             return field_object
 
-        if key.scope == Scope.user_state:
-            field_object, _ = StudentModule.objects.get_or_create(
-                course_id=self.course_id,
-                student=self.user,
-                module_state_key=key.block_scope_id.url(),
-                defaults={
-                    'state': json.dumps({}),
-                    'module_type': key.block_scope_id.category,
-                },
-            )
-        elif key.scope == Scope.content:
-            field_object, _ = XModuleContentField.objects.get_or_create(
-                field_name=key.field_name,
-                definition_id=key.block_scope_id.url()
-            )
-        elif key.scope == Scope.settings:
-            field_object, _ = XModuleSettingsField.objects.get_or_create(
-                field_name=key.field_name,
-                usage_id='%s-%s' % (self.course_id, key.block_scope_id.url()),
-            )
-        elif key.scope == Scope.preferences:
-            field_object, _ = XModuleStudentPrefsField.objects.get_or_create(
-                field_name=key.field_name,
-                module_type=key.block_scope_id,
-                student=self.user,
-            )
-        elif key.scope == Scope.user_info:
-            field_object, _ = XModuleStudentInfoField.objects.get_or_create(
-                field_name=key.field_name,
-                student=self.user,
-            )
+        model_class, lookup, defaults = self._field_object_kwargs(key)
+        if model_class is not None:
+            field_object, _ = model_class.objects.get_or_create(defaults=defaults, **lookup)
 
         cache_key = self._cache_key_from_kvs_key(key)
         self.cache[cache_key] = field_object
         return field_object
 
+    def find_or_create_many(self, keys):
+        '''
+        Find the model data objects of all of `keys` in this cache, and create
+        the ones that don't exist.  Returns the objects, in the order of `keys`.
+
+        Rather than a get_or_create per key, this takes one query per scope to
+        find the objects that other requests created since the cache was filled,
+        one bulk insert per scope for the rest, and one query per scope to read
+        the new objects back (bulk_create doesn't set their primary keys).
+
+        If another request creates one of the objects in the meantime, the insert
+        violates a unique constraint, and the remaining objects of the scope are
+        created one at a time instead.
+        '''
+        missing = defaultdict(dict)
+        for key in keys:
+            cache_key = self._cache_key_from_kvs_key(key)
+            if self.cache.get(cache_key) is None and self._field_object_kwargs(key)[0] is not None:
+                missing[key.scope][cache_key] = key
+
+        for scope, keys_by_cache_key in missing.items():
+            self._cache_field_objects(scope, keys_by_cache_key)
+
+            new_field_objects = []
+            for cache_key, key in keys_by_cache_key.items():
+                if cache_key not in self.cache:
+                    model_class, lookup, defaults = self._field_object_kwargs(key)
+                    new_field_objects.append(model_class(**dict(lookup, **defaults)))
+            if not new_field_objects:
+                continue
+
+            savepoint = transaction.savepoint()
+            try:
+                model_class.objects.bulk_create(new_field_objects)
+                transaction.savepoint_commit(savepoint)
+            except IntegrityError:
+                # Another request created some of these objects first
+                transaction.savepoint_rollback(savepoint)
+                for cache_key, key in keys_by_cache_key.items():
+                    if cache_key not in self.cache:
+                        self.find_or_create(key)
+                continue
+
+            self._cache_field_objects(scope, keys_by_cache_key)
+            if scope == Scope.user_state:
+                self._student_modules_created(
+                    [self.cache[self._cache_key_from_field_object(scope, field_object)]
+                     for field_object in new_field_objects]
+                )
+
+        return [self.find(key) for key in keys]
+
+    def _student_modules_created(self, student_modules):
+        """
+        Does the work of the StudentModule post_save receivers for `student_modules`,
+        which were created with bulk_create, which doesn't send signals.
+        """
+        StudentModuleHistory.save_history_many(student_modules)
+        StudentSectionGrade.invalidate_many(
+            self.user.pk, self.course_id, [student_module.module_state_key for student_module in student_modules]
+        )
+
+    def create_student_modules(self, descriptors):
+        '''
+        Find or create the StudentModules of the user for all of `descriptors` at once,
+        so that rendering them for the first time doesn't create them one at a time.
+        '''
+        if not self.user.is_authenticated():
+            return
+        self.find_or_create_many([
+            KeyValueStore.Key(
+                scope=Scope.user_state,
+                student_id=self.user.id,
+                block_scope_id=descriptor.location,
+                field_name=None,
+            )
+            for descriptor in descriptors
+        ])
+
 
 class LmsKeyValueStore(KeyValueStore):
     """
@@ -329,7 +510,12 @@ class LmsKeyValueStore(KeyValueStore):
             raise KeyError(key.field_name)
 
         if key.scope == Scope.user_state:
-            return json.loads(field_object.state)[key.field_name]
+            value = self._model_data_cache.decoded_state(field_object)[key.field_name]
+            # Containers are copied, so that changing them in place (as capa does with
+            # input_state) doesn't change the cached state; other json values are immutable
+            if isinstance(value, (dict, list)):
+                value = copy.deepcopy(value)
+            return value
         else:
             return json.loads(field_object.value)
 
@@ -365,16 +551,20 @@ class LmsKeyValueStore(KeyValueStore):
             # Update the list of associated fields
             field_objects[field_object].append(field)
 
-            # Special case when scope is for the user state, because this scope saves fields in a single row
+            # Special case when scope is for the user state, because this scope saves fields in a single row,
+            # which is encoded once all of its fields are set, below
             if field.scope == Scope.user_state:
-                state = json.loads(field_object.state)
-                state[field.field_name] = kv_dict[field]
-                field_object.state = json.dumps(state)
+                state = self._model_data_cache.decoded_state(field_object)
+                state[field.field_name] = copy.deepcopy(kv_dict[field])
             else:
             # The remaining scopes save fields on different rows, so
             # we don't have to worry about conflicts
                 field_object.value = json.dumps(kv_dict[field])
 
+        for field_object, fields in field_objects.items():
+            if fields[0].scope == Scope.user_state:
+                self._model_data_cache.encode_state(field_object)
+
         for field_object in field_objects:
             try:
                 # Save the field object that we made above
@@ -398,9 +588,9 @@ class LmsKeyValueStore(KeyValueStore):
             raise KeyError(key.field_name)
 
         if key.scope == Scope.user_state:
-            state = json.loads(field_object.state)
+            state = self._model_data_cache.decoded_state(field_object)
             del state[key.field_name]
-            field_object.state = json.dumps(state)
+            self._model_data_cache.encode_state(field_object)
             field_object.save()
         else:
             field_object.delete()
@@ -420,7 +610,7 @@ class LmsKeyValueStore(KeyValueStore):
             return False
 
         if key.scope == Scope.user_state:
-            return key.field_name in json.loads(field_object.state)
+            return key.field_name in self._model_data_cache.decoded_state(field_object)
         else:
             return True
 
@@ -12,11 +12,19 @@ file and check it in at the same time as your model changes. To do that,
 ASSUMPTIONS: modules have unique IDs, even across different module_types
 
 """
+import hashlib
+import json
+import threading
+from datetime import timedelta
+
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
+from student.models import CourseEnrollment
+
 
 class StudentModule(models.Model):
     """
@@ -71,13 +79,25 @@ class StudentModule(models.Model):
         return unicode(repr(self))
 
 
+# The StudentModuleHistory entries waiting to be written, while buffering
+_history_buffer = threading.local()
+
+
 class StudentModuleHistory(models.Model):
     """Keeps a complete history of state changes for a given XModule for a given
     Student. Right now, we restrict this to problems so that the table doesn't
-    explode in size."""
+    explode in size.
+
+    While buffering (see start_buffering, and the StudentModuleHistoryMiddleware
+    that buffers for every request), entries are kept in memory and written in
+    one query by flush_buffer.  An entry followed within BUFFER_COMPACT_GAP by
+    another of the same StudentModule is replaced by it, since clean_history,
+    which discards rows that close, would discard it anyway."""
 
     HISTORY_SAVING_TYPES = {'problem'}
 
+    BUFFER_COMPACT_GAP = timedelta(seconds=0.5)
+
     class Meta:
         get_latest_by = "created"
 
@@ -90,16 +110,316 @@ class StudentModuleHistory(models.Model):
     grade = models.FloatField(null=True, blank=True)
     max_grade = models.FloatField(null=True, blank=True)
 
+    @staticmethod
+    def for_student_module(student_module):
+        """Return an unsaved history entry recording the current state of `student_module`"""
+        return StudentModuleHistory(student_module=student_module,
+                                    version=None,
+                                    created=student_module.modified,
+                                    state=student_module.state,
+                                    grade=student_module.grade,
+                                    max_grade=student_module.max_grade)
+
     @receiver(post_save, sender=StudentModule)
     def save_history(sender, instance, **kwargs):
         if instance.module_type in StudentModuleHistory.HISTORY_SAVING_TYPES:
-            history_entry = StudentModuleHistory(student_module=instance,
-                                                 version=None,
-                                                 created=instance.modified,
-                                                 state=instance.state,
-                                                 grade=instance.grade,
-                                                 max_grade=instance.max_grade)
-            history_entry.save()
+            history_entry = StudentModuleHistory.for_student_module(instance)
+            if not StudentModuleHistory._buffer_entries([history_entry]):
+                history_entry.save()
+
+    @staticmethod
+    def save_history_many(student_modules):
+        """
+        Saves the history entries of `student_modules` as save_history would, in one
+        query.  For StudentModules saved without sending post_save, e.g. by bulk_create.
+        """
+        history_entries = [
+            StudentModuleHistory.for_student_module(student_module)
+            for student_module in student_modules
+            if student_module.module_type in StudentModuleHistory.HISTORY_SAVING_TYPES
+        ]
+        if not StudentModuleHistory._buffer_entries(history_entries):
+            StudentModuleHistory.objects.bulk_create(history_entries)
+
+    @receiver(post_delete, sender=StudentModule)
+    def discard_buffered_history(sender, instance, **kwargs):
+        # The entries of a deleted StudentModule can't be written
+        entries = getattr(_history_buffer, 'entries', None)
+        if entries:
+            _history_buffer.entries = [
+                entry for entry in entries if entry.student_module_id != instance.id
+            ]
+
+    @staticmethod
+    def start_buffering():
+        """Start keeping the history entries saved in this thread in memory, until flush_buffer"""
+        _history_buffer.entries = []
+
+    @staticmethod
+    def flush_buffer():
+        """Write the buffered history entries, and stop buffering"""
+        entries = getattr(_history_buffer, 'entries', None)
+        _history_buffer.entries = None
+        if entries:
+            StudentModuleHistory.objects.bulk_create(entries)
+
+    @staticmethod
+    def discard_buffer():
+        """Forget the buffered history entries, e.g. when their StudentModules weren't saved after all"""
+        _history_buffer.entries = None
+
+    @staticmethod
+    def _buffer_entries(history_entries):
+        """
+        Add `history_entries` to the buffer, compacting it.  Returns False if
+        not buffering, in which case the entries must be saved right away.
+        """
+        entries = getattr(_history_buffer, 'entries', None)
+        if entries is None:
+            return False
+
+        for history_entry in history_entries:
+            for index in reversed(xrange(len(entries))):
+                if entries[index].student_module_id == history_entry.student_module_id:
+                    if history_entry.created - entries[index].created < StudentModuleHistory.BUFFER_COMPACT_GAP:
+                        del entries[index]
+                    break
+            entries.append(history_entry)
+        return True
+
+
+class StudentSectionGrade(models.Model):
+    """
+    Caches the scores a student earned on the problems of one graded section
+    (subsection) of a course, so that courseware.grades.cached_grade only has
+    to recompute the sections that changed.
+
+    A row is deleted whenever one of the section's StudentModules is created,
+    deleted, or has its grade published, and is recomputed on the next read.
+    """
+
+    class Meta:
+        unique_together = (('student', 'course_id', 'section_key'),)
+
+    student = models.ForeignKey(User, db_index=True)
+    course_id = models.CharField(max_length=255, db_index=True)
+
+    # The location url of the section
+    section_key = models.CharField(max_length=255)
+
+    # JSON description of the problems in the section when the scores were
+    # computed, used to notice course content changes.  Contains the location
+    # url of each problem, which is what invalidate() searches for.
+    problems = models.TextField()
+
+    # JSON list of the section's Scores, or null if the student
+    # hadn't seen any of the section's problems
+    scores = models.TextField(null=True, blank=True)
+
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __repr__(self):
+        return 'StudentSectionGrade<%r>' % ({
+            'course_id': self.course_id,
+            'student': self.student.username,
+            'section_key': self.section_key,
+            'scores': self.scores,
+        },)
+
+    def __unicode__(self):
+        return unicode(repr(self))
+
+    @staticmethod
+    def invalidate(student_id, course_id, module_state_key):
+        """
+        Delete the cached scores of every section of `course_id` containing the
+        problem `module_state_key`, for the student with id `student_id`.
+        """
+        StudentSectionGrade.objects.filter(
+            student=student_id,
+            course_id=course_id,
+            problems__contains=json.dumps(module_state_key),
+        ).delete()
+
+    @staticmethod
+    def invalidate_many(student_id, course_id, module_state_keys):
+        """
+        Delete the cached scores of every section of `course_id` containing any of
+        the problems `module_state_keys`, for the student with id `student_id`.
+        """
+        searches = [json.dumps(module_state_key) for module_state_key in module_state_keys]
+        section_grades = StudentSectionGrade.objects.filter(
+            student=student_id,
+            course_id=course_id,
+        ).values_list('id', 'problems')
+        stale_ids = [
+            section_grade_id for section_grade_id, problems in section_grades
+            if any(search in problems for search in searches)
+        ]
+        if stale_ids:
+            StudentSectionGrade.objects.filter(id__in=stale_ids).delete()
+
+    @receiver(post_save, sender=StudentModule)
+    def invalidate_on_create(sender, instance, created, **kwargs):
+        # A section's scores change as soon as the student has seen one of its problems
+        if created:
+            StudentSectionGrade.invalidate(instance.student_id, instance.course_id, instance.module_state_key)
+
+    @receiver(post_delete, sender=StudentModule)
+    def invalidate_on_delete(sender, instance, **kwargs):
+        StudentSectionGrade.invalidate(instance.student_id, instance.course_id, instance.module_state_key)
+
+
+class ProblemAnswerCount(models.Model):
+    """
+    Counts the enrolled students whose current answer to one input of a problem
+    is a particular answer.  These counts are the course's answer distribution.
+
+    The counts are updated as enrolled students change their answers (see
+    record_answers), as their StudentModules are deleted, and as students
+    enroll in and unenroll from the course.  They can be rebuilt from
+    StudentModule state with the backfill_answer_distributions management
+    command.
+    """
+
+    class Meta:
+        unique_together = (('course_id', 'module_state_key', 'answer_id', 'answer_hash'),)
+
+    course_id = models.CharField(max_length=255, db_index=True)
+
+    # The location url of the problem
+    module_state_key = models.CharField(max_length=255)
+
+    # The id of the input within the problem
+    answer_id = models.CharField(max_length=255)
+
+    # The answer, as a string, and its hash, which is what's indexed
+    answer = models.TextField()
+    answer_hash = models.CharField(max_length=40)
+
+    count = models.IntegerField(default=0)
+
+    def __repr__(self):
+        return 'ProblemAnswerCount<%r>' % ({
+            'course_id': self.course_id,
+            'module_state_key': self.module_state_key,
+            'answer_id': self.answer_id,
+            'answer': self.answer,
+            'count': self.count,
+        },)
+
+    def __unicode__(self):
+        return unicode(repr(self))
+
+    @staticmethod
+    def hash_answer(answer):
+        """Return the answer_hash of the string `answer`"""
+        return hashlib.sha1(answer.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def record_answers(course_id, module_state_key, previous_answers, current_answers):
+        """
+        Update the counts of problem `module_state_key` in `course_id` for a student
+        whose answers changed from `previous_answers` to `current_answers`.  Both are
+        dicts mapping answer ids to answers as strings.
+        """
+        for answer_id in set(previous_answers) | set(current_answers):
+            previous_answer = previous_answers.get(answer_id)
+            current_answer = current_answers.get(answer_id)
+            if previous_answer == current_answer:
+                continue
+            if previous_answer is not None:
+                ProblemAnswerCount._add(course_id, module_state_key, answer_id, previous_answer, -1)
+            if current_answer is not None:
+                ProblemAnswerCount._add(course_id, module_state_key, answer_id, current_answer, 1)
+
+    @staticmethod
+    def is_counted(student_id, course_id):
+        """Whether the answers of the student with id `student_id` count in `course_id`"""
+        return CourseEnrollment.objects.filter(user=student_id, course_id=course_id).exists()
+
+    @staticmethod
+    def saved_answers(student_module):
+        """
+        Return the answers saved in the state of `student_module`, as a dict mapping
+        answer ids to answers as strings
+        """
+        try:
+            student_answers = json.loads(student_module.state or '{}').get('student_answers') or {}
+        except ValueError:
+            return {}
+        return dict((answer_id, unicode(answer)) for answer_id, answer in student_answers.iteritems())
+
+    @staticmethod
+    def _record_course_answers(student_id, course_id, count):
+        """
+        Count (if `count`) or stop counting all the saved answers of the student with id
+        `student_id` in `course_id`
+        """
+        student_modules = StudentModule.objects.filter(
+            student=student_id, course_id=course_id, module_type='problem'
+        ).only('module_state_key', 'state')
+        for student_module in student_modules:
+            answers = ProblemAnswerCount.saved_answers(student_module)
+            ProblemAnswerCount.record_answers(
+                course_id,
+                student_module.module_state_key,
+                {} if count else answers,
+                answers if count else {},
+            )
+
+    @receiver(post_delete, sender=StudentModule)
+    def discard_answers_on_delete(sender, instance, **kwargs):
+        # The answers of deleted state (e.g. reset by staff) no longer count
+        if instance.module_type != 'problem':
+            return
+        if not ProblemAnswerCount.is_counted(instance.student_id, instance.course_id):
+            return
+        ProblemAnswerCount.record_answers(
+            instance.course_id, instance.module_state_key, ProblemAnswerCount.saved_answers(instance), {}
+        )
+
+    @receiver(post_save, sender=CourseEnrollment)
+    def count_answers_on_enroll(sender, instance, created, **kwargs):
+        # Answers given before enrolling (e.g. by staff), or before unenrolling and
+        # enrolling again, count from now on
+        if created:
+            ProblemAnswerCount._record_course_answers(instance.user_id, instance.course_id, True)
+
+    @receiver(post_delete, sender=CourseEnrollment)
+    def discard_answers_on_unenroll(sender, instance, **kwargs):
+        # Students who left the course aren't part of its answer distribution
+        ProblemAnswerCount._record_course_answers(instance.user_id, instance.course_id, False)
+
+    @staticmethod
+    def _add(course_id, module_state_key, answer_id, answer, delta):
+        """Add `delta` to the count of `answer`, creating it if needed"""
+        counts = ProblemAnswerCount.objects.filter(
+            course_id=course_id,
+            module_state_key=module_state_key,
+            answer_id=answer_id,
+            answer_hash=ProblemAnswerCount.hash_answer(answer),
+        )
+        # Counting in the database keeps concurrent updates from being lost
+        if counts.update(count=F('count') + delta) or delta < 0:
+            return
+
+        savepoint = transaction.savepoint()
+        try:
+            ProblemAnswerCount.objects.create(
+                course_id=course_id,
+                module_state_key=module_state_key,
+                answer_id=answer_id,
+                answer=answer,
+                answer_hash=ProblemAnswerCount.hash_answer(answer),
+                count=delta,
+            )
+            transaction.savepoint_commit(savepoint)
+        except IntegrityError:
+            # Another request created the count first, so add to it instead
+            transaction.savepoint_rollback(savepoint)
+            counts.update(count=F('count') + delta)
 
 
 class XModuleContentField(models.Model):
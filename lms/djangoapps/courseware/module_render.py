@@ -36,7 +36,7 @@ from courseware.masquerade import setup_masquerade
 from courseware.model_data import LmsKeyValueStore, LmsUsage, ModelDataCache
 from xblock.runtime import KeyValueStore
 from xblock.core import Scope
-from courseware.models import StudentModule
+from courseware.models import ProblemAnswerCount, StudentModule, StudentSectionGrade
 from util.sandboxing import can_execute_unsafe_code
 from util.json_request import JsonResponse
 
@@ -163,6 +163,21 @@ def get_module(user, request, location, model_data_cache, course_id,
         return None
 
 
+def prefetch_student_modules(user, model_data_cache, course_id):
+    """
+    Create the StudentModules that rendering the descriptors of `model_data_cache`
+    (e.g. all of a sequence) for `user` will need, in a few queries up front,
+    rather than with a query or two per module as they're rendered.
+
+    Only problems are included, since they always save their state (their random
+    seed) when first rendered, and only those `user` has access to.
+    """
+    model_data_cache.create_student_modules(
+        descriptor for descriptor in model_data_cache.descriptors
+        if descriptor.location.category == 'problem' and has_access(user, descriptor, 'load', course_id)
+    )
+
+
 def get_xqueue_callback_url_prefix(request):
     """
     Calculates default prefix based on request, but allows override via settings
@@ -293,7 +308,14 @@ def get_module_for_descriptor_internal(user, descriptor, model_data_cache, cours
         )
 
     def publish(event):
-        """A function that allows XModules to publish events. This only supports grade changes right now."""
+        """A function that allows XModules to publish events. This supports grade and answer changes."""
+        if event.get('event_name') == 'answers':
+            if ProblemAnswerCount.is_counted(user.id, course_id):
+                ProblemAnswerCount.record_answers(
+                    course_id, descriptor.location.url(), event.get('previous', {}), event.get('current', {})
+                )
+            return
+
         if event.get('event_name') != 'grade':
             return
 
@@ -312,6 +334,8 @@ def get_module_for_descriptor_internal(user, descriptor, model_data_cache, cours
         student_module.max_grade = event.get('max_value')
         # Save all changes to the underlying KeyValueStore
         student_module.save()
+        # The cached scores of the sections containing this module are now out of date
+        StudentSectionGrade.invalidate(user.id, course_id, student_module.module_state_key)
 
         # Bin score into range and increment stats
         score_bucket = get_score_bucket(student_module.grade, student_module.max_grade)
@@ -0,0 +1,80 @@
+"""
+Tests of the buffering of StudentModuleHistory writes.
+"""
+from mock import Mock
+
+from django.test import TestCase
+
+from courseware.middleware import StudentModuleHistoryMiddleware
+from courseware.models import StudentModule, StudentModuleHistory
+from courseware.tests.factories import StudentModuleFactory, location
+
+
+class TestHistoryBuffering(TestCase):
+
+    def setUp(self):
+        self.student_module = StudentModuleFactory.create(
+            module_state_key=location('problem').url(), state='{"attempts": 0}'
+        )
+        self.addCleanup(StudentModuleHistory.discard_buffer)
+
+    def test_unbuffered(self):
+        "Test that history is written as StudentModules are saved when not buffering"
+        self.assertEquals(1, StudentModuleHistory.objects.count())
+        self.student_module.save()
+        self.assertEquals(2, StudentModuleHistory.objects.count())
+
+    def test_buffered(self):
+        "Test that buffered history is written when flushed"
+        StudentModuleHistory.start_buffering()
+        other_module = StudentModuleFactory.create(module_state_key=location('other').url())
+        self.student_module.state = '{"attempts": 1}'
+        self.student_module.save()
+        self.assertEquals(1, StudentModuleHistory.objects.count())
+
+        StudentModuleHistory.flush_buffer()
+        self.assertEquals(3, StudentModuleHistory.objects.count())
+        latest = StudentModuleHistory.objects.filter(student_module=self.student_module).latest()
+        self.assertEquals('{"attempts": 1}', latest.state)
+        self.assertTrue(StudentModuleHistory.objects.filter(student_module=other_module).exists())
+
+        # Saves after the flush are written right away
+        self.student_module.save()
+        self.assertEquals(4, StudentModuleHistory.objects.count())
+
+    def test_compacted(self):
+        "Test that quick successive saves of a StudentModule only keep the last history entry"
+        StudentModuleHistory.start_buffering()
+        for attempts in xrange(1, 4):
+            self.student_module.state = '{"attempts": %d}' % attempts
+            self.student_module.save()
+        StudentModuleHistory.flush_buffer()
+
+        history = StudentModuleHistory.objects.filter(student_module=self.student_module).order_by('id')
+        self.assertEquals(['{"attempts": 0}', '{"attempts": 3}'], [entry.state for entry in history])
+
+    def test_deleted_module(self):
+        "Test that the buffered history of a deleted StudentModule is dropped"
+        StudentModuleHistory.start_buffering()
+        self.student_module.save()
+        StudentModuleHistory.objects.filter(student_module=self.student_module).delete()
+        StudentModule.objects.get(id=self.student_module.id).delete()
+        StudentModuleHistory.flush_buffer()
+        self.assertEquals(0, StudentModuleHistory.objects.count())
+
+    def test_middleware(self):
+        "Test that the middleware writes the history of a request, or drops it on an error"
+        middleware = StudentModuleHistoryMiddleware()
+        request = Mock()
+
+        middleware.process_request(request)
+        self.student_module.save()
+        self.assertEquals(1, StudentModuleHistory.objects.count())
+        middleware.process_response(request, Mock())
+        self.assertEquals(2, StudentModuleHistory.objects.count())
+
+        middleware.process_request(request)
+        self.student_module.save()
+        middleware.process_exception(request, Exception())
+        middleware.process_response(request, Mock())
+        self.assertEquals(2, StudentModuleHistory.objects.count())
@@ -7,7 +7,7 @@ from functools import partial
 
 from courseware.model_data import LmsKeyValueStore, InvalidWriteError
 from courseware.model_data import InvalidScopeError, ModelDataCache
-from courseware.models import StudentModule, XModuleContentField, XModuleSettingsField
+from courseware.models import StudentModule, StudentModuleHistory, XModuleContentField, XModuleSettingsField
 from courseware.models import XModuleStudentInfoField, XModuleStudentPrefsField
 
 from student.tests.factories import UserFactory
@@ -18,7 +18,7 @@ from courseware.tests.factories import StudentPrefsFactory, StudentInfoFactory
 from xblock.core import Scope, BlockScope
 from xmodule.modulestore import Location
 from django.test import TestCase
-from django.db import DatabaseError
+from django.db import DatabaseError, IntegrityError
 from xblock.core import KeyValueMultiSaveError
 
 
@@ -151,6 +151,34 @@ class TestStudentModuleStorage(TestCase):
         "Test that `has` returns False for missing fields in StudentModule"
         self.assertFalse(self.kvs.has(user_state_key('not_a_field')))
 
+    def test_state_decoded_once(self):
+        "Test that the state of a StudentModule is only decoded once for many reads"
+        with patch('courseware.model_data.json.loads', wraps=json.loads) as mock_loads:
+            self.assertEquals('a_value', self.kvs.get(user_state_key('a_field')))
+            self.assertEquals('b_value', self.kvs.get(user_state_key('b_field')))
+            self.assertTrue(self.kvs.has(user_state_key('a_field')))
+        self.assertEquals(1, mock_loads.call_count)
+
+    def test_state_decoded_again_when_replaced(self):
+        "Test that replacing the state json of a StudentModule is noticed"
+        self.assertEquals('a_value', self.kvs.get(user_state_key('a_field')))
+        student_module = self.mdc.find(user_state_key('a_field'))
+        student_module.state = json.dumps({'a_field': 'replaced_value'})
+        self.assertEquals('replaced_value', self.kvs.get(user_state_key('a_field')))
+
+    def test_get_returns_copy(self):
+        "Test that changing a value in place doesn't change the stored state"
+        self.kvs.set(user_state_key('a_field'), ['a_value'])
+        self.kvs.get(user_state_key('a_field')).append('b_value')
+        self.assertEquals(['a_value'], self.kvs.get(user_state_key('a_field')))
+
+    def test_set_copies_value(self):
+        "Test that changing a value in place after setting it doesn't change the stored state"
+        value = ['a_value']
+        self.kvs.set(user_state_key('a_field'), value)
+        value.append('b_value')
+        self.assertEquals(['a_value'], self.kvs.get(user_state_key('a_field')))
+
     def construct_kv_dict(self):
         """Construct a kv_dict that can be passed to set_many"""
         key1 = user_state_key('field_a')
@@ -167,6 +195,15 @@ class TestStudentModuleStorage(TestCase):
         for key in kv_dict:
             self.assertEquals(self.kvs.get(key), kv_dict[key])
 
+    def test_set_many_encodes_once(self):
+        "Test that setting many fields encodes and saves the StudentModule once"
+        kv_dict = self.construct_kv_dict()
+        with patch('courseware.model_data.json.dumps', wraps=json.dumps) as mock_dumps:
+            with patch('courseware.models.StudentModule.save') as mock_save:
+                self.kvs.set_many(kv_dict)
+        self.assertEquals(1, mock_dumps.call_count)
+        self.assertEquals(1, mock_save.call_count)
+
     def test_set_many_failure(self):
         "Test failures when setting many fields that are scoped to Scope.user_state"
         kv_dict = self.construct_kv_dict()
@@ -217,6 +254,69 @@ class TestMissingStudentModule(TestCase):
         self.assertFalse(self.kvs.has(user_state_key('a_field')))
 
 
+class TestFindOrCreateMany(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create(username='user')
+        self.mdc = ModelDataCache([mock_descriptor()], course_id, self.user)
+        self.keys = [
+            LmsKeyValueStore.Key(Scope.user_state, 'user', location('problem_%d' % i), None)
+            for i in xrange(3)
+        ]
+
+    def test_create_student_modules(self):
+        "Test that missing StudentModules are created along with their history"
+        student_modules = self.mdc.find_or_create_many(self.keys)
+
+        self.assertEquals(3, StudentModule.objects.all().count())
+        self.assertEquals(3, StudentModuleHistory.objects.all().count())
+        self.assertEquals(
+            [key.block_scope_id.url() for key in self.keys],
+            [student_module.module_state_key for student_module in student_modules]
+        )
+        for student_module in student_modules:
+            self.assertIsNotNone(student_module.id)
+            self.assertEquals('problem', student_module.module_type)
+            self.assertEquals({}, json.loads(student_module.state))
+
+        # Once created, the same objects are found in the cache
+        self.assertEquals(student_modules, [self.mdc.find_or_create(key) for key in self.keys])
+
+    def test_created_elsewhere(self):
+        "Test that StudentModules created since the cache was filled aren't duplicated"
+        existing = StudentModuleFactory.create(
+            student=self.user,
+            module_state_key=self.keys[1].block_scope_id.url(),
+            state=json.dumps({'a_field': 'a_value'}),
+        )
+
+        student_modules = self.mdc.find_or_create_many(self.keys)
+
+        self.assertEquals(3, StudentModule.objects.all().count())
+        self.assertEquals(existing.id, student_modules[1].id)
+        self.assertEquals({'a_field': 'a_value'}, json.loads(student_modules[1].state))
+
+    def test_integrity_error(self):
+        "Test that a concurrent insert falls back to creating the objects one by one"
+        with patch('courseware.model_data.StudentModule.objects.bulk_create') as mock_bulk_create:
+            mock_bulk_create.side_effect = IntegrityError
+            student_modules = self.mdc.find_or_create_many(self.keys)
+
+        self.assertEquals(3, StudentModule.objects.all().count())
+        self.assertEquals(
+            [key.block_scope_id.url() for key in self.keys],
+            [student_module.module_state_key for student_module in student_modules]
+        )
+
+    def test_create_content_fields(self):
+        "Test that objects of other scopes are created too"
+        keys = [content_key('field_%d' % i) for i in xrange(3)]
+
+        fields = self.mdc.find_or_create_many(keys)
+
+        self.assertEquals(3, XModuleContentField.objects.all().count())
+        self.assertEquals(['field_0', 'field_1', 'field_2'], [field.field_name for field in fields])
+
+
 class StorageTestBase(object):
     """
     A base class for that gets subclassed when testing each of the scopes.
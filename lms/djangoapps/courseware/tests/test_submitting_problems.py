@@ -4,7 +4,10 @@
 import json
 from textwrap import dedent
 
+from mock import patch
+
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test.client import RequestFactory
 from django.core.urlresolvers import reverse
 from django.test.utils import override_settings
@@ -12,6 +15,8 @@ from django.test.utils import override_settings
 # Need access to internal func to put users in the right group
 from courseware import grades
 from courseware.model_data import ModelDataCache
+from courseware.models import ProblemAnswerCount, StudentModule, StudentSectionGrade
+from student.models import CourseEnrollment
 
 from xmodule.modulestore.django import modulestore
 
@@ -266,6 +271,27 @@ class TestCourseGrader(TestSubmittingProblems):
                                                    model_data_cache)
         return progress_summary
 
+    def get_bulk_grade_summary(self):
+        """
+        calls grades.iterate_grades_for for the current user and course, and
+        returns the grade summary it produced.
+        """
+        fake_request = self.factory.get(reverse('progress',
+                                        kwargs={'course_id': self.course.id}))
+
+        [(student, grade_summary)] = grades.iterate_grades_for(self.course, [self.student_user], fake_request)
+        self.assertEqual(student, self.student_user)
+        return grade_summary
+
+    def get_cached_grade_summary(self):
+        """
+        calls grades.cached_grade for the current user and course.
+        """
+        fake_request = self.factory.get(reverse('progress',
+                                        kwargs={'course_id': self.course.id}))
+
+        return grades.cached_grade(self.student_user, fake_request, self.course)
+
     def check_grade_percent(self, percent):
         """
         Assert that percent grade is as expected.
@@ -550,6 +576,164 @@ class TestCourseGrader(TestSubmittingProblems):
         self.assertEqual(self.score_for_hw('homework3'), [1.0, 1.0])
 
 
+    def test_bulk_grade_none(self):
+        """
+        Check that bulk grading matches grade() before anything is answered.
+        """
+        self.basic_setup()
+        self.assertEqual(self.get_bulk_grade_summary(), self.get_grade_summary())
+
+    def test_bulk_grade_matches(self):
+        """
+        Check that bulk grading matches grade() for partially answered homeworks.
+        """
+        self.dropping_setup()
+        self.dropping_homework_stage1()
+
+        grade_summary = self.get_grade_summary()
+        self.assertEqual(self.get_bulk_grade_summary(), grade_summary)
+        self.assertEqual(grade_summary['percent'], 0.75)
+
+    def test_bulk_grade_weighted(self):
+        """
+        Check that bulk grading re-weights problems the way grade() does.
+        """
+        self.weighted_setup()
+        self.submit_question_answer('H1P1', {'2_1': 'Correct', '2_2': 'Correct'})
+        self.assertEqual(self.get_bulk_grade_summary(), self.get_grade_summary())
+
+
+    def test_cached_grade_matches(self):
+        """
+        Check that cached grades match grade(), and are stored per section.
+        """
+        self.dropping_setup()
+        self.dropping_homework_stage1()
+
+        self.assertEqual(self.get_cached_grade_summary(), self.get_grade_summary())
+        self.assertEqual(StudentSectionGrade.objects.filter(student=self.student_user).count(), 3)
+
+        # Reading from the stored section grades gives the same result
+        self.assertEqual(self.get_cached_grade_summary(), self.get_grade_summary())
+
+    def test_cached_grade_invalidation(self):
+        """
+        Check that answering a problem invalidates only the cached grade of its section.
+        """
+        self.dropping_setup()
+        self.dropping_homework_stage1()
+        self.check_grade_percent(0.75)
+        self.assertEqual(self.get_cached_grade_summary()['percent'], 0.75)
+
+        homework3 = self.homework3.location.url()
+        self.submit_question_answer(self.hw3_names[0], {'2_1': 'Correct'})
+        self.submit_question_answer(self.hw3_names[1], {'2_1': 'Correct'})
+        self.assertItemsEqual(
+            StudentSectionGrade.objects.filter(student=self.student_user).values_list('section_key', flat=True),
+            [self.homework1.location.url(), self.homework2.location.url()]
+        )
+
+        self.assertEqual(self.get_cached_grade_summary()['percent'], 1.0)
+        self.assertTrue(StudentSectionGrade.objects.filter(student=self.student_user, section_key=homework3).exists())
+
+        fake_request = self.factory.get(reverse('progress',
+                                        kwargs={'course_id': self.course.id}))
+        self.assertEqual(grades.cached_grade_differences(self.student_user, fake_request, self.course), [])
+
+    def test_cached_grade_problem_edit(self):
+        """
+        Check that editing a problem the student hasn't attempted makes the cached grade of its section stale.
+        """
+        self.basic_setup()
+        self.submit_question_answer('p1', {'2_1': 'Correct'})
+        self.assertEqual(self.get_cached_grade_summary(), self.get_grade_summary())
+
+        # p3 is now worth 3 points rather than 1
+        prob_xml = OptionResponseXMLFactory().build_xml(
+            question_text='The correct answer is Correct',
+            num_inputs=3,
+            weight=3,
+            options=['Correct', 'Incorrect'],
+            correct_option='Correct'
+        )
+        modulestore().update_item(self.problem_location('p3'), prob_xml)
+        self.refresh_course()
+
+        self.assertEqual(self.get_cached_grade_summary(), self.get_grade_summary())
+        self.assertEqual(self.get_cached_grade_summary()['percent'], 0.2)
+
+    def test_cached_grade_fingerprints_computed_once(self):
+        """
+        Check that the problems' content is only hashed the first time the course's grades are read.
+        """
+        self.basic_setup()
+        self.get_cached_grade_summary()
+        with patch('courseware.grades.hashlib.sha1') as mock_sha1:
+            self.get_cached_grade_summary()
+        self.assertFalse(mock_sha1.called)
+
+    def get_answer_distribution(self):
+        """
+        Return the course's answer distribution, as a dict mapping problem
+        url_names to dicts of answer -> count.
+        """
+        fake_request = self.factory.get(reverse('progress',
+                                        kwargs={'course_id': self.course.id}))
+        distribution = grades.answer_distributions(fake_request, self.course)
+        return dict((url_name, dict(answers)) for (url_name, _, _), answers in distribution.items())
+
+    def test_answer_distribution(self):
+        """
+        Check that answer counts follow the students' current answers.
+        """
+        self.basic_setup()
+        self.submit_question_answer('p1', {'2_1': 'Correct'})
+        self.submit_question_answer('p2', {'2_1': 'Correct'})
+        self.assertEqual(self.get_answer_distribution(), {'p1': {'Correct': 1}, 'p2': {'Correct': 1}})
+
+        # Resetting the problem clears the student's answer
+        self.reset_question_answer('p1')
+        self.assertEqual(self.get_answer_distribution(), {'p2': {'Correct': 1}})
+
+        self.submit_question_answer('p1', {'2_1': 'Incorrect'})
+        self.assertEqual(self.get_answer_distribution(), {'p1': {'Incorrect': 1}, 'p2': {'Correct': 1}})
+
+        # Deleting the student's state (e.g. from the instructor dashboard) discards the answers
+        StudentModule.objects.get(
+            student=self.student_user, module_state_key=self.problem_location('p2')
+        ).delete()
+        self.assertEqual(self.get_answer_distribution(), {'p1': {'Incorrect': 1}})
+
+    def test_answer_distribution_enrollment(self):
+        """
+        Check that only the answers of enrolled students are counted.
+        """
+        self.basic_setup()
+        self.submit_question_answer('p1', {'2_1': 'Correct'})
+        self.assertEqual(self.get_answer_distribution(), {'p1': {'Correct': 1}})
+
+        CourseEnrollment.objects.get(user=self.student_user, course_id=self.course.id).delete()
+        self.assertEqual(self.get_answer_distribution(), {})
+
+        CourseEnrollment.objects.create(user=self.student_user, course_id=self.course.id)
+        self.assertEqual(self.get_answer_distribution(), {'p1': {'Correct': 1}})
+
+    def test_answer_distribution_backfill(self):
+        """
+        Check that the counts can be rebuilt from the students' saved answers.
+        """
+        self.basic_setup()
+        self.submit_question_answer('p1', {'2_1': 'Incorrect'})
+        self.submit_question_answer('p2', {'2_1': 'Correct'})
+        distribution = self.get_answer_distribution()
+
+        ProblemAnswerCount.objects.all().delete()
+        self.assertEqual(self.get_answer_distribution(), {})
+
+        call_command('backfill_answer_distributions', self.course.id)
+        self.assertEqual(self.get_answer_distribution(), distribution)
+
+
 class TestPythonGradedResponse(TestSubmittingProblems):
     """
     Check that we can submit a schematic and custom response, and it answers properly.
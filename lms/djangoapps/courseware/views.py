@@ -23,7 +23,7 @@ from courseware.courses import (get_courses, get_course_with_access,
 import courseware.tabs as tabs
 from courseware.masquerade import setup_masquerade
 from courseware.model_data import ModelDataCache
-from .module_render import toc_for_course, get_module_for_descriptor, get_module
+from .module_render import toc_for_course, get_module_for_descriptor, get_module, prefetch_student_modules
 from courseware.models import StudentModule, StudentModuleHistory
 
 from django_comment_client.utils import get_discussion_title
@@ -374,6 +374,7 @@ def index(request, course_id, chapter=None, section=None,
             # html, which in general will need all of its children
             section_model_data_cache = ModelDataCache.cache_for_descriptor_descendents(
                 course_id, user, section_descriptor, depth=None)
+            prefetch_student_modules(user, section_model_data_cache, course_id)
             section_module = get_module(request.user, request,
                                 section_descriptor.location,
                                 section_model_data_cache, course_id, position, depth=None)
@@ -686,7 +687,7 @@ def progress(request, course_id, student_id=None):
 
     courseware_summary = grades.progress_summary(student, request, course,
                                                  model_data_cache)
-    grade_summary = grades.grade(student, request, course, model_data_cache)
+    grade_summary = grades.cached_grade(student, request, course, model_data_cache)
 
     if courseware_summary is None:
         #This means the student didn't have access to the course (which the instructor requested)
@@ -3,7 +3,9 @@
 # django management command: dump grades to csv files
 # for use by batch processes
 
-from instructor.offline_gradecalc import offline_grade_calculation
+from optparse import make_option
+
+from instructor.offline_gradecalc import offline_grade_calculation, DEFAULT_CHUNK_SIZE
 from courseware.courses import get_course_by_id
 from xmodule.modulestore.django import modulestore
 
@@ -16,6 +18,22 @@ class Command(BaseCommand):
     help += "   course_id_or_dir: either course_id or course_dir\n"
     help += 'Example course_id: MITx/8.01rq_MW/Classical_Mechanics_Reading_Questions_Fall_2012_MW_Section'
 
+    option_list = BaseCommand.option_list + (
+        make_option('--processes',
+                    type='int',
+                    default=1,
+                    help='Number of worker processes grading students in parallel.'),
+        make_option('--chunk-size',
+                    type='int',
+                    dest='chunk_size',
+                    default=DEFAULT_CHUNK_SIZE,
+                    help='Number of students graded and saved together.'),
+        make_option('--force',
+                    action='store_true',
+                    default=False,
+                    help='Recompute all grades, instead of skipping students whose computed grades are current.'),
+    )
+
     def handle(self, *args, **options):
 
         print "args = ", args
@@ -40,4 +58,5 @@ class Command(BaseCommand):
         print "-----------------------------------------------------------------------------"
         print "Computing grades for %s" % (course.id)
 
-        offline_grade_calculation(course.id)
+        offline_grade_calculation(course.id, processes=options['processes'],
+                                  chunk_size=options['chunk_size'], force=options['force'])
@@ -7,11 +7,25 @@
 
 import json
 import time
+from multiprocessing import Pool
 
 from json import JSONEncoder
 from courseware import grades, models
 from courseware.courses import get_course_by_id
+from courseware.model_data import chunks
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core import cache as django_cache
+from django.db import connection, transaction
+from django.db.models import Max
+from pytz import UTC
+from request_cache.middleware import RequestCache
+import util.cache
+from xmodule.contentstore import django as contentstore_django
+from xmodule.modulestore import django as modulestore_django
+
+# Number of students graded, and whose gradesets are written, together
+DEFAULT_CHUNK_SIZE = 100
 
 
 class MyEncoder(JSONEncoder):
@@ -25,49 +39,183 @@ class MyEncoder(JSONEncoder):
             yield chunk
 
 
-def offline_grade_calculation(course_id):
+class DummyRequest(object):
+    META = {}
+
+    def __init__(self):
+        self.user = None
+        self.session = {}
+
+    def get_host(self):
+        return 'edx.mit.edu'
+
+    def is_secure(self):
+        return False
+
+
+def offline_grade_calculation(course_id, processes=1, chunk_size=DEFAULT_CHUNK_SIZE, force=False):
     '''
     Compute grades for all students for a specified course, and save results to the DB.
-    '''
 
-    tstart = time.time()
-    enrolled_students = User.objects.filter(courseenrollment__course_id=course_id).prefetch_related("groups").order_by('username')
+    The students are graded in chunks of `chunk_size`, by a pool of `processes` worker
+    processes (or in this process, if `processes` is 1).  The gradesets of each chunk are
+    written together as soon as the chunk is graded.
 
-    enc = MyEncoder()
+    Unless `force` is set, students whose stored gradeset is newer than both the course's
+    last publish and their own last activity in the course are skipped, so that an
+    interrupted calculation can be resumed.
+    '''
 
-    class DummyRequest(object):
-        META = {}
-        def __init__(self):
-            return
-        def get_host(self):
-            return 'edx.mit.edu'
-        def is_secure(self):
-            return False
+    tstart = time.time()
+    enrolled_students = User.objects.filter(courseenrollment__course_id=course_id).order_by('username')
+    student_ids = list(enrolled_students.values_list('id', flat=True))
+    nstudents = len(student_ids)
 
-    print "%d enrolled students" % len(enrolled_students)
+    print "%d enrolled students" % nstudents
     course = get_course_by_id(course_id)
 
-    for student in enrolled_students:
-        request = DummyRequest()
-        request.user = student
-        request.session = {}
-
-        gradeset = grades.grade(student, request, course, keep_raw_scores=True)
-        gs = enc.encode(gradeset)
-        ocg, created = models.OfflineComputedGrade.objects.get_or_create(user=student, course_id=course_id)
-        ocg.gradeset = gs
-        ocg.save()
-        print "%s done" % student  	# print statement used because this is run by a management command
+    if not force:
+        student_ids = students_needing_grades(course, student_ids)
+        print "%d students need their grades computed" % len(student_ids)
+
+    student_chunks = list(chunks(student_ids, chunk_size))
+    if processes > 1:
+        # Close the database connection rather than let the workers inherit it; every
+        # process then opens its own the next time it needs one.  The workers drop the
+        # modulestore and cache connections themselves (see _init_grading_worker).
+        connection.close()
+        pool = Pool(processes, initializer=_init_grading_worker, initargs=(course_id,))
+        results = pool.imap_unordered(_grade_students_in_worker, student_chunks)
+    else:
+        pool = None
+        results = (_grade_students(course, student_chunk) for student_chunk in student_chunks)
+
+    ndone = 0
+    for ngraded in results:
+        ndone += ngraded
+        print "%d of %d students done" % (ndone, len(student_ids))  	# print statement used because this is run by a management command
+
+    if pool is not None:
+        pool.close()
+        pool.join()
 
     tend = time.time()
     dt = tend - tstart
 
-    ocgl = models.OfflineComputedGradeLog(course_id=course_id, seconds=dt, nstudents=len(enrolled_students))
+    ocgl = models.OfflineComputedGradeLog(course_id=course_id, seconds=dt, nstudents=nstudents)
     ocgl.save()
     print ocgl
     print "All Done!"
 
 
+def students_needing_grades(course, student_ids):
+    '''
+    Returns the ids in `student_ids` of the students who don't have an offline computed
+    gradeset for `course` that is newer than both the course's last publish and their
+    latest StudentModule change in the course.
+    '''
+    last_published = course_last_published(course)
+    computed = dict(
+        models.OfflineComputedGrade.objects.filter(course_id=course.id).values_list('user', 'updated')
+    )
+    last_activity = dict(
+        models.StudentModule.objects.filter(course_id=course.id).values('student').annotate(
+            last_modified=Max('modified')
+        ).values_list('student', 'last_modified')
+    )
+
+    def is_current(student_id):
+        '''True if the student's stored gradeset can't have changed since it was computed'''
+        updated = computed.get(student_id)
+        if updated is None:
+            return False
+        if last_published is not None and updated <= last_published:
+            return False
+        return student_id not in last_activity or updated > last_activity[student_id]
+
+    return [student_id for student_id in student_ids if not is_current(student_id)]
+
+
+def course_last_published(course):
+    '''
+    Returns the latest time at which the course, or any of the modules that affect its
+    grading, was published from Studio, or None if it never was (e.g. for XML courses).
+    '''
+    published_dates = [
+        descriptor.cms.published_date
+        for descriptor in [course] + course.grading_context['all_descriptors']
+        if descriptor.cms.published_date is not None
+    ]
+    if not published_dates:
+        return None
+    # published dates are stored as naive UTC time tuples
+    return max(published_dates).replace(tzinfo=UTC)
+
+
+def _grade_students(course, student_ids):
+    '''
+    Grade the students with ids `student_ids` in `course` and store their gradesets,
+    replacing any previously computed ones.  Returns the number of students graded.
+    '''
+    enc = MyEncoder()
+    students = User.objects.filter(id__in=student_ids).prefetch_related("groups").order_by('username')
+
+    computed_grades = [
+        models.OfflineComputedGrade(user=student, course_id=course.id, gradeset=enc.encode(gradeset))
+        for student, gradeset in grades.iterate_grades_for(course, students, DummyRequest(), keep_raw_scores=True)
+    ]
+
+    with transaction.commit_on_success():
+        models.OfflineComputedGrade.objects.filter(course_id=course.id, user__in=student_ids).delete()
+        models.OfflineComputedGrade.objects.bulk_create(computed_grades)
+
+    return len(computed_grades)
+
+
+# The course being graded by a worker process of offline_grade_calculation
+_WORKER_COURSE = None
+
+
+def _init_grading_worker(course_id):
+    '''
+    Set up a worker process of offline_grade_calculation.
+    '''
+    global _WORKER_COURSE
+    _reset_inherited_connections()
+    _WORKER_COURSE = get_course_by_id(course_id)
+
+
+def _reset_inherited_connections():
+    '''
+    Drop the modulestores, contentstores and cache clients that a worker process inherits
+    from offline_grade_calculation.  Their pymongo and memcache sockets were opened by the
+    parent process, and would be shared with it and every other worker.
+    '''
+    for store in modulestore_django._MODULESTORES.values():
+        metadata_cache = getattr(store, 'metadata_inheritance_cache_subsystem', None)
+        if hasattr(metadata_cache, 'close'):
+            metadata_cache.close()
+    modulestore_django._MODULESTORES.clear()
+    contentstore_django._CONTENTSTORE.clear()
+    for cache in (django_cache.cache, util.cache.cache):
+        if hasattr(cache, 'close'):
+            cache.close()
+
+    # set up new modulestores the way lms.one_time_startup does
+    metadata_cache = django_cache.get_cache('mongo_metadata_inheritance')
+    for store_name in settings.MODULESTORE:
+        store = modulestore_django.modulestore(store_name)
+        store.metadata_inheritance_cache_subsystem = metadata_cache
+        store.request_cache = RequestCache.get_request_cache()
+
+
+def _grade_students_in_worker(student_ids):
+    '''
+    Grade a chunk of students in a worker process of offline_grade_calculation.
+    '''
+    return _grade_students(_WORKER_COURSE, student_ids)
+
+
 def offline_grades_available(course_id):
     '''
     Returns False if no offline grades available for specified course.
@@ -82,11 +230,12 @@ def offline_grades_available(course_id):
 def student_grades(student, request, course, keep_raw_scores=False, use_offline=False):
     '''
     This is the main interface to get grades.  It has the same parameters as grades.grade, as well
-    as use_offline.  If use_offline is True then this will look for an offline computed gradeset in the DB.
+    as use_offline.  If use_offline is True then this will look for an offline computed gradeset in the DB,
+    otherwise the student's cached section grades are used (see grades.cached_grade).
     '''
 
     if not use_offline:
-        return grades.grade(student, request, course, keep_raw_scores=keep_raw_scores)
+        return grades.cached_grade(student, request, course, keep_raw_scores=keep_raw_scores)
 
     try:
         ocg = models.OfflineComputedGrade.objects.get(user=student, course_id=course.id)
@@ -0,0 +1,99 @@
+"""
+Tests of the offline grade calculation
+"""
+import json
+from datetime import datetime
+
+from mock import patch
+from pytz import UTC
+
+from django.test.utils import override_settings
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+from student.tests.factories import UserFactory, CourseEnrollmentFactory
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from courseware.tests.tests import TEST_DATA_MONGO_MODULESTORE
+from capa.tests.response_xml_factory import StringResponseXMLFactory
+from courseware.tests.factories import StudentModuleFactory
+from courseware.models import OfflineComputedGrade, OfflineComputedGradeLog
+from xmodule.modulestore import Location
+from xmodule.modulestore import django as modulestore_django
+from xmodule.modulestore.django import modulestore
+
+from instructor.offline_gradecalc import (
+    offline_grade_calculation, students_needing_grades, _reset_inherited_connections
+)
+
+
+USER_COUNT = 5
+
+
+@override_settings(MODULESTORE=TEST_DATA_MONGO_MODULESTORE)
+class TestOfflineGradeCalculation(ModuleStoreTestCase):
+    """
+    Test offline_grade_calculation
+    """
+
+    def setUp(self):
+        modulestore().request_cache = modulestore().metadata_inheritance_cache_subsystem = None
+
+        self.course = CourseFactory.create()
+        chapter = ItemFactory.create(
+            parent_location=self.course.location,
+            category="chapter",
+        )
+        section = ItemFactory.create(
+            parent_location=chapter.location,
+            category="sequential",
+            metadata={'graded': True, 'format': 'Homework'}
+        )
+        item = ItemFactory.create(
+            parent_location=section.location,
+            category="problem",
+            data=StringResponseXMLFactory().build_xml(answer='foo'),
+        )
+        self.course = modulestore().get_instance(self.course.id, self.course.location)
+
+        self.users = [UserFactory.create() for _ in xrange(USER_COUNT)]
+        for i, user in enumerate(self.users):
+            CourseEnrollmentFactory.create(user=user, course_id=self.course.id)
+            StudentModuleFactory.create(
+                grade=i % 2,
+                max_grade=1,
+                student=user,
+                course_id=self.course.id,
+                module_state_key=Location(item.location).url()
+            )
+
+    def test_grades_computed(self):
+        offline_grade_calculation(self.course.id, chunk_size=2)
+
+        self.assertEqual(OfflineComputedGrade.objects.filter(course_id=self.course.id).count(), USER_COUNT)
+        for i, user in enumerate(self.users):
+            gradeset = json.loads(OfflineComputedGrade.objects.get(user=user, course_id=self.course.id).gradeset)
+            self.assertEqual(gradeset['percent'], i % 2)
+
+        log = OfflineComputedGradeLog.objects.get(course_id=self.course.id)
+        self.assertEqual(log.nstudents, USER_COUNT)
+
+    def test_resume(self):
+        student_ids = [user.id for user in self.users]
+        self.assertEqual(students_needing_grades(self.course, student_ids), student_ids)
+
+        offline_grade_calculation(self.course.id)
+        self.assertEqual(students_needing_grades(self.course, student_ids), [])
+
+        # Grades computed before the student's last activity are stale
+        OfflineComputedGrade.objects.filter(user=self.users[0]).update(updated=datetime(2000, 1, 1, tzinfo=UTC))
+        self.assertEqual(students_needing_grades(self.course, student_ids), [self.users[0].id])
+
+    def test_worker_opens_own_modulestore(self):
+        inherited_store = modulestore()
+        with patch.dict(modulestore_django._MODULESTORES):
+            _reset_inherited_connections()
+            worker_store = modulestore()
+            self.assertIsNot(worker_store, inherited_store)
+            self.assertIsNot(
+                worker_store.collection.database.connection, inherited_store.collection.database.connection
+            )
+            self.assertIsNotNone(worker_store.metadata_inheritance_cache_subsystem)
+        self.assertIs(modulestore(), inherited_store)
@@ -16,7 +16,8 @@ from StringIO import StringIO
 
 from django.conf import settings
 from django.contrib.auth.models import User, Group
-from django.http import HttpResponse
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, Http404
 from django_future.csrf import ensure_csrf_cookie
 from django.views.decorators.cache import cache_control
 from django.core.urlresolvers import reverse
@@ -40,6 +41,8 @@ from django_comment_client.utils import has_forum_access
 from instructor.offline_gradecalc import student_grades, offline_grades_available
 from instructor_task.api import (get_running_instructor_tasks,
                                  get_instructor_task_history,
+                                 get_grade_reports,
+                                 submit_calculate_grades_csv,
                                  submit_rescore_problem_for_all_students,
                                  submit_rescore_problem_for_student,
                                  submit_reset_problem_attempts_for_all_students)
@@ -57,6 +60,12 @@ log = logging.getLogger(__name__)
 FORUM_ROLE_ADD = 'add'
 FORUM_ROLE_REMOVE = 'remove'
 
+# number of the most recent grade reports listed on the dashboard:
+MAX_GRADE_REPORTS_LISTED = 5
+
+# size of the reads when streaming a grade report to the browser:
+GRADE_REPORT_READ_SIZE = 64 * 1024
+
 
 def split_by_comma_and_whitespace(s):
     """
@@ -243,6 +252,18 @@ def instructor_dashboard(request, course_id):
         return return_csv('grades_{0}.csv'.format(course_id),
                           get_student_grade_summary_data(request, course, course_id, use_offline=use_offline))
 
+    elif 'Generate CSV of all student grades in the background' in action:
+        try:
+            instructor_task = submit_calculate_grades_csv(request, course_id)
+            if instructor_task is None:
+                msg += '<font color="red">Failed to create a background task for generating the grade report.</font>'
+            else:
+                track.views.server_track(request, "generate-grades-csv", {"course": course_id}, page="idashboard")
+                msg += '<font color="green">Generating the grade report.  It will be listed below when it is ready.</font>'
+        except Exception as e:
+            log.error("Encountered exception from grade report: {0}".format(e))
+            msg += '<font color="red">Failed to create a background task for generating the grade report: {0}.</font>'.format(e.message)
+
     elif 'Download CSV of all RAW grades' in action:
         track.views.server_track(request, "dump-grades-csv-raw", {}, page="idashboard")
         return return_csv('grades_{0}_raw.csv'.format(course_id),
@@ -749,6 +770,17 @@ def instructor_dashboard(request, course_id):
     else:
         instructor_tasks = None
 
+    # list grade reports generated in the background
+    if settings.MITX_FEATURES.get('ENABLE_INSTRUCTOR_BACKGROUND_TASKS'):
+        grade_reports = [
+            {'created': instructor_task.created,
+             'url': reverse('grade_report', kwargs={'course_id': course_id, 'instructor_task_id': instructor_task.id}),
+             }
+            for instructor_task, _ in get_grade_reports(course_id)[:MAX_GRADE_REPORTS_LISTED]
+        ]
+    else:
+        grade_reports = None
+
     # display course stats only if there is no other table to display:
     course_stats = None
     if not datatable:
@@ -769,6 +801,7 @@ def instructor_dashboard(request, course_id):
                'plots': plots,			# psychometrics
                'course_errors': modulestore().get_item_errors(course.location),
                'instructor_tasks': instructor_tasks,
+               'grade_reports': grade_reports,
                'offline_grade_log': offline_grades_available(course_id),
                'cohorts_ajax_url': reverse('cohorts', kwargs={'course_id': course_id}),
 
@@ -1076,6 +1109,37 @@ def gradebook(request, course_id):
     })
 
 
+@cache_control(no_cache=True, no_store=True, must_revalidate=True)
+def grade_report(request, course_id, instructor_task_id):
+    """
+    Download a grade report generated by a background task:
+    - only available to course staff
+    - streamed from the default file storage, so it needn't fit in memory.
+    """
+    get_course_with_access(request.user, course_id, 'staff')
+
+    report_names = dict(
+        (instructor_task.id, report_name) for instructor_task, report_name in get_grade_reports(course_id)
+    )
+    report_name = report_names.get(int(instructor_task_id))
+    if report_name is None or not default_storage.exists(report_name):
+        raise Http404
+
+    report_file = default_storage.open(report_name)
+
+    def read_report():
+        """Yield the contents of the report, closing it when done"""
+        try:
+            for data in iter(lambda: report_file.read(GRADE_REPORT_READ_SIZE), ''):
+                yield data
+        finally:
+            report_file.close()
+
+    response = HttpResponse(read_report(), mimetype='text/csv')
+    response['Content-Disposition'] = 'attachment; filename={0}'.format(os.path.basename(report_name))
+    return response
+
+
 @cache_control(no_cache=True, no_store=True, must_revalidate=True)
 def grade_summary(request, course_id):
     """Display the grade summary for a course."""
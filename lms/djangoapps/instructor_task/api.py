@@ -7,14 +7,17 @@ arguments.
 
 """
 
-from celery.states import READY_STATES
+import json
+
+from celery.states import READY_STATES, SUCCESS
 
 from xmodule.modulestore.django import modulestore
 
 from instructor_task.models import InstructorTask
 from instructor_task.tasks import (rescore_problem,
                                    reset_problem_attempts,
-                                   delete_problem_state)
+                                   delete_problem_state,
+                                   calculate_grades_csv)
 
 from instructor_task.api_helper import (check_arguments_for_rescoring,
                                         encode_problem_and_student_input,
@@ -45,6 +48,18 @@ def get_instructor_task_history(course_id, problem_url, student=None):
     return instructor_tasks.order_by('-id')
 
 
+def get_grade_reports(course_id):
+    """
+    Returns a list of (InstructorTask, report_name) pairs for the grade reports that
+    have been generated for a given course, most recent first.
+    """
+    instructor_tasks = InstructorTask.objects.filter(
+        course_id=course_id, task_type='grade_course', task_state=SUCCESS
+    ).order_by('-id')
+    return [(instructor_task, json.loads(instructor_task.task_output)['report_name'])
+            for instructor_task in instructor_tasks]
+
+
 def submit_rescore_problem_for_student(request, course_id, problem_url, student):
     """
     Request a problem to be rescored as a background task.
@@ -162,3 +177,25 @@ def submit_delete_problem_state_for_all_students(request, course_id, problem_url
     task_class = delete_problem_state
     task_input, task_key = encode_problem_and_student_input(problem_url)
     return submit_task(request, task_type, task_class, course_id, task_input, task_key)
+
+
+def submit_calculate_grades_csv(request, course_id):
+    """
+    Request a CSV report of the grades of all students in a course, as a background task.
+
+    The report can be downloaded once the task has completed:  see get_grade_reports().
+
+    AlreadyRunningError is raised if a grade report is already being generated for the course.
+
+    This method makes sure the InstructorTask entry is committed.
+    When called from any view that is wrapped by TransactionMiddleware,
+    and thus in a "commit-on-success" transaction, an autocommit buried within here
+    will cause any pending transaction to be committed by a successful
+    save here.  Any future database operations will take place in a
+    separate transaction.
+    """
+    task_type = 'grade_course'
+    task_class = calculate_grades_csv
+    task_input = {}
+    task_key = ""
+    return submit_task(request, task_type, task_class, course_id, task_input, task_key)
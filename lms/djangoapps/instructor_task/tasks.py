@@ -23,7 +23,8 @@ from celery import task
 from instructor_task.tasks_helper import (update_problem_module_state,
                                           rescore_problem_module_state,
                                           reset_attempts_module_state,
-                                          delete_problem_module_state)
+                                          delete_problem_module_state,
+                                          generate_grade_report)
 
 
 @task
@@ -95,3 +96,19 @@ def delete_problem_state(entry_id, xmodule_instance_args):
     return update_problem_module_state(entry_id,
                                        update_fcn, action_name, filter_fcn=None,
                                        xmodule_instance_args=xmodule_instance_args)
+
+
+@task
+def calculate_grades_csv(entry_id, xmodule_instance_args):
+    """Writes a CSV report of the grades of all students enrolled in a course.
+
+    `entry_id` is the id value of the InstructorTask entry that corresponds to this task.
+    The entry contains the `course_id` that identifies the course.  No `task_input` is needed.
+
+    The report is saved to the default file storage, and its name is returned in the
+    task's progress as 'report_name'.
+
+    `xmodule_instance_args` is accepted for consistency with the other tasks, but isn't
+    used, since students are graded without instantiating xmodules where possible.
+    """
+    return generate_grade_report(entry_id, xmodule_instance_args)
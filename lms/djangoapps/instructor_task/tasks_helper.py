@@ -4,7 +4,9 @@ running state of a course.
 
 """
 
+import csv
 import json
+from tempfile import TemporaryFile
 from time import time
 from sys import exc_info
 from traceback import format_exc
@@ -15,17 +17,23 @@ from celery.signals import worker_process_init
 from celery.states import SUCCESS, FAILURE
 
 from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.files.storage import default_storage
 from django.db import transaction
 from dogapi import dog_stats_api
 
+from xmodule.course_module import CourseDescriptor
 from xmodule.modulestore.django import modulestore
 
 import mitxmako.middleware as middleware
 from track.views import task_track
 
+from courseware.grades import iterate_grades_for
 from courseware.models import StudentModule
 from courseware.model_data import ModelDataCache
 from courseware.module_render import get_module_for_descriptor_internal
+from external_auth.models import ExternalAuthMap
+from instructor.offline_gradecalc import DummyRequest
 from instructor_task.models import InstructorTask, PROGRESS
 
 # define different loggers for use within tasks and on client side
@@ -34,6 +42,15 @@ TASK_LOG = get_task_logger(__name__)
 # define value to use when no task_id is provided:
 UNKNOWN_TASK_ID = 'unknown-task_id'
 
+# directory of the default file storage where grade reports are saved:
+GRADE_REPORT_DIR = 'grade_reports'
+
+# number of students to grade between progress updates of a grade report:
+GRADE_REPORT_CHUNK_SIZE = 100
+
+# columns identifying the student in each row of a grade report:
+GRADE_REPORT_HEADER = ['ID', 'Username', 'Full Name', 'edX email', 'External email']
+
 
 def initialize_mako(sender=None, conf=None, **kwargs):
     """
@@ -218,6 +235,29 @@ def update_problem_module_state(entry_id, update_fcn, action_name, filter_fcn,
     if xmodule_instance_args is not None:
         xmodule_instance_args['task_id'] = task_id
 
+    def perform_update():
+        """Visit the StudentModules to update"""
+        return _perform_module_state_update(course_id, module_state_key, student_ident, update_fcn,
+                                            action_name, filter_fcn, xmodule_instance_args)
+
+    task_progress = _run_main_task(entry, action_name, perform_update)
+
+    # log and exit, returning task_progress info as task result:
+    fmt = 'Finishing task "{task_id}": course "{course_id}" problem "{state_key}": final: {progress}'
+    TASK_LOG.info(fmt.format(task_id=task_id, course_id=course_id, state_key=module_state_key, progress=task_progress))
+    return task_progress
+
+
+def _run_main_task(entry, action_name, task_fcn):
+    """
+    Runs `task_fcn` as the work of the InstructorTask `entry`, and records the outcome in the entry.
+
+    `task_fcn` takes no arguments, and returns the task's progress dict.  On success, the
+    progress is stored as the entry's task_output and returned.  If an exception is raised,
+    it is stored as the entry's task_output, and raised again to let Celery record the failure.
+    """
+    task_id = entry.task_id
+
     # Now that we have an entry we can try to catch failures:
     task_progress = None
     try:
@@ -226,14 +266,13 @@ def update_problem_module_state(entry_id, update_fcn, action_name, filter_fcn,
         request_task_id = _get_current_task().request.id
         if task_id != request_task_id:
             fmt = 'Requested task "{task_id}" did not match actual task "{actual_id}"'
-            message = fmt.format(task_id=task_id, course_id=course_id, state_key=module_state_key, actual_id=request_task_id)
+            message = fmt.format(task_id=task_id, actual_id=request_task_id)
             TASK_LOG.error(message)
             raise UpdateProblemModuleStateError(message)
 
         # Now do the work:
         with dog_stats_api.timer('instructor_tasks.module.time.overall', tags=['action:{name}'.format(name=action_name)]):
-            task_progress = _perform_module_state_update(course_id, module_state_key, student_ident, update_fcn,
-                                                         action_name, filter_fcn, xmodule_instance_args)
+            task_progress = task_fcn()
         # If we get here, we assume we've succeeded, so update the InstructorTask entry in anticipation.
         # But we do this within the try, in case creating the task_output causes an exception to be
         # raised.
@@ -251,9 +290,107 @@ def update_problem_module_state(entry_id, update_fcn, action_name, filter_fcn,
         entry.save_now()
         raise
 
-    # log and exit, returning task_progress info as task result:
-    fmt = 'Finishing task "{task_id}": course "{course_id}" problem "{state_key}": final: {progress}'
-    TASK_LOG.info(fmt.format(task_id=task_id, course_id=course_id, state_key=module_state_key, progress=task_progress))
+    return task_progress
+
+
+def generate_grade_report(entry_id, xmodule_instance_args):
+    """
+    Writes a CSV report of the grades of every student enrolled in a course.
+
+    The `entry_id` is the primary key for the InstructorTask entry representing the task, which
+    provides the course.  The report has a row per student with the same columns as the legacy
+    instructor dashboard's grade download: the student's identity, followed by their percent
+    score on each assignment.
+
+    Rows are written to a temporary file as students are graded, so memory use doesn't grow with
+    the size of the course, and the file is then saved to the default file storage.  Progress is
+    reported every GRADE_REPORT_CHUNK_SIZE students.  On success, the task's progress dict has the
+    usual 'attempted', 'updated', 'total', 'action_name' and 'duration_ms' keys, counting students,
+    plus 'report_name', the name of the report in the default file storage.
+
+    The InstructorTask entry is updated on success and failure, as by update_problem_module_state.
+    """
+    entry = InstructorTask.objects.get(pk=entry_id)
+    task_id = entry.task_id
+    course_id = entry.course_id
+    action_name = 'graded'
+
+    fmt = 'Starting grade report as task "{task_id}": course "{course_id}"'
+    TASK_LOG.info(fmt.format(task_id=task_id, course_id=course_id))
+
+    def perform_report():
+        """Grade the students and write the report"""
+        return _perform_grade_report(course_id, task_id, action_name)
+
+    task_progress = _run_main_task(entry, action_name, perform_report)
+
+    fmt = 'Finishing grade report as task "{task_id}": course "{course_id}": final: {progress}'
+    TASK_LOG.info(fmt.format(task_id=task_id, course_id=course_id, progress=task_progress))
+    return task_progress
+
+
+def _perform_grade_report(course_id, task_id, action_name):
+    """
+    Grades all students enrolled in `course_id` and saves the report, as described in
+    generate_grade_report.  Returns the task's progress dict.
+    """
+    start_time = time()
+    course = modulestore().get_instance(course_id, CourseDescriptor.id_to_location(course_id), depth=None)
+    enrolled_students = User.objects.filter(
+        courseenrollment__course_id=course_id
+    ).select_related('profile').order_by('username')
+    external_emails = dict(ExternalAuthMap.objects.filter(
+        user__courseenrollment__course_id=course_id
+    ).values_list('user_id', 'external_email'))
+
+    num_graded = 0
+    num_total = enrolled_students.count()
+
+    def get_task_progress():
+        """Return a dict containing info about current task"""
+        current_time = time()
+        progress = {'action_name': action_name,
+                    'attempted': num_graded,
+                    'updated': num_graded,
+                    'total': num_total,
+                    'duration_ms': int((current_time - start_time) * 1000),
+                    }
+        return progress
+
+    _get_current_task().update_state(state=PROGRESS, meta=get_task_progress())
+
+    report_file = TemporaryFile()
+    writer = csv.writer(report_file, dialect='excel', quotechar='"', quoting=csv.QUOTE_ALL)
+    student_grades = iterate_grades_for(course, enrolled_students.iterator(), DummyRequest())
+    for student, gradeset in student_grades:
+        if num_graded == 0:
+            # The assignments are only known once the first student is graded
+            assignments = [section['label'] for section in gradeset['section_breakdown']]
+            writer.writerow(GRADE_REPORT_HEADER + assignments)
+
+        external_email = external_emails.get(student.id, '')
+        datarow = [student.id, student.username, student.profile.name, student.email, external_email]
+        datarow += [section['percent'] for section in gradeset['section_breakdown']]
+        writer.writerow([unicode(value).encode('utf-8') for value in datarow])
+
+        num_graded += 1
+        if num_graded % GRADE_REPORT_CHUNK_SIZE == 0:
+            _get_current_task().update_state(state=PROGRESS, meta=get_task_progress())
+
+    if num_graded == 0:
+        writer.writerow(GRADE_REPORT_HEADER)
+
+    report_file.seek(0)
+    report_name = default_storage.save(
+        '{dir}/{course}/grades_{task_id}.csv'.format(
+            dir=GRADE_REPORT_DIR, course=course_id.replace('/', '_'), task_id=task_id
+        ),
+        File(report_file)
+    )
+    report_file.close()
+
+    task_progress = get_task_progress()
+    task_progress['report_name'] = report_name
     return task_progress
 
 
@@ -11,6 +11,8 @@ from unittest import skip
 
 from mock import Mock, patch
 
+from django.core.files.storage import default_storage
+
 from celery.states import SUCCESS, FAILURE
 
 from xmodule.modulestore.exceptions import ItemNotFoundError
@@ -22,7 +24,8 @@ from student.tests.factories import UserFactory
 from instructor_task.models import InstructorTask
 from instructor_task.tests.test_base import InstructorTaskModuleTestCase
 from instructor_task.tests.factories import InstructorTaskFactory
-from instructor_task.tasks import rescore_problem, reset_problem_attempts, delete_problem_state
+from instructor_task.tasks import (rescore_problem, reset_problem_attempts, delete_problem_state,
+                                   calculate_grades_csv)
 from instructor_task.tasks_helper import UpdateProblemModuleStateError, update_problem_module_state
 
 
@@ -375,3 +378,41 @@ class TestInstructorTasks(InstructorTaskModuleTestCase):
         self.assertEquals(output.get('total'), num_students)
         self.assertEquals(output.get('action_name'), 'rescored')
         self.assertGreater('duration_ms', 0)
+
+    def _create_grade_report_entry(self):
+        """Creates a InstructorTask entry for generating a grade report."""
+        return InstructorTaskFactory.create(course_id=self.course.id,
+                                            requester=self.instructor,
+                                            task_type='grade_course',
+                                            task_input=json.dumps({}),
+                                            task_key='',
+                                            task_id=str(uuid4()))
+
+    def test_grade_report_missing_current_task(self):
+        task_entry = self._create_grade_report_entry()
+        with self.assertRaises(UpdateProblemModuleStateError):
+            calculate_grades_csv(task_entry.id, self._get_xmodule_instance_args())
+
+    def test_grade_report(self):
+        num_students = 3
+        students = [self.create_student('robot%d' % i) for i in xrange(num_students)]
+        task_entry = self._create_grade_report_entry()
+        status = self._run_task_with_mock_celery(calculate_grades_csv, task_entry.id, task_entry.task_id)
+        # the instructor is enrolled too:
+        self.assertEquals(status.get('attempted'), num_students + 1)
+        self.assertEquals(status.get('updated'), num_students + 1)
+        self.assertEquals(status.get('total'), num_students + 1)
+        self.assertEquals(status.get('action_name'), 'graded')
+        entry = InstructorTask.objects.get(id=task_entry.id)
+        self.assertEquals(json.loads(entry.task_output), status)
+        self.assertEquals(entry.task_state, SUCCESS)
+
+        report_file = default_storage.open(status['report_name'])
+        try:
+            rows = report_file.read().splitlines()
+        finally:
+            report_file.close()
+            default_storage.delete(status['report_name'])
+        self.assertTrue(rows[0].startswith('"ID","Username","Full Name","edX email","External email"'))
+        usernames = [row.split(',')[1].strip('"') for row in rows[1:]]
+        self.assertEquals(usernames, sorted([student.username for student in students] + ['instructor']))
@@ -144,6 +144,9 @@ def get_task_completion_info(instructor_task):
     if instructor_task.task_state == PROGRESS:
         # special message for providing progress updates:
         msg_format = "Progress: {action} {updated} of {attempted} so far"
+    elif instructor_task.task_type == 'grade_course':
+        succeeded = True
+        msg_format = "Grade report successfully generated for {attempted} students"
     elif student is not None:
         if num_attempted == 0:
             msg_format = "Unable to find submission to be {action} for student '{student}'"
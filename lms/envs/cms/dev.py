@@ -29,6 +29,7 @@ modulestore_options = {
     'collection': 'modulestore',
     'fs_root': DATA_DIR,
     'render_template': 'mitxmako.shortcuts.render_to_string',
+    'descriptor_cache_size': 10000,
 }
 
 MODULESTORE = {
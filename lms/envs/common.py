@@ -310,6 +310,14 @@ MODULESTORE = {
 }
 CONTENTSTORE = None
 
+# Cache-Control headers of the course assets served by the StaticContentServer, by
+# content type, major content type (e.g. 'video') or 'default'
+STATIC_CONTENT_CACHE_CONTROL = {
+    'default': 'public, max-age=3600',
+    'video': 'public, max-age=86400',
+    'application/pdf': 'public, max-age=86400',
+}
+
 #################### Python sandbox ############################################
 
 CODE_JAIL = {
@@ -493,6 +501,8 @@ MIDDLEWARE_CLASSES = (
     'django.middleware.locale.LocaleMiddleware',
 
     'django.middleware.transaction.TransactionMiddleware',
+    # must come after TransactionMiddleware, see its docstring
+    'courseware.middleware.StudentModuleHistoryMiddleware',
     # 'debug_toolbar.middleware.DebugToolbarMiddleware',
 
     'django_comment_client.utils.ViewNameMiddleware',
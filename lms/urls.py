@@ -412,6 +412,8 @@ if settings.MITX_FEATURES.get('ENABLE_SERVICE_STATUS'):
 if settings.MITX_FEATURES.get('ENABLE_INSTRUCTOR_BACKGROUND_TASKS'):
     urlpatterns += (
         url(r'^instructor_task_status/$', 'instructor_task.views.instructor_task_status', name='instructor_task_status'),
+        url(r'^courses/(?P<course_id>[^/]+/[^/]+/[^/]+)/grade_report/(?P<instructor_task_id>\d+)$',
+            'instructor.views.legacy.grade_report', name='grade_report'),
     )
 
 if settings.MITX_FEATURES.get('RUN_AS_ANALYTICS_SERVER_ENABLED'):